@@ -0,0 +1,181 @@
+import argparse
+import datetime
+import duckdb
+import glob
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from bronze import run_bronze
+from silver import run_silver
+from gold import run_gold
+from dag import ProfiledCursor
+from generate import generate_dataset
+from config import load_config, apply_config, DEFAULT_CONFIG
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(BASE_DIR, 'benchmarks')
+HISTORY_DB = os.path.join(BENCH_DIR, 'benchmarks.db')
+DEFAULT_SCALES = (100_000, 1_000_000)
+
+# Statements that build a Gold table; their profiled latency is summed per table
+GOLD_STATEMENT = re.compile(r'^\s*(?:CREATE\s+OR\s+REPLACE\s+(?:TEMP\s+)?TABLE|INSERT\s+INTO)\s+(\w+)', re.IGNORECASE)
+
+
+def _ensure_history_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS benchmark_results (
+            benchmark_id VARCHAR,
+            recorded_at TIMESTAMP,
+            scale_events BIGINT,
+            seed INTEGER,
+            target_kind VARCHAR,
+            target VARCHAR,
+            seconds DOUBLE,
+            rows_out BIGINT
+        )
+    """)
+
+
+def _dataset(scale, seed, shards, compression):
+    """Generated inputs are cached per (scale, seed, layout); generation is deterministic."""
+    name = f"{scale}_seed{seed}_x{shards}{'_' + compression if compression else ''}"
+    out_dir = os.path.join(BENCH_DIR, 'data', name)
+    marker = os.path.join(out_dir, 'sources.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            return json.load(f)
+    print(f"Generating {scale} events into {out_dir}...")
+    sources = generate_dataset(out_dir, events=scale, seed=seed, shards=shards, compression=compression)
+    with open(marker, 'w') as f:
+        json.dump(sources, f)
+    return sources
+
+
+def _gold_table_seconds(profiles):
+    """Sums per-statement profiled latency by the Gold table each statement writes."""
+    seconds = {}
+    for path in profiles:
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            profile = json.load(f)
+        match = GOLD_STATEMENT.match(profile.get('query_name') or '')
+        if match:
+            table = match.group(1)
+            seconds[table] = seconds.get(table, 0.0) + profile.get('latency', 0.0)
+    return seconds
+
+
+def benchmark_scale(scale, seed=42, threads=None, shards=1, compression=None, config=None):
+    """
+    Runs Bronze, Silver and Gold from scratch on a generated dataset of `scale`
+    events and returns [(target_kind, target, seconds, rows_out)], with one
+    row per layer and one per Gold table (including the shared intermediates).
+    `config` applies the same DuckDB settings and chunking as a pipeline run.
+    """
+    config = config or DEFAULT_CONFIG
+    sources = _dataset(scale, seed, shards, compression)
+    db_path = os.path.join(BENCH_DIR, f'bench_{scale}.db')
+    for path in glob.glob(db_path + '*'):
+        os.remove(path)
+
+    results = []
+    con = duckdb.connect(db_path)
+    try:
+        apply_config(con, config)
+
+        # 1. Layers, timed end to end
+        layers = (
+            ('bronze', lambda c: run_bronze(c, full_refresh=True, sources=sources, threads=threads), 'bronze_events'),
+            ('silver', lambda c: run_silver(c, full_refresh=True, chunk_buckets=config['chunk_buckets'],
+                                            bot_min_events=config['bot_min_events'],
+                                            bot_window_seconds=config['bot_window_seconds']), 'silver_events'),
+        )
+        for layer, func, table in layers:
+            start = time.time()
+            func(con)
+            rows = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            results.append(('layer', layer, time.time() - start, rows))
+
+        # 2. Gold, with one query profile per statement to attribute time to tables
+        with tempfile.TemporaryDirectory() as profile_dir:
+            cur = ProfiledCursor(con.cursor(), os.path.join(profile_dir, 'gold'))
+            start = time.time()
+            run_gold(cur, full_refresh=True, chunk_days=config['chunk_days'])
+            results.append(('layer', 'gold', time.time() - start, None))
+            cur.execute("PRAGMA disable_profiling")
+            for table, seconds in sorted(_gold_table_seconds(cur.profiles).items()):
+                exists = con.execute(
+                    "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ? AND NOT temporary", [table]
+                ).fetchone()[0]
+                rows = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] if exists else None
+                results.append(('gold_table', table, seconds, rows))
+            cur.close()
+    finally:
+        con.close()
+    return results
+
+
+def run_benchmark(scales=DEFAULT_SCALES, seed=42, threads=None, shards=1, compression=None, config=None):
+    """
+    Benchmarks the pipeline at each scale and appends the timings to
+    benchmark_results in benchmarks/benchmarks.db, so runs can be compared over
+    time (see report_sql). Returns the benchmark_id.
+    """
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    benchmark_id = uuid.uuid4().hex
+    recorded_at = datetime.datetime.now()
+    rows = []
+    for scale in scales:
+        print(f"\n--- Benchmark: {scale} events ---")
+        for kind, target, seconds, rows_out in benchmark_scale(scale, seed, threads, shards, compression, config):
+            rows.append([benchmark_id, recorded_at, scale, seed, kind, target, seconds, rows_out])
+
+    con = duckdb.connect(HISTORY_DB)
+    try:
+        _ensure_history_table(con)
+        con.executemany("INSERT INTO benchmark_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        print("\n" + con.execute(report_sql()).df().to_string(index=False))
+    finally:
+        con.close()
+    return benchmark_id
+
+
+def report_sql():
+    """
+    Latest benchmark per scale and target, next to the previous benchmark at
+    the same scale and the cost per million events.
+    """
+    return """
+        WITH ranked AS (
+            SELECT *, DENSE_RANK() OVER (PARTITION BY scale_events ORDER BY recorded_at DESC) as bench_rank
+            FROM benchmark_results
+        )
+        SELECT
+            scale_events, target_kind, target,
+            ROUND(MAX(seconds) FILTER (WHERE bench_rank = 1), 3) as latest_s,
+            ROUND(MAX(seconds) FILTER (WHERE bench_rank = 2), 3) as previous_s,
+            ROUND(MAX(seconds) FILTER (WHERE bench_rank = 1) * 1e6 / scale_events, 3) as s_per_million,
+            MAX(rows_out) FILTER (WHERE bench_rank = 1) as rows_out
+        FROM ranked
+        WHERE bench_rank <= 2
+        GROUP BY scale_events, target_kind, target
+        HAVING COUNT(*) FILTER (WHERE bench_rank = 1) > 0
+        ORDER BY target_kind DESC, target, scale_events
+    """
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Medallion pipeline on synthetic data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help="Event counts to benchmark, e.g. 1000000 10000000 100000000.")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', type=int, help="Parallel event-file ingestion workers.")
+    parser.add_argument('--shards', type=int, default=1, help="Event files per dataset.")
+    parser.add_argument('--compression', choices=['gzip', 'zstd'])
+    parser.add_argument('--config', help="JSON pipeline config, as for process.py.")
+    args = parser.parse_args()
+    run_benchmark(args.scales, args.seed, args.threads, args.shards, args.compression, load_config(args.config))
@@ -1,56 +1,551 @@
 import duckdb
+import glob
+import hashlib
+import json
 import os
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
-def run_bronze(con):
+# Bytes hashed from each end of the ingested prefix to detect a rewrite in place
+PREFIX_FINGERPRINT_BYTES = 64 * 1024
+COPY_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Compressed shards cannot be seeked into, so they are ingested whole, once
+COMPRESSED_SUFFIXES = ('.gz', '.gzip', '.zst', '.zstd')
+
+EVENTS_PATH = os.path.join(DATA_DIR, 'events.ndjson')
+# Events streamed in over stdin or a socket (see stream.py) are appended here.
+# It is a default events source, so a Bronze rebuild replays them too.
+STREAM_LANDING_PATH = os.path.join(DATA_DIR, 'stream', 'events.ndjson')
+
+DEFAULT_SOURCES = {
+    'events': [EVENTS_PATH, STREAM_LANDING_PATH],
+    'marketing': os.path.join(DATA_DIR, 'marketing_spend.csv'),
+    'subscriptions': os.path.join(DATA_DIR, 'subscriptions.json'),
+}
+
+# JSON fields read from each event line. They are extracted as text, so no
+# value (like the "ten" amount) can fail the parse itself.
+EVENT_FIELDS = (
+    'event_id', 'user_id', 'event_type', 'timestamp', 'amount', 'currency', 'refers_to_event_id',
+    'schema_version', 'tax', 'page', 'acquisition_channel',
+)
+
+# Fields each schema_version defines. A row projects only its version's
+# fields; rows with an unknown or missing version keep every field.
+EVENT_SCHEMAS = {
+    1: ('event_id', 'user_id', 'event_type', 'timestamp', 'amount', 'schema_version', 'acquisition_channel'),
+    2: ('event_id', 'user_id', 'event_type', 'timestamp', 'amount', 'currency', 'refers_to_event_id',
+        'schema_version', 'tax', 'page', 'acquisition_channel'),
+}
+
+# Fields stored typed, as field: (column, type). A value that casts cleanly
+# is stored in the typed column; one that does not is stored NULL there and
+# kept verbatim in raw_<field>, which stays NULL on the happy path.
+EVENT_TYPED_FIELDS = {
+    'timestamp': ('event_ts', 'TIMESTAMP'),
+    'amount': ('amount', 'DOUBLE'),
+    'schema_version': ('schema_version', 'INTEGER'),
+    'tax': ('tax', 'DOUBLE'),
+}
+
+# bronze_events layout: typed and text fields in EVENT_FIELDS order, then the
+# raw fallbacks of the typed ones
+EVENT_COLUMNS = dict(
+    [EVENT_TYPED_FIELDS.get(field, (field, 'VARCHAR')) for field in EVENT_FIELDS]
+    + [(f'raw_{field}', 'VARCHAR') for field in EVENT_TYPED_FIELDS]
+)
+
+
+def _ensure_watermark_table(con):
+    """Control table holding one ingestion watermark per source file."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS bronze_file_watermarks (
+            file_path VARCHAR PRIMARY KEY,
+            file_identity VARCHAR,
+            prefix_hash VARCHAR,
+            byte_offset BIGINT,
+            line_count BIGINT,
+            updated_at TIMESTAMP
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS bronze_generations (
+            table_name VARCHAR PRIMARY KEY,
+            generation VARCHAR,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def load_manifest(manifest_path):
+    """
+    Reads a JSON manifest mapping each dataset ('events', 'marketing',
+    'subscriptions') to a glob pattern or list of patterns. Relative patterns
+    are resolved against the manifest's own directory.
+    """
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    resolved = {}
+    for dataset, patterns in manifest.items():
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        resolved[dataset] = [os.path.join(base, p) for p in patterns]
+    return resolved
+
+
+def resolve_sources(patterns):
+    """Expands a glob pattern (or list of them) to a sorted, de-duplicated list of files."""
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    paths = set()
+    for pattern in patterns:
+        paths.update(os.path.abspath(p) for p in glob.glob(pattern) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def _is_compressed(path):
+    return path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def _file_identity(path):
+    st = os.stat(path)
+    return f"{st.st_dev}:{st.st_ino}", st.st_size
+
+
+def _prefix_hash(path, length):
+    """
+    Fingerprints the first `length` bytes (the part already ingested) by hashing
+    its head and its tail, so the check stays O(1) in the size of the history.
+    """
+    digest = hashlib.sha256()
+    window = min(length, PREFIX_FINGERPRINT_BYTES)
+    with open(path, 'rb') as f:
+        digest.update(f.read(window))
+        f.seek(length - window)
+        digest.update(f.read(window))
+    return digest.hexdigest()
+
+
+def source_fingerprint(paths):
+    """
+    Identifies the current contents of a set of source files by path, size,
+    mtime and a hash of each file's head and tail, without reading it whole.
+    """
+    parts = []
+    for path in paths:
+        st = os.stat(path)
+        parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}:{_prefix_hash(path, st.st_size)}")
+    return '|'.join(parts)
+
+
+def _last_complete_line_end(path, start, size):
+    """
+    Returns the offset just past the last newline at or after `start`.
+    A trailing line without a newline may still be in flight, so it is left
+    for the next run.
+    """
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > start:
+            step = min(COPY_CHUNK_BYTES, pos - start)
+            pos -= step
+            f.seek(pos)
+            idx = f.read(step).rfind(b'\n')
+            if idx != -1:
+                return pos + idx + 1
+    return start
+
+
+def _has_carriage_returns(path, start, end):
+    """True if bytes [start, end) of `path` contain a CR (CRLF line endings)."""
+    with open(path, 'rb') as src:
+        src.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = src.read(min(COPY_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            if b'\r' in chunk:
+                return True
+            remaining -= len(chunk)
+    return False
+
+
+def _copy_range(path, start, end, dest):
+    """
+    Streams bytes [start, end) of `path` into `dest`, blanking carriage
+    returns to spaces. DuckDB's line reader would otherwise split a CRLF
+    line twice; a space is JSON whitespace and keeps every byte offset.
+    """
+    with open(path, 'rb') as src:
+        src.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = src.read(min(COPY_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            dest.write(chunk.replace(b'\r', b' '))
+            remaining -= len(chunk)
+
+
+def _file_status(con, path, identity, size):
+    """
+    Classifies a source file against its watermark as 'new', 'unchanged',
+    'append' or 'rewritten'. A watermark is only trusted when the file is the
+    same inode, has not shrunk below the ingested offset, and the already
+    ingested prefix is unchanged. Compressed files are immutable units: any
+    change to them counts as a rewrite.
+    """
+    mark = con.execute(
+        "SELECT file_identity, prefix_hash, byte_offset, line_count FROM bronze_file_watermarks WHERE file_path = ?",
+        [path]
+    ).fetchone()
+    if mark is None:
+        return 'new', None
+
+    prev_identity, prev_hash, offset, _ = mark
+    if prev_identity != identity or size < offset:
+        return 'rewritten', mark
+    if _prefix_hash(path, offset) != prev_hash:
+        return 'rewritten', mark
+    if size == offset:
+        return 'unchanged', mark
+    return ('rewritten' if _is_compressed(path) else 'append'), mark
+
+
+def _ensure_quarantine_table(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS quarantine_raw_events (
+            file_name VARCHAR,
+            line_number BIGINT,
+            byte_offset BIGINT,
+            raw_line VARCHAR,
+            rejection_reason VARCHAR,
+            ingested_at TIMESTAMP
+        )
+    """)
+
+
+def _stage_lines_sql(first_line, first_offset):
+    """
+    Reads an NDJSON file exactly once as raw lines (a CSV scan with a NUL
+    delimiter and no quoting yields one VARCHAR per line), numbering each line
+    and tracking its byte offset with a running sum in file order. Lines that
+    are valid JSON objects are parsed into a struct in the same pass; for the
+    rest only the raw text is kept, for quarantine.
+
+    Plain files reach here with their CRs blanked (see _copy_range). A
+    compressed shard is read as is, with '\r\n' and '\n' both ending a line;
+    its offsets are positions in the decompressed text, counting one byte per
+    line ending. The file path is the statement's one bound parameter.
+    """
+    structure = json.dumps({field: 'VARCHAR' for field in EVENT_FIELDS}).replace("'", "''")
+    return f"""
+        WITH lines AS (
+            SELECT 
+                raw_line,
+                {first_line} + ROW_NUMBER() OVER () - 1 as line_number,
+                {first_offset} + SUM(COALESCE(strlen(raw_line), 0) + 1) OVER (ROWS UNBOUNDED PRECEDING)
+                    - COALESCE(strlen(raw_line), 0) - 1 as byte_offset
+            FROM read_csv(
+                ?, 
+                columns={{'raw_line': 'VARCHAR'}}, 
+                header=false, delim=chr(0), quote='', escape='', new_line='\\r\\n', auto_detect=false
+            )
+        ),
+        checked AS (
+            SELECT *,
+                   CASE WHEN raw_line IS NULL OR trim(raw_line) = '' THEN 'Empty line'
+                        WHEN NOT json_valid(raw_line) THEN 'Malformed JSON'
+                        WHEN NOT starts_with(ltrim(raw_line), '{{') THEN 'Not a JSON object'
+                   END as rejection_reason
+            FROM lines
+        )
+        SELECT 
+            line_number, byte_offset, rejection_reason,
+            CASE WHEN rejection_reason IS NULL THEN json_transform(raw_line, '{structure}') END as record,
+            CASE WHEN rejection_reason IS NOT NULL THEN raw_line END as raw_line
+        FROM checked
+    """
+
+
+def _typed_events_sql(records):
+    """
+    Projects parsed `records` (a `record` struct of text fields) to the
+    bronze_events columns: each field is kept only if the row's
+    schema_version defines it (see EVENT_SCHEMAS), and typed fields are cast
+    once, here, with the raw text kept only where the cast fails.
+    """
+    known = ', '.join(str(v) for v in EVENT_SCHEMAS)
+    projected = []
+    for field in EVENT_FIELDS:
+        versions = [str(v) for v, fields in EVENT_SCHEMAS.items() if field in fields]
+        if len(versions) == len(EVENT_SCHEMAS):
+            projected.append(f"record['{field}'] as {field}")
+        else:
+            projected.append(f"""
+                CASE WHEN version IN ({', '.join(versions) or 'NULL'}) OR version IS NULL OR version NOT IN ({known})
+                     THEN record['{field}'] END as {field}""")
+    typed = {field: f"try_cast({field} as {dtype})" for field, (_, dtype) in EVENT_TYPED_FIELDS.items()}
+    columns = [f"{typed[field]} as {EVENT_TYPED_FIELDS[field][0]}" if field in typed else field
+               for field in EVENT_FIELDS]
+    columns += [f"CASE WHEN {cast} IS NULL THEN {field} END as raw_{field}" for field, cast in typed.items()]
+    return f"""
+        SELECT {', '.join(columns)}
+        FROM (
+            SELECT {', '.join(projected)}
+            FROM (SELECT record, try_cast(record['schema_version'] as INTEGER) as version FROM {records})
+        )
+    """
+
+
+def _ingest_event_file(con, path, batch_id, start, prev_lines, end, size, identity):
+    """
+    Appends lines [start, end) of one file to bronze_events on its own cursor,
+    committing the rows, their quarantine entries and the file's watermark in
+    one transaction. Returns (lines_read, rows_loaded, rows_quarantined).
+    """
+    cur = con.cursor()
+
+    # The whole file can be scanned in place; a tail (or a file still being
+    # written, or one with CRLF line endings) is first cut down to its
+    # complete new lines.
+    tmp_path = None
+    source = path
+    if not _is_compressed(path) and (start > 0 or end < size or _has_carriage_returns(path, start, end)):
+        fd, tmp_path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(fd, 'wb') as tmp:
+            _copy_range(path, start, end, tmp)
+        source = tmp_path
+
+    try:
+        cur.begin()
+        try:
+            cur.execute(f"""
+                CREATE OR REPLACE TEMP TABLE bronze_staged_lines AS 
+                {_stage_lines_sql(prev_lines + 1, start)}
+            """, [source])
+            new_lines = cur.execute("SELECT COUNT(*) FROM bronze_staged_lines").fetchone()[0]
+            loaded = cur.execute(f"""
+                INSERT INTO bronze_events 
+                SELECT *, ? as source_file, ? as ingest_batch_id 
+                FROM ({_typed_events_sql("(SELECT record FROM bronze_staged_lines WHERE rejection_reason IS NULL)")})
+            """, [path, batch_id]).fetchone()[0]
+            quarantined = cur.execute("""
+                INSERT INTO quarantine_raw_events 
+                SELECT ?, line_number, byte_offset, raw_line, rejection_reason, now()::TIMESTAMP 
+                FROM bronze_staged_lines WHERE rejection_reason IS NOT NULL
+            """, [path]).fetchone()[0]
+            cur.execute("DROP TABLE bronze_staged_lines")
+            cur.execute(
+                "INSERT OR REPLACE INTO bronze_file_watermarks VALUES (?, ?, ?, ?, ?, now()::TIMESTAMP)",
+                [path, identity, _prefix_hash(path, end), end, prev_lines + new_lines]
+            )
+            cur.commit()
+        except Exception:
+            cur.rollback()
+            raise
+    finally:
+        cur.close()
+        if tmp_path:
+            os.remove(tmp_path)
+
+    return new_lines, loaded, quarantined
+
+
+def ingested_event_files(con):
+    """Event files bronze_events holds rows from, per bronze_file_watermarks."""
+    _ensure_watermark_table(con)
+    return [row[0] for row in con.execute("SELECT file_path FROM bronze_file_watermarks ORDER BY 1").fetchall()]
+
+
+def _reset_events(con):
+    """Recreates bronze_events and its control state under a new generation."""
+    columns = ', '.join(f"{name} {dtype}" for name, dtype in EVENT_COLUMNS.items())
+    con.begin()
+    try:
+        con.execute(f"CREATE OR REPLACE TABLE bronze_events ({columns}, source_file VARCHAR, ingest_batch_id VARCHAR)")
+        con.execute("DELETE FROM bronze_file_watermarks")
+        con.execute("DELETE FROM quarantine_raw_events")
+        con.execute(
+            "INSERT OR REPLACE INTO bronze_generations VALUES ('bronze_events', ?, now()::TIMESTAMP)",
+            [uuid.uuid4().hex]
+        )
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def ingest_events(con, event_paths, full_refresh=False, threads=None, batch_id=None):
+    """
+    Loads NDJSON event files (plain, gzip or zstd) into bronze_events, appending
+    only what was written since each file's recorded watermark.
+
+    Files are ingested in parallel, one DuckDB cursor per file on a pool of
+    `threads` workers (default: one per core). Each row carries its
+    `source_file` and the run's `ingest_batch_id`. The new lines are read once:
+    parseable ones land in bronze_events and the rest in quarantine_raw_events
+    with their file name, line number, byte offset and raw text.
+
+    Rows are stored typed (see EVENT_TYPED_FIELDS and _typed_events_sql), so
+    Silver does not re-parse timestamps and amounts; only a value that fails
+    its cast keeps its text, in the raw_<field> column.
+
+    bronze_events is rebuilt from scratch on the first run, when `full_refresh`
+    is set, or when any known file was rewritten or truncated. Every rebuild
+    starts a new generation in bronze_generations, which tells downstream
+    layers their own offsets into bronze_events are no longer valid. Returns a
+    tuple of (lines_read, rows_loaded, rows_quarantined, was_full_rebuild).
+    """
+    if isinstance(event_paths, str):
+        event_paths = [event_paths]
+    batch_id = batch_id or uuid.uuid4().hex
+    _ensure_watermark_table(con)
+    _ensure_quarantine_table(con)
+
+    files = []
+    for path in event_paths:
+        identity, size = _file_identity(path)
+        status, mark = _file_status(con, path, identity, size)
+        files.append((path, identity, size, status, mark))
+
+    # A bronze_events table from before the typed layout is rebuilt too
+    has_table = con.execute(
+        "SELECT COUNT(*) FROM duckdb_columns() WHERE table_name = 'bronze_events' AND column_name = 'event_ts'"
+    ).fetchone()[0] > 0
+    rebuild = full_refresh or not has_table or any(f[3] == 'rewritten' for f in files)
+    if rebuild:
+        _reset_events(con)
+
+    tasks = []
+    for path, identity, size, status, mark in files:
+        if not rebuild and status == 'unchanged':
+            continue
+        start = 0 if rebuild or status == 'new' else mark[2]
+        prev_lines = 0 if rebuild or status == 'new' else mark[3]
+        end = size if _is_compressed(path) else _last_complete_line_end(path, start, size)
+        if end > start:
+            tasks.append((path, batch_id, start, prev_lines, end, size, identity))
+
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as pool:
+        results = list(pool.map(lambda task: _ingest_event_file(con, *task), tasks))
+
+    new_lines = sum(r[0] for r in results)
+    loaded = sum(r[1] for r in results)
+    quarantined = sum(r[2] for r in results)
+    return new_lines, loaded, quarantined, rebuild
+
+
+def _load_table_sql(reader, **options):
+    """
+    Full-refresh load of small sources, tagging each row with its provenance.
+    DuckDB's readers detect gzip/zstd compression from the file extension.
+    Takes two bound parameters, the batch id and the list of file paths, so
+    no path is ever spliced into the SQL text.
+    """
+    extra = ''.join(f", {key}={value}" for key, value in options.items())
+    return f"""
+        SELECT * EXCLUDE (filename), filename as source_file, ? as ingest_batch_id
+        FROM {reader}(?{extra}, filename=True, union_by_name=True)
+    """
+
+
+def _require_sources(dataset, patterns):
+    """Resolves a dataset's patterns, failing clearly when they match no file."""
+    paths = resolve_sources(patterns)
+    if not paths:
+        shown = patterns if isinstance(patterns, str) else ', '.join(patterns)
+        raise FileNotFoundError(f"No {dataset} source files match: {shown}")
+    return paths
+
+
+def source_patterns(sources=None, manifest=None):
+    """Merges the default data/ files with a JSON manifest and explicit overrides."""
+    patterns = dict(DEFAULT_SOURCES)
+    if manifest:
+        patterns.update(load_manifest(manifest))
+    if sources:
+        patterns.update(sources)
+    return patterns
+
+
+def load_marketing(con, sources=None, manifest=None, batch_id=None):
+    """Marketing Spend: Forced to VARCHAR to prevent premature type-casting errors."""
+    batch_id = batch_id or uuid.uuid4().hex
+    mkt_paths = _require_sources('marketing', source_patterns(sources, manifest)['marketing'])
+    con.execute(f"CREATE OR REPLACE TABLE bronze_marketing AS {_load_table_sql('read_csv_auto', all_varchar=True)}",
+                [batch_id, mkt_paths])
+    rows = con.execute("SELECT COUNT(*) FROM bronze_marketing").fetchone()[0]
+    return {'rows_in': rows, 'rows_out': rows, 'rows_quarantined': 0}
+
+
+def load_subscriptions(con, sources=None, manifest=None, batch_id=None):
+    """Subscriptions: Loaded via native JSON reader."""
+    batch_id = batch_id or uuid.uuid4().hex
+    sub_paths = _require_sources('subscriptions', source_patterns(sources, manifest)['subscriptions'])
+    con.execute(f"CREATE OR REPLACE TABLE bronze_subscriptions AS {_load_table_sql('read_json_auto')}",
+                [batch_id, sub_paths])
+    rows = con.execute("SELECT COUNT(*) FROM bronze_subscriptions").fetchone()[0]
+    return {'rows_in': rows, 'rows_out': rows, 'rows_quarantined': 0}
+
+
+def load_events(con, full_refresh=False, sources=None, manifest=None, threads=None, batch_id=None):
+    """Events: Incremental, offset-tracked, parallel load (see ingest_events)."""
+    event_paths = resolve_sources(source_patterns(sources, manifest)['events'])
+    new_lines, loaded_rows, corrupted_count, rebuilt = ingest_events(
+        con, event_paths, full_refresh=full_refresh, threads=threads, batch_id=batch_id
+    )
+
+    # Corruption is reported straight from the quarantine table
+    total_corrupted = con.execute("SELECT COUNT(*) FROM quarantine_raw_events").fetchone()[0]
+
+    mode = "Full rebuild" if rebuilt else "Incremental append"
+    print(f"{mode} of {len(event_paths)} event file(s): {loaded_rows} new rows from {new_lines} lines.")
+    print(f"Bronze events complete. Quarantined {corrupted_count} corrupted rows ({total_corrupted} in quarantine_raw_events).")
+    return {'rows_in': new_lines, 'rows_out': loaded_rows, 'rows_quarantined': corrupted_count}
+
+
+def run_bronze(con, full_refresh=False, sources=None, manifest=None, threads=None):
     """
     Ingests raw data into the Bronze layer using high-performance DuckDB native readers.
-    
+
     This function implements a 'Schema-on-Read' strategy:
     1. Marketing Spend: Forced to VARCHAR to prevent premature type-casting errors.
     2. Subscriptions: Loaded via native JSON reader.
-    3. Events (NDJSON): Uses DuckDB's C++ engine with explicit column mapping. 
-       By mapping all columns to VARCHAR, we ensure 'user_id' is present and the 
-       'amount' trap ("ten") is safely ingested as text.
+    3. Events (NDJSON): Uses DuckDB's C++ engine with explicit column mapping.
+       Fields are read as text and projected per schema_version, then
+       timestamp, amount, tax and schema_version are cast once into typed
+       columns. A value that fails its cast (the "ten" amount) is kept as text
+       in raw_<field>, so nothing is lost and the happy path is stored typed.
+       Ingestion is incremental: a per-file watermark (byte offset, line count,
+       file identity) in bronze_file_watermarks means only newly appended lines
+       are parsed. A rewritten or truncated file triggers a full rebuild.
+       Unparseable lines are captured in quarantine_raw_events in the same pass.
+
+    Each dataset defaults to its file in data/, but can be pointed at glob
+    patterns (plain, .gz or .zst) via `sources` or a JSON `manifest`, e.g.
+    {'events': 'landing/events-*.ndjson.gz'}. Event files are ingested in
+    parallel on `threads` workers; every Bronze row records its source_file and
+    this run's ingest_batch_id.
+
+    The three loads are independent; process.py schedules them as separate
+    DAG steps, this function simply runs them in order.
     """
     print("--- Starting Bronze Layer: Ingestion ---")
-    
+    batch_id = uuid.uuid4().hex
+
     # 1. Marketing Spend
-    mkt_path = os.path.join(DATA_DIR, 'marketing_spend.csv')
-    con.execute(f"CREATE OR REPLACE TABLE bronze_marketing AS SELECT * FROM read_csv_auto('{mkt_path}', all_varchar=True)")
-    
+    load_marketing(con, sources, manifest, batch_id)
+
     # 2. Subscriptions
-    sub_path = os.path.join(DATA_DIR, 'subscriptions.json')
-    con.execute(f"CREATE OR REPLACE TABLE bronze_subscriptions AS SELECT * FROM read_json_auto('{sub_path}')")
-
-    # 3. Events: Optimized High-Performance Load
-    event_path = os.path.join(DATA_DIR, 'events.ndjson')
-    
-    # We define the full schema as VARCHAR to ensure no columns are dropped 
-    # and no data-type errors (like 'ten') stop the ingestion.
-    con.execute(f"""
-        CREATE OR REPLACE TABLE bronze_events AS 
-        SELECT * FROM read_json_auto(
-            '{event_path}', 
-            ignore_errors=True, 
-            format='newline_delimited',
-            columns={{
-                'event_id': 'VARCHAR',
-                'user_id': 'VARCHAR',
-                'event_type': 'VARCHAR',
-                'timestamp': 'VARCHAR',
-                'amount': 'VARCHAR',
-                'currency': 'VARCHAR',
-                'refers_to_event_id': 'VARCHAR'
-            }}
-        )
-    """)
+    load_subscriptions(con, sources, manifest, batch_id)
 
-    # Calculate Corruption
-    total_lines = sum(1 for _ in open(event_path, 'r', encoding='utf-8'))
-    loaded_rows = con.execute("SELECT count(*) FROM bronze_events").fetchone()[0]
-    corrupted_count = total_lines - loaded_rows
-    
-    print(f"Bronze complete. Quarantined {corrupted_count} corrupted rows.")
\ No newline at end of file
+    # 3. Events: Incremental, offset-tracked, parallel load
+    load_events(con, full_refresh, sources, manifest, threads, batch_id)
@@ -0,0 +1,72 @@
+import json
+import os
+
+# DuckDB settings applied to the pipeline connection; None keeps DuckDB's default
+DUCKDB_SETTINGS = ('memory_limit', 'temp_directory', 'threads', 'preserve_insertion_order')
+
+DEFAULT_CONFIG = {
+    'memory_limit': None,              # e.g. '12GB'; beyond it DuckDB spills to temp_directory
+    'temp_directory': None,            # spill location for sorts, windows and aggregates
+    'threads': None,                   # DuckDB worker threads
+    'preserve_insertion_order': None,  # false lets large scans and inserts stream without ordering buffers
+    # Out-of-core mode: set either to process events in chunks on full rebuilds
+    'chunk_days': None,                # Gold stages and aggregates silver_events this many days at a time
+    'chunk_buckets': None,             # Silver dedupes and rolls up users in this many hash buckets
+    # Bot rule: bot_min_events events within bot_window_seconds (None keeps Silver's > 20 in 1 second)
+    'bot_min_events': None,
+    'bot_window_seconds': None,
+}
+
+# Environment overrides, e.g. AUDICIN_MEMORY_LIMIT=12GB
+ENV_PREFIX = 'AUDICIN_'
+
+
+def _parse(key, value):
+    if key in ('threads', 'chunk_days', 'chunk_buckets', 'bot_min_events'):
+        return int(value)
+    if key == 'bot_window_seconds':
+        return float(value)
+    if key == 'preserve_insertion_order' and isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return value
+
+
+def load_config(config_path=None, environ=None):
+    """
+    Builds the run configuration: DEFAULT_CONFIG, then the JSON file at
+    `config_path` (if any), then AUDICIN_<KEY> environment variables.
+    Unknown keys in the file are rejected so typos don't silently fall back.
+    """
+    environ = os.environ if environ is None else environ
+    config = dict(DEFAULT_CONFIG)
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_CONFIG)
+        if unknown:
+            raise ValueError(f"Unknown config keys in {config_path}: {', '.join(sorted(unknown))}")
+        config.update(overrides)
+    for key in DEFAULT_CONFIG:
+        value = environ.get(ENV_PREFIX + key.upper())
+        if value not in (None, ''):
+            config[key] = value
+    return {key: _parse(key, value) if value is not None else None for key, value in config.items()}
+
+
+def apply_config(con, config):
+    """
+    SETs the configured DuckDB options on `con`. They are global settings, so
+    every cursor the step DAG opens on the connection inherits them.
+    """
+    for key in DUCKDB_SETTINGS:
+        value = config.get(key)
+        if value is None:
+            continue
+        if key == 'temp_directory':
+            os.makedirs(value, exist_ok=True)
+        if isinstance(value, bool):
+            con.execute(f"SET {key} = {str(value).lower()}")
+        elif isinstance(value, int):
+            con.execute(f"SET {key} = {value}")
+        else:
+            con.execute(f"SET {key} = '{value}'")
@@ -0,0 +1,251 @@
+import datetime
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Step:
+    """A named unit of pipeline work and the steps it depends on."""
+
+    def __init__(self, name, func, deps=(), fingerprint=None, fingerprint_after=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.fingerprint = fingerprint
+        self.fingerprint_after = fingerprint_after
+
+
+def _ensure_cache_table(con):
+    """Fingerprint of each step's inputs as of its last successful run."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_step_cache (
+            step_name VARCHAR PRIMARY KEY,
+            fingerprint VARCHAR,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def _peak_rss_mb():
+    """Process-wide resident memory high-water mark (ru_maxrss is KB on Linux, bytes on macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+class ProfiledCursor:
+    """
+    Wraps a DuckDB cursor so every execute() writes its own JSON query profile
+    (<prefix>_NNN.json). PRAGMA profiling_output only keeps the last statement,
+    so the target file is switched before each one.
+    """
+
+    def __init__(self, cur, prefix):
+        self._cur = cur
+        self._prefix = prefix
+        self.profiles = []
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+        cur.execute("PRAGMA enable_profiling='json'")
+
+    def execute(self, query, parameters=None):
+        path = f"{self._prefix}_{len(self.profiles) + 1:03d}.json"
+        self._cur.execute(f"PRAGMA profiling_output='{path}'")
+        result = self._cur.execute(query, parameters)
+        self.profiles.append(path)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class PipelineDAG:
+    """
+    Minimal step-DAG executor for the Medallion pipeline.
+
+    Steps declare their dependencies explicitly; any step whose dependencies
+    have finished is started right away on its own DuckDB cursor, so
+    independent branches (e.g. marketing vs events) overlap and end-to-end
+    latency follows the critical path rather than the sum of all steps.
+    """
+
+    def __init__(self):
+        self.steps = {}
+
+    def add_step(self, name, func, deps=(), fingerprint=None, fingerprint_after=False):
+        """
+        Registers `func(con)` under `name`. Dependencies must already be
+        registered, which also rules out cycles.
+
+        `fingerprint(con)` returns a string identifying the step's own inputs
+        (source file stats, settings). The step's full fingerprint also covers
+        those of its dependencies, so it changes whenever anything upstream
+        produced new output. Steps without one are never skipped, and neither
+        is anything downstream of them. With `fingerprint_after`, the
+        fingerprint is taken again once the step succeeds and that is what is
+        recorded, for fingerprints that cover the step's own output (files it
+        writes), which the step itself changes.
+        """
+        if name in self.steps:
+            raise ValueError(f"Duplicate step: {name}")
+        missing = [d for d in deps if d not in self.steps]
+        if missing:
+            raise ValueError(f"Step {name} depends on unknown step(s): {', '.join(missing)}")
+        self.steps[name] = Step(name, func, deps, fingerprint, fingerprint_after)
+        return self
+
+    def downstream(self, names):
+        """Returns `names` plus every step that transitively depends on them."""
+        unknown = [n for n in names if n not in self.steps]
+        if unknown:
+            raise ValueError(f"Unknown step(s): {', '.join(unknown)}")
+        selected = set(names)
+        # Registration order is a topological order, so one pass suffices
+        for step in self.steps.values():
+            if any(d in selected for d in step.deps):
+                selected.add(step.name)
+        return selected
+
+    def run(self, con, only=None, max_workers=None, profile_dir=None, skip_unchanged=False, cache_salt=''):
+        """
+        Executes the DAG (or, with `only`, those steps and everything downstream
+        of them) and returns {step_name: seconds} for the steps that ran.
+        Dependencies outside the selection are treated as already satisfied by
+        earlier runs.
+
+        With `skip_unchanged`, a step whose fingerprint (see add_step, salted
+        with `cache_salt`) matches its last successful run is skipped and
+        listed in self.skipped. Fingerprints of successful steps are saved to
+        pipeline_step_cache either way.
+
+        Per-step metrics (timings, row counts a step returns, memory, and with
+        `profile_dir` one JSON query profile per statement) are collected in
+        self.metrics, including for the step that failed.
+
+        On the first failure no new steps are started; running ones finish and
+        the original exception is re-raised.
+        """
+        selected = self.downstream(only) if only else set(self.steps)
+        pending = {name: {d for d in self.steps[name].deps if d in selected} for name in selected}
+        durations = {}
+        running = {}
+        error = None
+        self.metrics = []
+        self.skipped = []
+
+        _ensure_cache_table(con)
+        self._cached = dict(con.execute("SELECT step_name, fingerprint FROM pipeline_step_cache").fetchall())
+        # Steps outside the selection keep the fingerprint of their last success
+        self.fingerprints = {n: self._cached.get(n) for n in self.steps if n not in selected}
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(selected) or 1) as pool:
+            while pending or running:
+                if error is None:
+                    ready = [n for n in self.steps if n in pending and not pending[n]]
+                    for name in ready:
+                        del pending[name]
+                        future = pool.submit(self._run_step, con, self.steps[name], profile_dir,
+                                             skip_unchanged, cache_salt)
+                        running[future] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        metrics = future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    if metrics['status'] == 'success':
+                        durations[name] = metrics['duration_s']
+                    for deps in pending.values():
+                        deps.discard(name)
+
+        self._save_fingerprints(con)
+        if error is not None:
+            raise error
+        return durations
+
+    def _fingerprint(self, con, step, salt):
+        """Hash of the step's own inputs and its dependencies' fingerprints, or None if any is unknown."""
+        if step.fingerprint is None:
+            return None
+        upstream = [self.fingerprints.get(d) for d in step.deps]
+        if any(f is None for f in upstream):
+            return None
+        parts = [salt, step.name, str(step.fingerprint(con))] + upstream
+        return hashlib.sha256('\x00'.join(parts).encode()).hexdigest()
+
+    def _save_fingerprints(self, con):
+        """Records successful steps; a failed step may have left partial output, so it is forgotten."""
+        for m in self.metrics:
+            fingerprint = self.fingerprints.get(m['step_name'])
+            if m['status'] == 'success' and fingerprint:
+                con.execute(
+                    "INSERT OR REPLACE INTO pipeline_step_cache VALUES (?, ?, now()::TIMESTAMP)",
+                    [m['step_name'], fingerprint]
+                )
+            elif m['status'] == 'failed':
+                con.execute("DELETE FROM pipeline_step_cache WHERE step_name = ?", [m['step_name']])
+
+    def _run_step(self, con, step, profile_dir=None, skip_unchanged=False, cache_salt=''):
+        raw = con.cursor()
+        fingerprint = self._fingerprint(raw, step, cache_salt)
+        self.fingerprints[step.name] = fingerprint
+        if skip_unchanged and fingerprint is not None and self._cached.get(step.name) == fingerprint:
+            raw.close()
+            now = datetime.datetime.now()
+            metrics = {'step_name': step.name, 'started_at': now, 'finished_at': now, 'duration_s': 0.0,
+                       'status': 'skipped', 'error': None}
+            self.metrics.append(metrics)
+            self.skipped.append(step.name)
+            print(f"[step] {step.name} skipped (inputs unchanged)")
+            return metrics
+        cur = raw
+        if profile_dir:
+            cur = ProfiledCursor(raw, os.path.join(profile_dir, step.name, 'statement'))
+        metrics = {
+            'step_name': step.name,
+            'started_at': datetime.datetime.now(),
+            'status': 'success',
+            'error': None,
+        }
+        start = time.time()
+        try:
+            stats = step.func(cur)
+            if step.fingerprint_after:
+                self.fingerprints[step.name] = self._fingerprint(raw, step, cache_salt)
+        except Exception as e:
+            stats = None
+            metrics.update(status='failed', error=str(e))
+            raise
+        finally:
+            duration = time.time() - start
+            if profile_dir:
+                raw.execute("PRAGMA disable_profiling")
+            metrics.update(
+                finished_at=datetime.datetime.now(),
+                duration_s=duration,
+                peak_rss_mb=_peak_rss_mb(),
+                duckdb_memory_mb=raw.execute(
+                    "SELECT SUM(memory_usage_bytes) / 1048576 FROM duckdb_memory()"
+                ).fetchone()[0],
+                profiles=getattr(cur, 'profiles', []),
+            )
+            # Steps may return {'rows_in', 'rows_out', 'rows_quarantined'}
+            if not isinstance(stats, dict):
+                stats = {}
+            for key in ('rows_in', 'rows_out', 'rows_quarantined'):
+                metrics[key] = stats.get(key)
+            raw.close()
+            self.metrics.append(metrics)
+        print(f"[step] {step.name} finished in {duration:.2f}s")
+        return metrics
@@ -0,0 +1,168 @@
+import duckdb
+import os
+import shutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPORT_DIR = os.path.join(BASE_DIR, 'lakehouse')
+
+# Rows per Parquet row group; each group carries min/max statistics per column
+ROW_GROUP_SIZE = 122880
+
+# Table -> date expression used for its year=/month=/day= partitions
+PARTITIONED_TABLES = {
+    'silver_events': 'event_ts',
+    'daily_active_users': 'date',
+    'daily_revenue_gross': 'date',
+    'daily_revenue_net': 'date',
+}
+
+
+def _table_exists(con, name):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()[0] > 0
+
+
+def _silver_generation(con):
+    """Current silver_events build id, or None if Silver never recorded one."""
+    if not _table_exists(con, 'silver_watermarks'):
+        return None
+    row = con.execute(
+        "SELECT generation FROM silver_watermarks WHERE source_table = 'bronze_events'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _has_column(con, table, column):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_columns() WHERE table_name = ? AND column_name = ?", [table, column]
+    ).fetchone()[0] > 0
+
+
+def _ensure_watermark_table(con):
+    # Positions from before change ids were rowids; dropping them forces a full export
+    if _table_exists(con, 'export_watermarks') and not _has_column(con, 'export_watermarks', 'last_change_id'):
+        con.execute("DROP TABLE export_watermarks")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            target VARCHAR PRIMARY KEY,
+            silver_generation VARCHAR,
+            last_change_id BIGINT,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def _partition_dir(export_dir, table, day):
+    if day is None:
+        return os.path.join(export_dir, table, 'year=NULL', 'month=NULL', 'day=NULL')
+    return os.path.join(export_dir, table, f'year={day.year}', f'month={day.month}', f'day={day.day}')
+
+
+def _copy_partitioned(con, table, date_col, target, where="TRUE", mode='OVERWRITE'):
+    """
+    Writes `table` as year=/month=/day= partitioned Parquet. Rows are sorted by
+    the date column first so each row group covers a tight min/max range.
+    """
+    con.execute(f"""
+        COPY (
+            SELECT *,
+                   year({date_col}) as year,
+                   month({date_col}) as month,
+                   day({date_col}) as day
+            FROM {table}
+            WHERE {where}
+            ORDER BY {date_col}
+        ) TO '{target.replace("'", "''")}' (
+            FORMAT PARQUET,
+            PARTITION_BY (year, month, day),
+            ROW_GROUP_SIZE {ROW_GROUP_SIZE},
+            {mode}
+        )
+    """)
+
+
+def _export_silver_events(con, export_dir, full_refresh):
+    """
+    silver_events is exported incrementally: only the partitions of dates in
+    Silver's change log since the last export are removed and rewritten.
+    Anything else (first export, Silver rebuilt) rewrites every partition.
+    """
+    target = os.path.join(export_dir, 'silver_events')
+    generation = _silver_generation(con)
+    mark = con.execute(
+        "SELECT silver_generation, last_change_id FROM export_watermarks WHERE target = 'silver_events'"
+    ).fetchone()
+    has_log = _has_column(con, 'silver_event_changes', 'change_id')
+    last = con.execute(
+        "SELECT COALESCE(MAX(change_id), 0) FROM silver_event_changes"
+    ).fetchone()[0] if has_log else 0
+
+    # Silver never trims changes past a reader's position in its generation
+    incremental = (
+        not full_refresh and generation is not None and has_log and os.path.isdir(target)
+        and mark is not None and mark[0] == generation
+    )
+    if not incremental:
+        _copy_partitioned(con, 'silver_events', 'event_ts', target)
+        partitions = None
+    else:
+        days = [r[0] for r in con.execute(f"""
+            SELECT DISTINCT event_date FROM silver_event_changes WHERE change_id > {mark[1]}
+        """).fetchall()]
+        for day in days:
+            shutil.rmtree(_partition_dir(export_dir, 'silver_events', day), ignore_errors=True)
+        if days:
+            con.execute("CREATE OR REPLACE TEMP TABLE export_changed_dates (event_date DATE)")
+            con.executemany("INSERT INTO export_changed_dates VALUES (?)", [[d] for d in days])
+            _copy_partitioned(
+                con, 'silver_events', 'event_ts', target,
+                where="EXISTS (SELECT 1 FROM export_changed_dates c WHERE c.event_date IS NOT DISTINCT FROM event_ts::DATE)",
+                mode='OVERWRITE_OR_IGNORE'
+            )
+            con.execute("DROP TABLE export_changed_dates")
+        partitions = len(days)
+
+    con.execute(
+        "INSERT OR REPLACE INTO export_watermarks VALUES ('silver_events', ?, ?, now()::TIMESTAMP)",
+        [generation, last]
+    )
+    return partitions
+
+
+def export_fingerprint(con, export_dir=EXPORT_DIR):
+    """
+    Which of the tables run_export writes have their export directory, so a
+    removed table directory triggers a re-export. Taken after the export (see
+    PipelineDAG.add_step), when every directory exists.
+    """
+    return ','.join(
+        f"{table}:{os.path.isdir(os.path.join(export_dir, table))}"
+        for table in PARTITIONED_TABLES if _table_exists(con, table)
+    )
+
+
+def run_export(con, export_dir=EXPORT_DIR, full_refresh=False):
+    """
+    Exports silver_events and the daily Gold tables as Hive-partitioned Parquet
+    (<table>/year=YYYY/month=M/day=D/*.parquet) for partition-pruned reads.
+
+    Readers (see query.py) open only the partitions a date range needs and
+    scan them from their own in-memory DuckDB, so dashboards neither lock nor
+    contend on audicin_lakehouse.db.
+    """
+    print("--- Starting Export: Partitioned Parquet ---")
+    os.makedirs(export_dir, exist_ok=True)
+    _ensure_watermark_table(con)
+
+    # 1. Silver events (incremental by changed date)
+    partitions = _export_silver_events(con, export_dir, full_refresh)
+
+    # 2. Daily Gold tables are one row per date, so they are simply rewritten
+    for table, date_col in PARTITIONED_TABLES.items():
+        if table == 'silver_events' or not _table_exists(con, table):
+            continue
+        _copy_partitioned(con, table, date_col, os.path.join(export_dir, table))
+
+    scope = "all partitions" if partitions is None else f"{partitions} changed partition(s)"
+    print(f"Export complete. silver_events: {scope} written to {export_dir}.")
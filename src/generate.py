@@ -0,0 +1,254 @@
+import argparse
+import duckdb
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+START_DATE = '2026-01-01'
+CHANNELS = ('Google', 'Facebook', 'TikTok', 'Influencer')
+PLANS = (('basic', 9.99), ('pro', 19.99), ('team', 49.99))
+PURCHASE_AMOUNTS = (9.99, 19.99, 49.99, 99.0)
+
+# Trap rates, tuned to the shipped data/ files
+BOT_BURST_EVERY = 20000      # one burst of BOT_BURST_SIZE same-second events per N rows
+BOT_BURST_SIZE = 25          # > the 20 events/second bot threshold
+MALFORMED_EVERY = 7000       # one non-JSON line per N rows
+DUPLICATE_RATE = 0.015       # rows that re-emit an earlier event_id
+SPACE_TS_RATE = 0.113        # 'YYYY-MM-DD HH:MM:SS'
+OFFSET_TS_RATE = 0.002       # 'YYYY-MM-DDTHH:MM:SS+hhmm'
+MISSING_USER_RATE = 0.0001
+TEN_AMOUNT_RATE = 0.00001    # the "ten" amount, besides the one always planted
+
+
+def _rand(key, seed, col='i'):
+    """Deterministic uniform [0, 1) per row, independent for each `key`."""
+    return f"((hash({col}, {seed}, '{key}') % 1000000) / 1000000.0)"
+
+
+def _pick(values, key, seed, col='i'):
+    items = ", ".join(repr(v) for v in values)
+    return f"([{items}])[1 + (hash({col}, {seed}, '{key}') % {len(values)})::INT]"
+
+
+def _events_sql(lo, hi, events, users, days, seed):
+    """
+    One SELECT producing the raw NDJSON lines for rows [lo, hi) of the
+    synthetic event stream. Every attribute is a hash of (row, seed, key), so
+    any shard can be generated independently and the output is reproducible.
+    """
+    r = lambda key: _rand(key, seed)
+    ten_row = events // 2
+    return f"""
+        WITH base AS (
+            SELECT
+                i,
+                i % {BOT_BURST_EVERY} < {BOT_BURST_SIZE} AND i >= {BOT_BURST_SIZE} as is_burst,
+                i % {MALFORMED_EVERY} = {MALFORMED_EVERY - 1} as is_malformed,
+                -- Duplicates re-use the id of a recent row with fresh content
+                CASE WHEN {r('dup')} < {DUPLICATE_RATE} AND i > 0
+                     THEN i - 1 - (hash(i, {seed}, 'dup_of') % LEAST(i, 1000))
+                     ELSE i END as id_num,
+                hash(i, {seed}, 'user') % {users} as user_num,
+                TIMESTAMP '{START_DATE}' + to_seconds(({r('ts')} * {days * 86400})::BIGINT) as ts,
+                {r('type')} as type_r,
+                {r('fmt')} as fmt_r
+            FROM range({lo}, {hi}) t(i)
+        ),
+        shaped AS (
+            SELECT
+                *,
+                CASE
+                    WHEN is_burst THEN 'u' || lpad(({users} + (i // {BOT_BURST_EVERY}) % 3)::VARCHAR, 4, '0')
+                    ELSE 'u' || lpad(user_num::VARCHAR, 4, '0')
+                END as user_id,
+                -- Bursts share one timestamp string per burst
+                CASE WHEN is_burst
+                     THEN TIMESTAMP '{START_DATE}' + to_seconds((hash(i // {BOT_BURST_EVERY}, {seed}, 'burst') % {days * 86400})::BIGINT)
+                     ELSE ts END as event_time,
+                CASE
+                    WHEN i = {ten_row} THEN 'purchase'
+                    WHEN is_burst THEN 'login'
+                    WHEN type_r < 0.725 THEN 'login'
+                    WHEN type_r < 0.945 THEN 'page_view'
+                    WHEN type_r < 0.983 THEN 'purchase'
+                    WHEN type_r < 0.990 THEN 'refund'
+                    ELSE 'signup'
+                END as event_type,
+                -- Schema drift: v1 dominates the first fifth of the period
+                CASE WHEN ts < TIMESTAMP '{START_DATE}' + INTERVAL {max(days // 5, 1)} DAY
+                          AND {r('v1')} < 0.9 THEN 1 ELSE 2 END as schema_version
+            FROM base
+        ),
+        fields AS (
+            SELECT
+                *,
+                CASE
+                    WHEN is_burst THEN strftime(event_time, '%Y-%m-%dT%H:%M:%SZ')
+                    WHEN fmt_r < {OFFSET_TS_RATE}
+                        THEN strftime(event_time + INTERVAL 2 HOUR, '%Y-%m-%dT%H:%M:%S') || '+0200'
+                    WHEN fmt_r < {OFFSET_TS_RATE + SPACE_TS_RATE}
+                        THEN strftime(event_time, '%Y-%m-%d %H:%M:%S')
+                    ELSE strftime(event_time, '%Y-%m-%dT%H:%M:%SZ')
+                END as ts_text,
+                CASE
+                    WHEN i = {ten_row} OR {r('ten')} < {TEN_AMOUNT_RATE} THEN '"ten"'
+                    ELSE {_pick(PURCHASE_AMOUNTS, 'amount', seed)}::DOUBLE::VARCHAR
+                END as amount_text,
+                {_pick(('USD', 'USD', 'USD', 'EUR', 'NGN'), 'currency', seed)} as currency,
+                {_pick(('/home', '/pricing', '/dashboard', '/settings', '/checkout'), 'page', seed)} as page,
+                {_pick(CHANNELS, 'channel', seed)} as channel,
+                {r('tax')} < 0.23 as has_tax,
+                {r('nouser')} < {MISSING_USER_RATE} as missing_user
+            FROM shaped
+        )
+        SELECT
+            CASE
+                WHEN is_malformed AND i % 2 = 0 THEN concat('{{"event_id":"bad', i, '", "user_id":')
+                WHEN is_malformed THEN 'not a json line at all'
+                ELSE concat(
+                    '{{"event_id": "e', id_num, '"',
+                    CASE WHEN missing_user THEN '' ELSE concat(', "user_id": "', user_id, '"') END,
+                    ', "event_type": "', CASE WHEN schema_version = 1 AND event_type IN ('page_view', 'refund')
+                                              THEN 'login' ELSE event_type END, '"',
+                    ', "timestamp": "', ts_text, '"',
+                    ', "schema_version": ', schema_version,
+                    CASE
+                        WHEN event_type = 'page_view' AND schema_version = 2
+                            THEN concat(', "page": "', page, '"')
+                        WHEN event_type = 'signup'
+                            THEN concat(', "acquisition_channel": "', channel, '"')
+                        WHEN event_type = 'purchase' AND schema_version = 1
+                            THEN concat(', "amount": ', amount_text)
+                        WHEN event_type = 'purchase'
+                            THEN concat(', "amount": ', amount_text, ', "currency": "', currency, '"',
+                                        CASE WHEN has_tax THEN ', "tax": 0.5' ELSE '' END)
+                        WHEN event_type = 'refund' AND schema_version = 2
+                            THEN concat(', "amount": ', amount_text, ', "currency": "', currency, '"',
+                                        CASE WHEN has_tax THEN ', "tax": 0.5' ELSE '' END,
+                                        ', "refers_to_event_id": "e', GREATEST(i - 1, 0), '"')
+                        ELSE ''
+                    END,
+                    '}}'
+                )
+            END as line
+        FROM fields
+        ORDER BY i
+    """
+
+
+def _marketing_sql(days, seed):
+    """Daily spend per channel, with missing days, exact duplicates and one negative spend."""
+    channels = ", ".join(f"'{c}'" for c in CHANNELS)
+    return f"""
+        WITH spend AS (
+            SELECT
+                (DATE '{START_DATE}' + d::INT) as date,
+                channel,
+                ROUND(1000 + (hash(d, channel, {seed}, 'spend') % 100000) / 50.0, 2) as spend,
+                (hash(d, channel, {seed}, 'gap') % 100) < 15 as missing,
+                (hash(d, channel, {seed}, 'dup') % 100) < 3 as duplicated
+            FROM range({days}) t(d), unnest([{channels}]) c(channel)
+        )
+        SELECT strftime(date, '%Y-%m-%d') as date, channel,
+               CASE WHEN date = DATE '{START_DATE}' + 7 AND channel = 'Google' THEN -500.0 ELSE spend END as spend
+        FROM spend, range(2) copies(n)
+        WHERE (NOT missing OR (date = DATE '{START_DATE}' + 7 AND channel = 'Google'))
+          AND (n = 0 OR duplicated)
+        ORDER BY date, channel
+    """
+
+
+def _subscriptions_sql(users, days, seed):
+    """
+    Up to two subscriptions per user. A small share of subscription_ids is
+    emitted twice with the same created_at and a flipped status.
+    """
+    plans = ", ".join(f"{{'plan_id': '{p}', 'price': {price}}}" for p, price in PLANS)
+    return f"""
+        WITH subs AS (
+            SELECT
+                u, n,
+                ([{plans}])[1 + (hash(u, n, {seed}, 'plan') % {len(PLANS)})::INT] as plan,
+                TIMESTAMP '{START_DATE}' + to_days((hash(u, n, {seed}, 'start') % {days})::INT)
+                    + to_hours((hash(u, n, {seed}, 'hour') % 24)::INT) as created,
+                (hash(u, n, {seed}, 'status') % 100) < 50 as canceled,
+                (hash(u, n, {seed}, 'dup') % 1000) < 3 as duplicated
+            FROM range({users}) t(u), range(1, 3) k(n)
+            WHERE (hash(u, n, {seed}, 'has') % 100) < (CASE WHEN n = 1 THEN 60 ELSE 30 END)
+        )
+        SELECT
+            concat('s_u', lpad(u::VARCHAR, 4, '0'), '_', n) as subscription_id,
+            'u' || lpad(u::VARCHAR, 4, '0') as user_id,
+            plan.plan_id as plan_id,
+            plan.price as price,
+            'USD' as currency,
+            strftime(created, '%Y-%m-%d') as start_date,
+            CASE WHEN canceled OR copy = 1
+                 THEN strftime(created + to_days(1 + (hash(u, n, {seed}, 'len') % 20)::INT), '%Y-%m-%d') END as end_date,
+            CASE WHEN canceled OR copy = 1 THEN 'canceled' ELSE 'active' END as status,
+            strftime(created, '%Y-%m-%dT%H:%M:%SZ') as created_at
+        FROM subs, range(2) c(copy)
+        WHERE copy = 0 OR duplicated
+        ORDER BY u, n, copy
+    """
+
+
+def generate_dataset(out_dir, events=100_000, users=None, days=45, seed=42, shards=1, compression=None):
+    """
+    Writes a synthetic events / marketing / subscriptions dataset shaped like
+    data/ at any scale, reproducing its traps: mixed timestamp formats,
+    duplicate event_ids, the "ten" amount, bot bursts, schema_version drift,
+    malformed lines, a negative marketing spend, duplicate marketing rows and
+    duplicate subscriptions.
+
+    Generation runs inside DuckDB (no per-row Python), so 100M events take
+    minutes rather than hours. The same arguments always produce identical
+    files. Returns the `sources` mapping run_bronze accepts.
+    """
+    users = users or max(500, events // 30)
+    os.makedirs(out_dir, exist_ok=True)
+    con = duckdb.connect()
+    try:
+        # 1. Events, split into contiguous row ranges per shard
+        suffix = {None: '', 'gzip': '.gz', 'zstd': '.zst'}[compression]
+        options = "FORMAT CSV, HEADER false, QUOTE '', ESCAPE '', DELIMITER '\x01'"
+        if compression:
+            options += f", COMPRESSION {compression}"
+        event_files = []
+        for shard in range(shards):
+            lo, hi = events * shard // shards, events * (shard + 1) // shards
+            name = 'events.ndjson' if shards == 1 else f'events-{shard:04d}.ndjson'
+            path = os.path.join(out_dir, name + suffix)
+            con.execute(f"COPY ({_events_sql(lo, hi, events, users, days, seed)}) TO '{path}' ({options})")
+            event_files.append(path)
+
+        # 2. Marketing spend
+        marketing = os.path.join(out_dir, 'marketing_spend.csv')
+        con.execute(f"COPY ({_marketing_sql(days, seed)}) TO '{marketing}' (FORMAT CSV, HEADER true)")
+
+        # 3. Subscriptions (a JSON array, like data/subscriptions.json)
+        subscriptions = os.path.join(out_dir, 'subscriptions.json')
+        con.execute(f"""
+            COPY ({_subscriptions_sql(users, days, seed)})
+            TO '{subscriptions}' (FORMAT JSON, ARRAY true)
+        """)
+    finally:
+        con.close()
+
+    events_glob = event_files[0] if shards == 1 else os.path.join(out_dir, f'events-*.ndjson{suffix}')
+    return {'events': events_glob, 'marketing': marketing, 'subscriptions': subscriptions}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic Audicin dataset.")
+    parser.add_argument('out_dir')
+    parser.add_argument('--events', type=int, default=100_000)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--days', type=int, default=45)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--compression', choices=['gzip', 'zstd'])
+    args = parser.parse_args()
+    sources = generate_dataset(args.out_dir, args.events, args.users, args.days,
+                               args.seed, args.shards, args.compression)
+    print(f"Generated {args.events} events: {sources}")
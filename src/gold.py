@@ -1,117 +1,647 @@
+import datetime
 import duckdb
 
-def run_gold(con):
+# Shared intermediates every silver_events-derived Gold table is projected from
+INTERMEDIATE_TABLES = ('gold_daily_metrics', 'gold_user_metrics', 'gold_user_sketches', 'gold_cohort_sketches')
+
+# HyperLogLog sketches: 2^14 registers per sketch, ~0.8% standard error
+HLL_PRECISION = 14
+HLL_REGISTERS = 1 << HLL_PRECISION
+# alpha_m * m^2 from the HyperLogLog estimator
+_HLL_ALPHA_M2 = 0.7213 / (1 + 1.079 / HLL_REGISTERS) * HLL_REGISTERS * HLL_REGISTERS
+
+
+def _stage_human_events(con, where="TRUE"):
     """
-    Produces requirement-compliant Gold tables, filtering out flagged bots.
-    Data is sorted during creation to ensure optimal clustering for columnar storage.
+    The single scan of silver_events per run: bot rows are dropped and each
+    remaining event is reduced to the keys and measures Gold aggregates on.
     """
-    print("--- Starting Gold Layer: Analytics ---")
-    
-    # Reusable snippet for human-only events
-    human_events = "SELECT * FROM silver_events WHERE is_bot = FALSE"
-
-    # 1. daily_active_users
     con.execute(f"""
-        CREATE OR REPLACE TABLE daily_active_users AS 
-        SELECT event_ts::DATE as date, COUNT(DISTINCT user_id) as dau 
-        FROM ({human_events}) 
-        GROUP BY 1
-        ORDER BY date
+        CREATE OR REPLACE TEMP TABLE gold_human_events AS
+        SELECT 
+            event_ts::DATE as date,
+            user_id, event_ts, event_type,
+            CASE WHEN event_type = 'purchase' THEN amount ELSE 0 END as gross_amount,
+            CASE WHEN event_type = 'purchase' THEN amount 
+                 WHEN event_type = 'refund' THEN -amount ELSE 0 END as net_amount
+        FROM silver_events 
+        WHERE is_bot = FALSE AND ({where})
     """)
+    return con.execute("SELECT COUNT(*) FROM gold_human_events").fetchone()[0]
 
-    # 2. daily_revenue_gross
-    con.execute(f"""
-        CREATE OR REPLACE TABLE daily_revenue_gross AS 
-        SELECT event_ts::DATE as date, SUM(amount) as gross_revenue 
-        FROM ({human_events}) 
-        WHERE event_type = 'purchase' 
+
+def _daily_metrics_sql(where="TRUE"):
+    # One pass per date: DAU, revenue and signups together
+    return f"""
+        SELECT 
+            date,
+            COUNT(DISTINCT user_id) as dau,
+            COUNT(*) FILTER (WHERE event_type = 'purchase') as purchase_count,
+            SUM(gross_amount) as gross_revenue,
+            SUM(net_amount) as net_revenue,
+            COUNT(DISTINCT user_id) FILTER (WHERE event_type = 'signup') as signup_count
+        FROM gold_human_events
+        WHERE {where}
         GROUP BY 1
         ORDER BY date
+    """
+
+
+def _user_metrics_sql(where="TRUE"):
+    # Per-user LTV, signup week and active weeks, read from Silver's compact
+    # silver_users dimension instead of re-aggregating the event history
+    return f"""
+        SELECT 
+            user_id,
+            purchase_total - refund_total as user_ltv,
+            signup_week,
+            activity_weeks
+        FROM silver_users
+        WHERE human_events > 0 AND ({where})
+    """
+
+
+def _hll_registers_sql(keys, source, where="TRUE"):
+    """
+    Builds HyperLogLog registers of the user_ids in `source`, one sketch per
+    `keys` group, as (keys..., register, rho) rows. The low HLL_PRECISION bits
+    of hash(user_id) pick the register; rho is the position of the first set
+    bit in the remaining ones. Registers merge with MAX(rho), so sketches of
+    days or weeks roll up to any wider range without rescanning events.
+    """
+    return f"""
+        SELECT 
+            {keys},
+            (h & {HLL_REGISTERS - 1})::SMALLINT as register,
+            MAX(CASE WHEN h >> {HLL_PRECISION} = 0 THEN {64 - HLL_PRECISION + 1}
+                     ELSE {64 - HLL_PRECISION} - floor(log2((h >> {HLL_PRECISION})::DOUBLE))::INT
+                END)::UTINYINT as rho
+        FROM (SELECT *, hash(user_id) as h FROM {source} WHERE user_id IS NOT NULL AND ({where}))
+        GROUP BY ALL
+    """
+
+
+def _user_sketches_sql(where="TRUE"):
+    # One sketch of active human users per date
+    return _hll_registers_sql("date", "gold_human_events", where)
+
+
+def _cohort_sketches_sql(where="TRUE"):
+    # One sketch per (signup_week, activity_week) cell of the retention matrix
+    return _hll_registers_sql(
+        "signup_week, activity_week",
+        "(SELECT user_id, signup_week, unnest(activity_weeks) as activity_week FROM gold_user_metrics)",
+        f"signup_week IS NOT NULL AND ({where})"
+    )
+
+
+def sketch_estimate_sql(sketches, keys, where="TRUE"):
+    """
+    Merges the HLL registers in `sketches` per `keys` group and returns
+    (keys..., estimate). Small cardinalities use linear counting, which is
+    exact in practice for a few thousand users.
+    """
+    return f"""
+        SELECT 
+            {keys},
+            ROUND(CASE WHEN raw <= {2.5 * HLL_REGISTERS} AND zeros > 0 
+                       THEN {HLL_REGISTERS} * ln({HLL_REGISTERS}::DOUBLE / zeros)
+                       ELSE raw END)::BIGINT as estimate
+        FROM (
+            SELECT 
+                {keys},
+                {_HLL_ALPHA_M2}::DOUBLE / (SUM(pow(2.0, -rho::INT)) + ({HLL_REGISTERS} - COUNT(*))) as raw,
+                {HLL_REGISTERS} - COUNT(*) as zeros
+            FROM (
+                SELECT {keys}, register, MAX(rho) as rho 
+                FROM {sketches} 
+                WHERE {where}
+                GROUP BY ALL
+            )
+            GROUP BY ALL
+        )
+    """
+
+
+def active_users_sql(start_date, end_date, exact=False):
+    """
+    Distinct human users active between start_date and end_date (inclusive).
+    By default this merges the stored daily sketches (O(days)); exact=True
+    counts distinct user_ids in silver_events instead (O(events)).
+    """
+    if exact:
+        return f"""
+            SELECT COUNT(DISTINCT user_id) as active_users
+            FROM silver_events
+            WHERE is_bot = FALSE 
+              AND event_ts >= DATE '{start_date}' AND event_ts < DATE '{end_date}' + INTERVAL 1 DAY
+        """
+    return f"""
+        SELECT COALESCE(MAX(estimate), 0) as active_users
+        FROM ({sketch_estimate_sql('gold_user_sketches', "'range' as span", f"date BETWEEN DATE '{start_date}' AND DATE '{end_date}'")})
+    """
+
+
+def cohort_active_users_sql(start_week, end_week, exact=False):
+    """
+    Per signup cohort, the users active at any point in weeks
+    [start_week, end_week]: merged cohort sketches by default, or an exact
+    count from gold_user_metrics.
+    """
+    in_range = f"activity_week BETWEEN DATE '{start_week}' AND DATE '{end_week}'"
+    if exact:
+        return f"""
+            SELECT signup_week, COUNT(DISTINCT user_id) as active_users
+            FROM (SELECT user_id, signup_week, unnest(activity_weeks) as activity_week FROM gold_user_metrics)
+            WHERE signup_week IS NOT NULL AND {in_range}
+            GROUP BY 1
+            ORDER BY signup_week
+        """
+    return f"""
+        SELECT signup_week, estimate as active_users
+        FROM ({sketch_estimate_sql('gold_cohort_sketches', 'signup_week', in_range)})
+        ORDER BY signup_week
+    """
+
+
+def _table_exists(con, name):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()[0] > 0
+
+
+def _silver_generation(con):
+    """Current silver_events build id, or None if Silver never recorded one."""
+    if not _table_exists(con, 'silver_watermarks'):
+        return None
+    row = con.execute(
+        "SELECT generation FROM silver_watermarks WHERE source_table = 'bronze_events'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _has_column(con, table, column):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_columns() WHERE table_name = ? AND column_name = ?", [table, column]
+    ).fetchone()[0] > 0
+
+
+def _ensure_watermark_table(con):
+    # Positions from before change ids were rowids; dropping them forces a rebuild
+    if _table_exists(con, 'gold_watermarks') and not _has_column(con, 'gold_watermarks', 'last_change_id'):
+        con.execute("DROP TABLE gold_watermarks")
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS gold_watermarks (
+            source_table VARCHAR PRIMARY KEY,
+            silver_generation VARCHAR,
+            last_change_id BIGINT,
+            updated_at TIMESTAMP
+        )
     """)
 
-    # 3. daily_revenue_net
+
+def _save_watermark(con, generation):
+    """Records the last silver_event_changes change_id Gold has applied (Silver trims the log behind it)."""
+    last = 0
+    if _has_column(con, 'silver_event_changes', 'change_id'):
+        last = con.execute("SELECT COALESCE(MAX(change_id), 0) FROM silver_event_changes").fetchone()[0]
+    con.execute(
+        "INSERT OR REPLACE INTO gold_watermarks VALUES ('silver_event_changes', ?, ?, now()::TIMESTAMP)",
+        [generation, last]
+    )
+
+
+def _can_refresh_incrementally(con):
+    """
+    Gold can apply Silver's change log only if it has a position in the
+    current Silver generation's log and all of its tables are present. Silver
+    never trims changes past that position.
+    """
+    _ensure_watermark_table(con)
+    generation = _silver_generation(con)
+    if generation is None or not _has_column(con, 'silver_event_changes', 'change_id'):
+        return False
+    if not all(_table_exists(con, t) for t in INTERMEDIATE_TABLES):
+        return False
+    mark = con.execute(
+        "SELECT silver_generation FROM gold_watermarks WHERE source_table = 'silver_event_changes'"
+    ).fetchone()
+    return mark is not None and mark[0] == generation
+
+
+def _date_chunks(con, chunk_days):
+    """
+    silver_events predicates covering consecutive `chunk_days`-day ranges of
+    event_ts (plus undated rows). Every Gold aggregate staged per date is
+    exact within a chunk, so chunks can be aggregated independently.
+    """
+    if not chunk_days:
+        return ["TRUE"]
+    lo, hi, has_null = con.execute("""
+        SELECT MIN(event_ts)::DATE, MAX(event_ts)::DATE, COUNT(*) FILTER (WHERE event_ts IS NULL) > 0
+        FROM silver_events
+    """).fetchone()
+    chunks = []
+    if lo is not None:
+        days = (hi - lo).days + 1
+        for offset in range(0, days, chunk_days):
+            chunks.append(
+                f"event_ts >= DATE '{lo}' + INTERVAL {offset} DAY "
+                f"AND event_ts < DATE '{lo}' + INTERVAL {min(offset + chunk_days, days)} DAY"
+            )
+    if has_null:
+        chunks.append("event_ts IS NULL")
+    return chunks or ["FALSE"]
+
+
+def _rebuild_intermediates(con, chunk_days=None):
+    """
+    Full recompute of the daily and per-user intermediates. Returns rows staged.
+    With chunk_days (out-of-core mode), silver_events is staged and aggregated
+    one date range at a time instead of in a single scan.
+    """
+    con.execute(f"CREATE OR REPLACE TABLE gold_user_metrics AS {_user_metrics_sql()}")
+    con.execute(f"CREATE OR REPLACE TABLE gold_cohort_sketches AS {_cohort_sketches_sql()}")
+    staged = 0
+    for i, chunk in enumerate(_date_chunks(con, chunk_days)):
+        staged += _stage_human_events(con, chunk)
+        write = "CREATE OR REPLACE TABLE {} AS" if i == 0 else "INSERT INTO {}"
+        con.execute(f"{write.format('gold_daily_metrics')} {_daily_metrics_sql()}")
+        con.execute(f"{write.format('gold_user_sketches')} {_user_sketches_sql()} ORDER BY date, register")
+    con.execute("DROP TABLE gold_human_events")
+    return staged
+
+
+def _date_filter(con):
+    """
+    Builds a silver_events predicate for the changed dates. The literal
+    event_ts range lets DuckDB skip row groups via zone maps before the exact
+    date membership check.
+    """
+    lo, hi, has_null = con.execute("""
+        SELECT MIN(event_date), MAX(event_date), COUNT(*) FILTER (WHERE event_date IS NULL) > 0
+        FROM gold_changed_dates
+    """).fetchone()
+    clauses = []
+    if lo is not None:
+        clauses.append(
+            f"(event_ts >= TIMESTAMP '{lo}' AND event_ts < TIMESTAMP '{hi}' + INTERVAL 1 DAY "
+            f"AND event_ts::DATE IN (SELECT event_date FROM gold_changed_dates))"
+        )
+    if has_null:
+        clauses.append("event_ts IS NULL")
+    return " OR ".join(clauses) or "FALSE"
+
+
+def _refresh_changed_keys(con):
+    """
+    Applies only the (user_id, event_date) keys Silver changed since the last
+    run. silver_events is scanned once for rows on a changed date, and those
+    dates of gold_daily_metrics are deleted and re-aggregated from that slice;
+    the changed users of gold_user_metrics are re-read from silver_users.
+
+    HLL registers cannot be un-merged, so the daily sketches of changed dates
+    and the cohort sketches of every signup week a changed user left or joined
+    are rebuilt whole.
+    """
+    last = con.execute(
+        "SELECT last_change_id FROM gold_watermarks WHERE source_table = 'silver_event_changes'"
+    ).fetchone()[0]
     con.execute(f"""
-        CREATE OR REPLACE TABLE daily_revenue_net AS 
-        SELECT event_ts::DATE as date, 
-               SUM(CASE WHEN event_type = 'purchase' THEN amount 
-                        WHEN event_type = 'refund' THEN -amount ELSE 0 END) as net_revenue 
-        FROM ({human_events}) 
-        GROUP BY 1
-        ORDER BY date
+        CREATE OR REPLACE TEMP TABLE gold_changed_dates AS
+        SELECT DISTINCT event_date FROM silver_event_changes WHERE change_id > {last}
     """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE gold_changed_users AS
+        SELECT DISTINCT user_id FROM silver_event_changes WHERE change_id > {last}
+    """)
+
+    by_user = "user_id IN (SELECT user_id FROM gold_changed_users)"
+    staged = _stage_human_events(con, _date_filter(con))
 
-    # 4. mrr_monthly
+    by_date = "EXISTS (SELECT 1 FROM gold_changed_dates c WHERE c.event_date IS NOT DISTINCT FROM date)"
     con.execute("""
-        CREATE OR REPLACE TABLE mrr_monthly AS 
-        SELECT date_trunc('month', created_at)::DATE as month, SUM(price) as mrr 
-        FROM silver_subscriptions 
-        WHERE status = 'active' 
-        GROUP BY 1
-        ORDER BY month
+        DELETE FROM gold_daily_metrics t USING gold_changed_dates c
+        WHERE t.date IS NOT DISTINCT FROM c.event_date
     """)
+    con.execute(f"INSERT INTO gold_daily_metrics {_daily_metrics_sql(by_date)}")
+    con.execute("""
+        DELETE FROM gold_user_sketches t USING gold_changed_dates c
+        WHERE t.date IS NOT DISTINCT FROM c.event_date
+    """)
+    con.execute(f"INSERT INTO gold_user_sketches {_user_sketches_sql(by_date)}")
+
+    cohorts_of_changed_users = f"SELECT signup_week FROM gold_user_metrics WHERE {by_user} AND signup_week IS NOT NULL"
+    con.execute(f"CREATE OR REPLACE TEMP TABLE gold_changed_cohorts AS {cohorts_of_changed_users}")
+    con.execute(f"DELETE FROM gold_user_metrics WHERE {by_user}")
+    con.execute(f"INSERT INTO gold_user_metrics {_user_metrics_sql(by_user)}")
+    con.execute(f"INSERT INTO gold_changed_cohorts {cohorts_of_changed_users}")
+
+    by_cohort = "signup_week IN (SELECT signup_week FROM gold_changed_cohorts)"
+    con.execute(f"DELETE FROM gold_cohort_sketches WHERE {by_cohort}")
+    con.execute(f"INSERT INTO gold_cohort_sketches {_cohort_sketches_sql(by_cohort)}")
+
+    # The gold_changed_* tables stay for _project_event_tables(in_place=True)
+    con.execute("DROP TABLE gold_human_events")
+    return staged
+
+
+# The requirement-facing event tables: (table, projection SQL over the
+# intermediates, the key it is grouped on, and the keys an incremental
+# refresh changed, from the gold_changed_* temp tables)
+EVENT_TABLES = (
+    # 1. daily_active_users
+    ('daily_active_users', lambda where: f"""
+        SELECT date, dau FROM gold_daily_metrics WHERE {where} ORDER BY date
+    """, 'date', "SELECT event_date FROM gold_changed_dates"),
+
+    # 2. daily_revenue_gross
+    ('daily_revenue_gross', lambda where: f"""
+        SELECT date, gross_revenue FROM gold_daily_metrics 
+        WHERE purchase_count > 0 AND ({where})
+        ORDER BY date
+    """, 'date', "SELECT event_date FROM gold_changed_dates"),
+
+    # 3. daily_revenue_net
+    ('daily_revenue_net', lambda where: f"""
+        SELECT date, net_revenue FROM gold_daily_metrics WHERE {where} ORDER BY date
+    """, 'date', "SELECT event_date FROM gold_changed_dates"),
 
     # 5. weekly_cohort_retention
-    con.execute(f"""
-        CREATE OR REPLACE TABLE weekly_cohort_retention AS
-        WITH user_signup AS (
-            SELECT user_id, date_trunc('week', MIN(event_ts)) as signup_week
-            FROM ({human_events}) WHERE event_type = 'signup' GROUP BY 1
-        ),
-        user_activity AS (
-            SELECT DISTINCT user_id, date_trunc('week', event_ts) as activity_week
-            FROM ({human_events})
-        )
+    ('weekly_cohort_retention', lambda where: f"""
         SELECT 
-            s.signup_week, 
-            ((a.activity_week - s.signup_week)/7)::INT as week_number, 
-            COUNT(DISTINCT a.user_id) as active_users
-        FROM user_signup s 
-        JOIN user_activity a ON s.user_id = a.user_id 
+            signup_week, 
+            ((activity_week - signup_week)/7)::INT as week_number, 
+            COUNT(DISTINCT user_id) as active_users
+        FROM (
+            SELECT user_id, signup_week, unnest(activity_weeks) as activity_week
+            FROM gold_user_metrics
+            WHERE signup_week IS NOT NULL AND ({where})
+        )
         GROUP BY 1, 2
         ORDER BY signup_week, week_number
-    """)
+    """, 'signup_week', "SELECT signup_week FROM gold_changed_cohorts"),
 
-  # 6. cac_by_channel
-    con.execute(f"""
-        CREATE OR REPLACE TABLE cac_by_channel AS 
-        WITH channel_signups AS (
-            SELECT 
-                event_ts::DATE as signup_date, 
-                COUNT(DISTINCT user_id) as signup_count
-            FROM ({human_events})
-            WHERE event_type = 'signup'
-            GROUP BY 1
+    # 7. ltv_per_user
+    ('ltv_per_user', lambda where: f"""
+        SELECT user_id, user_ltv FROM gold_user_metrics WHERE {where} ORDER BY user_ltv DESC
+    """, 'user_id', "SELECT user_id FROM gold_changed_users"),
+
+    # WAU / MAU, merged from the daily sketches (approximate, ~0.8% error)
+    ('weekly_active_users', lambda where: f"""
+        SELECT week::DATE as week, estimate as wau
+        FROM ({sketch_estimate_sql(
+            "(SELECT date_trunc('week', date) as week, register, rho FROM gold_user_sketches WHERE date IS NOT NULL)",
+            'week', where)})
+        ORDER BY week
+    """, 'week', "SELECT DISTINCT date_trunc('week', event_date)::DATE FROM gold_changed_dates"),
+    ('monthly_active_users', lambda where: f"""
+        SELECT month::DATE as month, estimate as mau
+        FROM ({sketch_estimate_sql(
+            "(SELECT date_trunc('month', date) as month, register, rho FROM gold_user_sketches WHERE date IS NOT NULL)",
+            'month', where)})
+        ORDER BY month
+    """, 'month', "SELECT DISTINCT date_trunc('month', event_date)::DATE FROM gold_changed_dates"),
+)
+
+
+def _project_event_tables(con, in_place=False):
+    """
+    The requirement-facing Gold tables are cheap projections of the
+    intermediates. A full projection recreates each one; `in_place` (after an
+    incremental refresh) deletes and re-inserts only the rows of the dates,
+    users, cohorts, weeks and months that changed, so a micro-batch touching
+    today rewrites today's rows rather than every table.
+    """
+    for table, projection, key, changed in EVENT_TABLES:
+        if in_place:
+            by_key = f"EXISTS (SELECT 1 FROM ({changed}) c(k) WHERE c.k IS NOT DISTINCT FROM {key})"
+            con.execute(f"DELETE FROM {table} WHERE {by_key}")
+            con.execute(f"INSERT INTO {table} {projection(by_key)}")
+        else:
+            con.execute(f"CREATE OR REPLACE TABLE {table} AS {projection('TRUE')}")
+
+
+def build_event_tables(con, full_refresh=False, chunk_days=None):
+    """
+    Refreshes the two intermediates and projects the event-derived Gold tables
+    (1-3, 5, 7) in one transaction; incremental refreshes update only the
+    changed rows of each. Returns step stats plus whether the refresh was
+    incremental. Full rebuilds stage `chunk_days` days at a time when set.
+    """
+    con.begin()
+    try:
+        incremental = not full_refresh and _can_refresh_incrementally(con)
+        if incremental:
+            staged = _refresh_changed_keys(con)
+            in_place = all(_table_exists(con, t[0]) for t in EVENT_TABLES)
+            _project_event_tables(con, in_place)
+            for tmp in ('gold_changed_dates', 'gold_changed_users', 'gold_changed_cohorts'):
+                con.execute(f"DROP TABLE {tmp}")
+        else:
+            staged = _rebuild_intermediates(con, chunk_days)
+            _project_event_tables(con)
+        _ensure_watermark_table(con)
+        _save_watermark(con, _silver_generation(con))
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+    mode = "incrementally" if incremental else "with clustering (sorting)"
+    print(f"Gold event tables created successfully {mode}.")
+    rows_out = con.execute(
+        "SELECT (SELECT COUNT(*) FROM gold_daily_metrics) + (SELECT COUNT(*) FROM gold_user_metrics)"
+    ).fetchone()[0]
+    return {'rows_in': staged, 'rows_out': rows_out, 'incremental': incremental}
+
+
+def _mrr_intervals_sql():
+    """
+    One row per subscription: its monthly price and the months it bills. A
+    subscription bills every month its [start_date, end_date] interval
+    touches. Without end_date, a canceled one bills through the month it was
+    canceled on, or only its start month if nothing dates the cancellation,
+    and an active one is open-ended (last_month NULL).
+    """
+    return """
+        SELECT subscription_id, user_id, price,
+               date_trunc('month', start_date)::DATE as first_month,
+               date_trunc('month', COALESCE(
+                   end_date, canceled_on, CASE WHEN status = 'active' THEN NULL ELSE start_date END
+               ))::DATE as last_month
+        FROM silver_subscriptions
+        WHERE start_date IS NOT NULL
+    """
+
+
+def _mrr_user_changes_sql(intervals):
+    """
+    Sweep over `intervals`: each subscription adds its price in first_month and
+    removes it the month after last_month. A running sum of those deltas per
+    user gives the user's MRR at every month it changes, next to the MRR it
+    had before, without expanding subscriptions into one row per month.
+    """
+    return f"""
+        WITH deltas AS (
+            SELECT user_id, first_month as month, price as delta FROM {intervals}
+            UNION ALL
+            SELECT user_id, (last_month + INTERVAL 1 MONTH)::DATE, -price FROM {intervals}
+            WHERE last_month IS NOT NULL
+        ),
+        levels AS (
+            SELECT user_id, month,
+                   round(SUM(SUM(delta)) OVER (PARTITION BY user_id ORDER BY month), 2) as mrr
+            FROM deltas
+            GROUP BY user_id, month
         )
-        SELECT 
-            m.channel, 
+        SELECT user_id, month, mrr, prev_mrr FROM (
+            SELECT *, COALESCE(lag(mrr) OVER (PARTITION BY user_id ORDER BY month), 0) as prev_mrr FROM levels
+        )
+        WHERE mrr <> prev_mrr
+    """
+
+
+def build_mrr(con, full_refresh=False, as_of=None):
+    """
+    Interval-based MRR (see _mrr_intervals_sql) with its monthly movements:
+    new (from zero), expansion, contraction and churned (to zero) MRR per
+    user, summed per month, so that mrr = previous mrr + new + expansion -
+    contraction - churned.
+
+    Per-user change points are kept in gold_mrr_user_changes, and the
+    intervals they came from in gold_mrr_intervals. A run diffs the current
+    intervals against the stored ones and recomputes change points only for
+    users whose subscriptions were added or changed. mrr_monthly is then
+    re-aggregated from the change points, sized by users' changes rather than
+    by subscriptions times months. Its months run through the later of the
+    last change and the month of `as_of` (default: today), so open-ended
+    subscriptions carry their MRR up to the current month.
+    """
+    as_of = as_of or datetime.date.today()
+    con.execute(f"CREATE OR REPLACE TEMP TABLE gold_mrr_current AS {_mrr_intervals_sql()}")
+    incremental = not full_refresh and all(
+        _table_exists(con, t) for t in ('gold_mrr_intervals', 'gold_mrr_user_changes', 'mrr_monthly')
+    )
+    con.begin()
+    try:
+        if incremental:
+            # 1. Users with a new, changed or removed subscription interval
+            con.execute("""
+                CREATE OR REPLACE TEMP TABLE gold_mrr_changed_users AS
+                SELECT DISTINCT user_id FROM (
+                    (SELECT * FROM gold_mrr_current EXCEPT SELECT * FROM gold_mrr_intervals)
+                    UNION ALL
+                    (SELECT * FROM gold_mrr_intervals EXCEPT SELECT * FROM gold_mrr_current)
+                )
+            """)
+            changed = """(
+                SELECT i.* FROM gold_mrr_current i
+                SEMI JOIN gold_mrr_changed_users u ON i.user_id IS NOT DISTINCT FROM u.user_id
+            )"""
+            # 2. Swap in their intervals and change points
+            for table in ('gold_mrr_intervals', 'gold_mrr_user_changes'):
+                con.execute(f"""
+                    DELETE FROM {table} t USING gold_mrr_changed_users u
+                    WHERE t.user_id IS NOT DISTINCT FROM u.user_id
+                """)
+            con.execute(f"INSERT INTO gold_mrr_intervals SELECT * FROM {changed}")
+            con.execute(f"INSERT INTO gold_mrr_user_changes {_mrr_user_changes_sql(changed)}")
+            rows_in = con.execute(f"SELECT COUNT(*) FROM {changed}").fetchone()[0]
+            con.execute("DROP TABLE gold_mrr_changed_users")
+        else:
+            con.execute("CREATE OR REPLACE TABLE gold_mrr_intervals AS SELECT * FROM gold_mrr_current")
+            con.execute(f"""
+                CREATE OR REPLACE TABLE gold_mrr_user_changes AS
+                {_mrr_user_changes_sql('gold_mrr_intervals')}
+            """)
+            rows_in = con.execute("SELECT COUNT(*) FROM gold_mrr_intervals").fetchone()[0]
+
+        # 3. mrr_monthly: movements per month over a month spine, MRR as their running sum
+        con.execute(f"""
+            CREATE OR REPLACE TABLE mrr_monthly AS
+            WITH movements AS (
+                SELECT month,
+                       SUM(CASE WHEN prev_mrr = 0 THEN mrr ELSE 0 END) as new_mrr,
+                       SUM(CASE WHEN prev_mrr > 0 AND mrr > prev_mrr THEN mrr - prev_mrr ELSE 0 END) as expansion_mrr,
+                       SUM(CASE WHEN mrr > 0 AND mrr < prev_mrr THEN prev_mrr - mrr ELSE 0 END) as contraction_mrr,
+                       SUM(CASE WHEN mrr = 0 THEN prev_mrr ELSE 0 END) as churned_mrr
+                FROM gold_mrr_user_changes
+                GROUP BY month
+            ),
+            spine AS (
+                SELECT range::DATE as month
+                FROM range((SELECT MIN(month) FROM movements),
+                           GREATEST((SELECT MAX(month) FROM movements), date_trunc('month', DATE '{as_of}'))
+                               + INTERVAL 1 MONTH,
+                           INTERVAL 1 MONTH)
+            )
+            SELECT s.month,
+                   round(SUM(COALESCE(new_mrr + expansion_mrr - contraction_mrr - churned_mrr, 0))
+                         OVER (ORDER BY s.month), 2) as mrr,
+                   round(COALESCE(new_mrr, 0), 2) as new_mrr,
+                   round(COALESCE(expansion_mrr, 0), 2) as expansion_mrr,
+                   round(COALESCE(contraction_mrr, 0), 2) as contraction_mrr,
+                   round(COALESCE(churned_mrr, 0), 2) as churned_mrr
+            FROM spine s LEFT JOIN movements m ON s.month = m.month
+            ORDER BY s.month
+        """)
+        con.execute("DROP TABLE gold_mrr_current")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    rows_out = con.execute("SELECT COUNT(*) FROM mrr_monthly").fetchone()[0]
+    return {'rows_in': rows_in, 'rows_out': rows_out}
+
+
+def build_acquisition(con):
+    """CAC and LTV/CAC, rolled up from gold_daily_metrics and ltv_per_user."""
+    # 6. cac_by_channel
+    con.execute("""
+        CREATE OR REPLACE TABLE cac_by_channel AS
+        SELECT
+            m.channel,
             -- Calculate total spend and total signups for the channel
             -- If signup_count is NULL (due to left join), CAC becomes NULL.
-            SUM(m.spend) / NULLIF(SUM(s.signup_count), 0) as cac 
-        FROM silver_marketing m 
-        LEFT JOIN channel_signups s ON m.date = s.signup_date
+            SUM(m.spend) / NULLIF(SUM(s.signup_count), 0) as cac
+        FROM silver_marketing m
+        LEFT JOIN gold_daily_metrics s ON m.date = s.date
         GROUP BY 1
         ORDER BY cac DESC
     """)
 
-    # 7. ltv_per_user
-    con.execute(f"""
-        CREATE OR REPLACE TABLE ltv_per_user AS 
-        SELECT user_id, 
-               SUM(CASE WHEN event_type = 'purchase' THEN amount 
-                        WHEN event_type = 'refund' THEN -amount ELSE 0 END) as user_ltv 
-        FROM ({human_events}) 
-        GROUP BY 1
-        ORDER BY user_ltv DESC
-    """)
-
     # 8. ltv_cac_ratio
     con.execute("""
-        CREATE OR REPLACE TABLE ltv_cac_ratio AS 
-        SELECT 
-            AVG(user_ltv) as avg_ltv, 
-            (SELECT AVG(cac) FROM cac_by_channel) as avg_cac, 
-            AVG(user_ltv) / NULLIF((SELECT AVG(cac) FROM cac_by_channel), 0) as ltv_cac_ratio 
+        CREATE OR REPLACE TABLE ltv_cac_ratio AS
+        SELECT
+            AVG(user_ltv) as avg_ltv,
+            (SELECT AVG(cac) FROM cac_by_channel) as avg_cac,
+            AVG(user_ltv) / NULLIF((SELECT AVG(cac) FROM cac_by_channel), 0) as ltv_cac_ratio
         FROM ltv_per_user
     """)
-    
-    print("Gold tables created successfully with clustering (sorting).")
\ No newline at end of file
+    rows = con.execute("""
+        SELECT (SELECT COUNT(*) FROM silver_marketing), (SELECT COUNT(*) FROM cac_by_channel)
+    """).fetchone()
+    return {'rows_in': rows[0], 'rows_out': rows[1]}
+
+
+def run_gold(con, full_refresh=False, chunk_days=None):
+    """
+    Produces requirement-compliant Gold tables, filtering out flagged bots.
+    Data is sorted during creation to ensure optimal clustering for columnar storage.
+
+    silver_events is scanned once into gold_daily_metrics (DAU, gross, net,
+    signups per date), and gold_user_metrics (LTV, signup week, activity weeks
+    per user) is read from Silver's silver_users dimension. Both are refreshed
+    incrementally from Silver's change log (silver_event_changes), and every
+    event-derived Gold table, including cac_by_channel and ltv_cac_ratio, is a
+    projection of them rather than another scan of silver_events.
+    mrr_monthly is built from subscription intervals (see build_mrr).
+    `chunk_days` bounds a full rebuild's staging table to that many days.
+    """
+    print("--- Starting Gold Layer: Analytics ---")
+    build_event_tables(con, full_refresh, chunk_days)
+    build_mrr(con, full_refresh)
+    build_acquisition(con)
+    print("Gold tables created successfully.")
@@ -0,0 +1,233 @@
+import argparse
+import duckdb
+import os
+import uuid
+import pandas as pd
+from service import bump_version, connect_writer, release_writer
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
+
+# Columns whose zone maps (per row group min/max) decide row-group skipping
+# for date-filtered reads; the first DATE/TIMESTAMP one a table has is reported
+ZONE_MAP_COLUMNS = ('event_ts', 'date', 'month', 'week', 'signup_week')
+ZONE_MAP_TYPES = ('DATE', 'TIMESTAMP', 'TIMESTAMP WITH TIME ZONE')
+
+# Tables maintenance keeps sorted, with their sort key
+CLUSTER_KEYS = {'silver_events': 'event_ts, event_id'}
+
+# Cluster depth: how many row groups a row group's [min, max] range overlaps,
+# itself included, on average. A table sorted on its key is at 1.0; an
+# unsorted one approaches its row-group count. Above this, re-cluster.
+MAX_CLUSTER_DEPTH = 2.0
+
+
+def _zone_map_column(con, table):
+    columns = dict(con.execute(
+        "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = ?", [table]
+    ).fetchall())
+    for column in ZONE_MAP_COLUMNS:
+        if columns.get(column) in ZONE_MAP_TYPES:
+            return column, columns[column]
+    return None, None
+
+
+def _zone_maps_sql(table, column, dtype):
+    """
+    Per row group min/max of `column`, read from the segment statistics in
+    pragma_storage_info (the zone maps DuckDB checks before scanning a row
+    group). Validity segments carry no Min/Max and are skipped.
+    """
+    return f"""
+        SELECT row_group_id,
+               MIN(try_cast(regexp_extract(stats, 'Min: ([^,\\]]+)', 1) as {dtype})) as min_value,
+               MAX(try_cast(regexp_extract(stats, 'Max: ([^\\]]+)\\]', 1) as {dtype})) as max_value
+        FROM pragma_storage_info('{table}')
+        WHERE column_name = '{column}' AND stats LIKE '[Min:%'
+        GROUP BY row_group_id
+    """
+
+
+def cluster_depth(con, table, column=None):
+    """
+    Average number of row groups whose `column` range overlaps each row
+    group's (see MAX_CLUSTER_DEPTH), or None when the table has no zone map
+    column. Ranges that only touch at one value do not count as overlapping.
+    """
+    if column is None:
+        column, dtype = _zone_map_column(con, table)
+        if column is None:
+            return None
+    else:
+        dtype = dict(con.execute(
+            "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = ?", [table]
+        ).fetchall())[column]
+    return con.execute(f"""
+        WITH zones AS ({_zone_maps_sql(table, column, dtype)})
+        SELECT AVG(overlapping) FROM (
+            SELECT a.row_group_id, COUNT(*) as overlapping
+            FROM zones a JOIN zones b
+              ON a.row_group_id = b.row_group_id OR (a.min_value < b.max_value AND b.min_value < a.max_value)
+            GROUP BY a.row_group_id
+        )
+    """).fetchone()[0]
+
+
+def _format_depth(depth):
+    """Cluster depth for the log; a table without row-group stats (e.g. empty) has none."""
+    return 'n/a' if depth is None else f"{depth:.2f}"
+
+
+def table_layout(con):
+    """
+    Physical layout of every base table: rows, row groups, storage blocks
+    (small tables share blocks, so this overstates them), and for tables
+    with a date or timestamp column, that column's overall range and cluster
+    depth. Returned as a pandas DataFrame, largest tables first.
+    """
+    rows = []
+    tables = con.execute(
+        "SELECT table_name, estimated_size FROM duckdb_tables() WHERE NOT temporary ORDER BY table_name"
+    ).fetchall()
+    for table, row_count in tables:
+        row_groups, blocks = con.execute(f"""
+            SELECT COUNT(DISTINCT row_group_id), COUNT(DISTINCT block_id) FILTER (WHERE block_id >= 0)
+            FROM pragma_storage_info('{table}')
+        """).fetchone()
+        column, dtype = _zone_map_column(con, table)
+        zone_min = zone_max = depth = None
+        if column is not None:
+            zone_min, zone_max = con.execute(f"""
+                SELECT MIN(min_value)::VARCHAR, MAX(max_value)::VARCHAR FROM ({_zone_maps_sql(table, column, dtype)})
+            """).fetchone()
+            depth = cluster_depth(con, table, column)
+        rows.append({
+            'table_name': table, 'rows': row_count, 'row_groups': row_groups, 'blocks': blocks,
+            'zone_map_column': column, 'min': zone_min, 'max': zone_max,
+            'cluster_depth': round(depth, 2) if depth is not None else None,
+        })
+    return pd.DataFrame(rows).sort_values(['blocks', 'rows'], ascending=False, ignore_index=True)
+
+
+def recluster(con, table, key):
+    """Rewrites `table` sorted on `key`, so each row group covers a narrow key range."""
+    con.begin()
+    try:
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {table} ORDER BY {key}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def _compact(con, db_path):
+    """
+    Copies every table of the writer connection `con` (open on `db_path`)
+    into a fresh file and swaps it in. `con` keeps the file locked until the
+    swap, so no other process can open the old file in between.
+    """
+    tmp_path = db_path + '.compact'
+    for path in (tmp_path, tmp_path + '.wal'):
+        if os.path.exists(path):
+            os.remove(path)
+    con.execute("CHECKPOINT")
+    database = con.execute("SELECT current_database()").fetchone()[0]
+    target = tmp_path.replace("'", "''")
+    con.execute(f"ATTACH '{target}' AS compacted")
+    con.execute(f'COPY FROM DATABASE "{database}" TO compacted')
+    con.execute("DETACH compacted")
+    os.replace(tmp_path, db_path)
+
+
+def compact_database(db_path=DB_PATH):
+    """
+    Rewrites the database file with only its live blocks. CHECKPOINT lets
+    DuckDB reuse the blocks freed by CREATE OR REPLACE, but never returns
+    them to the file system, so the file keeps its high-water mark. Copying
+    every table into a fresh file drops the free blocks. The file is taken
+    through service.connect_writer, so dashboards let go of it first and
+    their caches are invalidated afterwards. Returns (bytes_before, bytes_after).
+    """
+    before = os.path.getsize(db_path)
+    con = connect_writer(db_path)
+    try:
+        _compact(con, db_path)
+    finally:
+        con.close()
+        release_writer(db_path)
+    bump_version(uuid.uuid4().hex, db_path)
+    return before, os.path.getsize(db_path)
+
+
+def run_maintenance(db_path=DB_PATH, recluster_tables=True, force=False, compact=False):
+    """
+    Storage maintenance for audicin_lakehouse.db:
+    1. Reports each table's size, row groups and zone-map range/cluster depth.
+    2. Re-clusters the CLUSTER_KEYS tables whose cluster depth exceeds
+       MAX_CLUSTER_DEPTH (or all of them with `force`). Incremental merges
+       append to the last row groups, and a Silver rebuild writes rows in
+       dedup order, so silver_events drifts away from event_ts order.
+    3. CHECKPOINTs, so the freed blocks are reused by the next run.
+    4. With `compact`, rewrites the file without its free blocks.
+    The whole sequence holds one service.connect_writer connection, like a
+    pipeline run. Returns the layout after maintenance.
+    """
+    before = os.path.getsize(db_path) if os.path.exists(db_path) else 0
+    con = connect_writer(db_path)
+    try:
+        print("--- Storage layout before maintenance ---")
+        print(table_layout(con).to_string(index=False))
+
+        # 2. Re-cluster degraded tables
+        for table, key in (CLUSTER_KEYS.items() if recluster_tables else ()):
+            exists = con.execute(
+                "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [table]
+            ).fetchone()[0] > 0
+            if not exists:
+                continue
+            depth = cluster_depth(con, table)
+            if force or (depth is not None and depth > MAX_CLUSTER_DEPTH):
+                recluster(con, table, key)
+                print(f" - Re-clustered {table} on {key} (cluster depth {_format_depth(depth)} -> "
+                      f"{_format_depth(cluster_depth(con, table))}).")
+            else:
+                print(f" - {table} is clustered (cluster depth {_format_depth(depth)}).")
+
+        # 3. Hand freed blocks back to the free list
+        con.execute("CHECKPOINT")
+        used, free = con.execute("SELECT used_blocks, free_blocks FROM pragma_database_size()").fetchone()
+        print(f" - Checkpointed: {used} blocks used, {free} free.")
+        layout = table_layout(con)
+
+        # 4. Drop the free blocks from the file
+        if compact:
+            _compact(con, db_path)
+    finally:
+        con.close()
+        release_writer(db_path)
+
+    if compact:
+        # Readers reopen the swapped-in file
+        bump_version(uuid.uuid4().hex, db_path)
+        after = os.path.getsize(db_path)
+        print(f" - Compacted {os.path.basename(db_path)}: {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB.")
+
+    print("--- Storage layout after maintenance ---")
+    print(layout.to_string(index=False))
+    return layout
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report and maintain the lakehouse's physical layout.")
+    parser.add_argument('--report', action='store_true', help="Only print the layout report.")
+    parser.add_argument('--force-recluster', action='store_true',
+                        help="Re-cluster silver_events even if its cluster depth is fine.")
+    parser.add_argument('--compact', action='store_true',
+                        help="Rewrite the database file without its free blocks.")
+    args = parser.parse_args()
+    if args.report:
+        con = duckdb.connect(DB_PATH, read_only=True)
+        print(table_layout(con).to_string(index=False))
+        con.close()
+    else:
+        run_maintenance(force=args.force_recluster, compact=args.compact)
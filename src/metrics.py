@@ -0,0 +1,98 @@
+import duckdb
+import json
+import os
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+
+
+def ensure_metrics_tables(con):
+    """Run history lives next to the data it describes, in the lakehouse DB."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_runs (
+            run_id VARCHAR PRIMARY KEY,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_s DOUBLE,
+            status VARCHAR,
+            full_refresh BOOLEAN,
+            selected_steps VARCHAR,
+            error VARCHAR
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_step_metrics (
+            run_id VARCHAR,
+            step_name VARCHAR,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            duration_s DOUBLE,
+            status VARCHAR,
+            rows_in BIGINT,
+            rows_out BIGINT,
+            rows_quarantined BIGINT,
+            peak_rss_mb DOUBLE,
+            duckdb_memory_mb DOUBLE,
+            error VARCHAR
+        )
+    """)
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS pipeline_query_profiles (
+            run_id VARCHAR,
+            step_name VARCHAR,
+            statement_seq INTEGER,
+            query_text VARCHAR,
+            latency_s DOUBLE,
+            cpu_time_s DOUBLE,
+            rows_scanned BIGINT,
+            profile JSON
+        )
+    """)
+
+
+def _load_profiles(con, run_id, step):
+    """Copies a step's JSON query profiles into pipeline_query_profiles."""
+    rows = []
+    for seq, path in enumerate(step.get('profiles', []), start=1):
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            profile = json.load(f)
+        rows.append([
+            run_id, step['step_name'], seq, profile.get('query_name'),
+            profile.get('latency'), profile.get('cpu_time'),
+            profile.get('cumulative_rows_scanned'), json.dumps(profile)
+        ])
+    if rows:
+        con.executemany("INSERT INTO pipeline_query_profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def record_run(con, run_id, started_at, finished_at, status, step_metrics,
+               full_refresh=False, selected_steps=None, error=None):
+    """
+    Persists one pipeline run and the metrics PipelineDAG collected for each
+    of its steps (see PipelineDAG.metrics). Re-recording a run_id replaces it.
+    """
+    ensure_metrics_tables(con)
+    con.begin()
+    try:
+        for table in ('pipeline_runs', 'pipeline_step_metrics', 'pipeline_query_profiles'):
+            con.execute(f"DELETE FROM {table} WHERE run_id = ?", [run_id])
+        con.execute(
+            "INSERT INTO pipeline_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [run_id, started_at, finished_at, (finished_at - started_at).total_seconds(),
+             status, full_refresh, ','.join(selected_steps) if selected_steps else None, error]
+        )
+        for step in step_metrics:
+            con.execute(
+                "INSERT INTO pipeline_step_metrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [run_id, step['step_name'], step['started_at'], step['finished_at'],
+                 step['duration_s'], step['status'], step.get('rows_in'), step.get('rows_out'),
+                 step.get('rows_quarantined'), step.get('peak_rss_mb'),
+                 step.get('duckdb_memory_mb'), step.get('error')]
+            )
+            _load_profiles(con, run_id, step)
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
@@ -1,50 +1,189 @@
+import argparse
+import datetime
 import duckdb
+import glob
+import hashlib
 import os
 import time
-from bronze import run_bronze
-from silver import run_silver
-from gold import run_gold
+import uuid
+from bronze import load_marketing, load_subscriptions, load_events, source_patterns, resolve_sources, source_fingerprint
+from silver import clean_marketing, clean_subscriptions, clean_events
+from gold import build_event_tables, build_mrr, build_acquisition
+from export import run_export, export_fingerprint
+from dag import PipelineDAG
+from metrics import record_run, PROFILE_DIR
+from service import bump_version, connect_writer, release_writer
+from config import load_config, apply_config, DEFAULT_CONFIG
 
-def run_full_pipeline():
+def _code_fingerprint():
+    """Hash of the pipeline's source code; any code change invalidates every cached step."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# State of the event tables, so steps notice rows that arrived outside the
+# pipeline (stream.py appends micro-batches without touching the step cache)
+BRONZE_EVENTS_VERSION = """
+    SELECT generation || ':' || (SELECT COUNT(*) FROM bronze_events)
+    FROM bronze_generations WHERE table_name = 'bronze_events'
+"""
+SILVER_EVENTS_VERSION = """
+    SELECT concat_ws(':', bronze_generation, rows_processed, generation)
+    FROM silver_watermarks WHERE source_table = 'bronze_events'
+"""
+
+def _table_version(con, sql):
+    """The result of a version query, or None while its tables don't exist yet."""
+    try:
+        row = con.execute(sql).fetchone()
+    except duckdb.CatalogException:
+        return None
+    return row[0] if row else None
+
+def build_pipeline(full_refresh=False, sources=None, manifest=None, threads=None, batch_id=None, config=None):
+    """
+    Declares the Medallion pipeline as a step DAG. Marketing, subscriptions and
+    events only meet in Gold (cac_by_channel / ltv_cac_ratio), so their Bronze
+    and Silver steps run concurrently. `config` (see config.load_config)
+    carries the out-of-core chunking and the bot rule for the event steps.
+
+    Every step is fingerprinted (see PipelineDAG.add_step): Bronze steps by
+    their source files, later steps by the settings that change their output
+    plus everything upstream, and event steps also by the version of the
+    tables they read. A run where only marketing_spend.csv changed re-runs
+    just the marketing branch and gold_acquisition.
+    """
+    batch_id = batch_id or uuid.uuid4().hex
+    config = config or DEFAULT_CONFIG
+    patterns = source_patterns(sources, manifest)
+    files = lambda dataset: lambda con: source_fingerprint(resolve_sources(patterns[dataset]))
+    upstream_only = lambda con: ''
+    dag = PipelineDAG()
+
+    # Bronze
+    dag.add_step('bronze_marketing', lambda con: load_marketing(con, sources, manifest, batch_id),
+                 fingerprint=files('marketing'))
+    dag.add_step('bronze_subscriptions', lambda con: load_subscriptions(con, sources, manifest, batch_id),
+                 fingerprint=files('subscriptions'))
+    dag.add_step('bronze_events', lambda con: load_events(con, full_refresh, sources, manifest, threads, batch_id),
+                 fingerprint=files('events'))
+
+    # Silver
+    dag.add_step('silver_marketing', clean_marketing, deps=['bronze_marketing'], fingerprint=upstream_only)
+    dag.add_step('silver_subscriptions', clean_subscriptions, deps=['bronze_subscriptions'], fingerprint=upstream_only)
+    dag.add_step('silver_events', lambda con: clean_events(con, full_refresh, config['chunk_buckets'],
+                                                          config['bot_min_events'], config['bot_window_seconds']),
+                 deps=['bronze_events'],
+                 fingerprint=lambda con: f"{config['bot_min_events']}:{config['bot_window_seconds']}:"
+                                         f"{_table_version(con, BRONZE_EVENTS_VERSION)}")
+
+    # Gold
+    dag.add_step('gold_events', lambda con: build_event_tables(con, full_refresh, config['chunk_days']),
+                 deps=['silver_events'], fingerprint=lambda con: str(_table_version(con, SILVER_EVENTS_VERSION)))
+    # mrr_monthly runs through the current month, so a new month re-runs it
+    dag.add_step('gold_mrr', lambda con: build_mrr(con, full_refresh), deps=['silver_subscriptions'],
+                 fingerprint=lambda con: datetime.date.today().strftime('%Y-%m'))
+    dag.add_step('gold_acquisition', build_acquisition, deps=['silver_marketing', 'gold_events'],
+                 fingerprint=upstream_only)
+
+    # Export (re-run if a table's exported files were removed)
+    dag.add_step('export_parquet', lambda con: run_export(con, full_refresh=full_refresh), deps=['gold_events'],
+                 fingerprint=lambda con: f"{export_fingerprint(con)}:{_table_version(con, SILVER_EVENTS_VERSION)}",
+                 fingerprint_after=True)
+    return dag
+
+def run_full_pipeline(steps=None, full_refresh=False, manifest=None, threads=None, profile=False, config=None):
     """
     Main orchestrator for the Audicin Data Lakehouse pipeline.
-    
+
     This function manages the end-to-end lifecycle of the data:
-    1. Establishes a connection to the local DuckDB instance.
-    2. Executes the Bronze (Ingestion), Silver (Cleaning), and Gold (Analytics) layers.
-    3. Profiles the total execution time for performance monitoring.
+    1. Establishes a connection to the local DuckDB instance and applies the run
+       configuration (memory_limit, temp_directory, threads,
+       preserve_insertion_order; see config.py).
+    2. Executes the Bronze (Ingestion), Silver (Cleaning), and Gold (Analytics) layers,
+       then exports Silver events and daily Gold tables as partitioned Parquet.
+       Steps run as a DAG (see build_pipeline); `steps` re-runs only the named
+       steps and everything downstream of them. Otherwise, steps whose inputs
+       are unchanged since their last success are skipped, unless
+       `full_refresh` is set.
+    3. Profiles the total execution time for performance monitoring, and records
+       per-step timings, row counts and memory in pipeline_runs /
+       pipeline_step_metrics (with `profile`, also one DuckDB JSON query profile
+       per statement in pipeline_query_profiles).
     4. Ensures the database connection is gracefully closed upon completion.
     """
     # Ensure DB path is consistent across different environments
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     db_path = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
-    
+
     # Start the timer
     start_time = time.time()
-    
+    started_at = datetime.datetime.now()
+    run_id = uuid.uuid4().hex
+
+    con = None
+    dag = None
+    durations = {}
+    status, error = 'failed', None
     try:
-        con = duckdb.connect(db_path)
+        config = config or load_config()
+        # Waits for dashboards (service.QueryService) to release the file lock
+        con = connect_writer(db_path)
+        apply_config(con, config)
         print(f"Connected to {db_path}")
 
-        # Run the Medallion steps in sequence
-        run_bronze(con)
-        run_silver(con)
-        run_gold(con)
-        
+        # Run the Medallion steps along the dependency graph
+        dag = build_pipeline(full_refresh=full_refresh, manifest=manifest, threads=threads,
+                             batch_id=run_id, config=config)
+        profile_dir = os.path.join(PROFILE_DIR, run_id) if profile else None
+        durations = dag.run(con, only=steps, profile_dir=profile_dir,
+                            skip_unchanged=not (full_refresh or steps), cache_salt=_code_fingerprint())
+        status = 'success'
+
         # Calculate duration
         end_time = time.time()
         duration = end_time - start_time
-        
+
         print("\n" + "="*30)
         print("--- Pipeline Success ---")
+        print(f"Steps run: {len(durations)} (sum of step times {sum(durations.values()):.2f}s), "
+              f"skipped as unchanged: {len(dag.skipped)}")
         print(f"Total Execution Time: {duration:.2f} seconds")
+        print(f"Run id: {run_id} (see pipeline_step_metrics)")
         print("="*30)
-        
+
     except Exception as e:
         print(f"\n!!! Pipeline Failed: {e}")
+        error = str(e)
         raise
     finally:
-        con.close()
+        if con is not None:
+            if dag is not None:
+                record_run(con, run_id, started_at, datetime.datetime.now(), status,
+                           getattr(dag, 'metrics', []), full_refresh, steps, error)
+            con.close()
+            # Readers (service.QueryService) key their caches on this stamp;
+            # a run that skipped every step changed nothing they could read
+            if status == 'success' and durations:
+                bump_version(run_id, db_path)
+            release_writer(db_path)
 
 if __name__ == "__main__":
-    run_full_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the Audicin Medallion pipeline.")
+    parser.add_argument('--step', action='append', dest='steps',
+                        help="Re-run this step and its downstream steps (repeatable).")
+    parser.add_argument('--full-refresh', action='store_true',
+                        help="Rebuild every layer instead of processing increments.")
+    parser.add_argument('--manifest', help="JSON manifest of source glob patterns.")
+    parser.add_argument('--threads', type=int, help="Parallel event-file ingestion workers.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Capture a DuckDB JSON query profile for every statement.")
+    parser.add_argument('--config', help="JSON pipeline config (memory_limit, temp_directory, threads, "
+                                         "preserve_insertion_order, chunk_days, chunk_buckets, "
+                                         "bot_min_events, bot_window_seconds).")
+    args = parser.parse_args()
+    run_full_pipeline(steps=args.steps, full_refresh=args.full_refresh,
+                      manifest=args.manifest, threads=args.threads, profile=args.profile,
+                      config=load_config(args.config))
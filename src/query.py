@@ -1,10 +1,94 @@
 import duckdb
 import pandas as pd
+import datetime
+import glob
 import os
 
 # Get absolute path to ensure we hit the generated DB
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
+export_dir = os.path.join(BASE_DIR, 'lakehouse')
+
+
+def partition_files(table, start_date=None, end_date=None, root=export_dir):
+    """
+    Lists the Parquet files of an exported table whose year=/month=/day=
+    partition falls within [start_date, end_date]. Pruning happens on the
+    directory names alone, so files outside the range are never opened.
+    The NULL-date partition is only included for unbounded reads.
+    """
+    files = []
+    table_root = os.path.join(root, table)
+    for path in sorted(glob.glob(os.path.join(table_root, 'year=*', 'month=*', 'day=*', '*.parquet'))):
+        parts = dict(seg.split('=', 1) for seg in os.path.relpath(path, table_root).split(os.sep)[:3])
+        if 'NULL' in parts.values():
+            if start_date is None and end_date is None:
+                files.append(path)
+            continue
+        day = datetime.date(int(parts['year']), int(parts['month']), int(parts['day']))
+        if (start_date and day < start_date) or (end_date and day > end_date):
+            continue
+        files.append(path)
+    return files
+
+
+def read_partitions(table, start_date=None, end_date=None, root=export_dir):
+    """
+    Returns a FROM-clause expression scanning only the partitions of `table`
+    within the date range, e.g.
+    conn.execute(f"SELECT SUM(net_revenue) FROM {read_partitions('daily_revenue_net', d0, d1)}").
+    Row-group min/max statistics then let DuckDB skip blocks inside each file.
+    A range with no partitions reads as an empty table with the table's
+    columns; a table that was never exported raises FileNotFoundError.
+    """
+    files = partition_files(table, start_date, end_date, root)
+    limit = ''
+    if not files:
+        # Any exported file supplies the schema for the empty result
+        files = glob.glob(os.path.join(root, table, 'year=*', 'month=*', 'day=*', '*.parquet'))[:1]
+        limit = ' LIMIT 0'
+        if not files:
+            raise FileNotFoundError(f"No exported partitions of {table} under {root}")
+    paths = ', '.join("'" + path.replace("'", "''") + "'" for path in files)
+    scan = f"""read_parquet([{paths}], hive_partitioning=true, 
+        hive_types={{'year': 'INTEGER', 'month': 'INTEGER', 'day': 'INTEGER'}})"""
+    return f"(SELECT * FROM {scan}{limit})" if limit else scan
+
+
+def run_comparison_sql(history=10):
+    """
+    Per-step comparison of the latest successful run against the median of the
+    `history` successful runs before it: wall time, rows in/out and peak memory.
+    Steps are ordered by slowdown, so the step that regresses as data grows
+    surfaces first.
+    """
+    return f"""
+        WITH runs AS (
+            SELECT run_id, ROW_NUMBER() OVER (ORDER BY started_at DESC) as run_rank
+            FROM pipeline_runs WHERE status = 'success'
+        ),
+        steps AS (
+            SELECT s.*, r.run_rank
+            FROM pipeline_step_metrics s JOIN runs r USING (run_id)
+            WHERE s.status = 'success' AND r.run_rank <= {history + 1}
+        )
+        SELECT 
+            step_name,
+            ROUND(MAX(duration_s) FILTER (WHERE run_rank = 1), 3) as latest_s,
+            ROUND(MEDIAN(duration_s) FILTER (WHERE run_rank > 1), 3) as baseline_s,
+            ROUND(MAX(duration_s) FILTER (WHERE run_rank = 1) 
+                  / NULLIF(MEDIAN(duration_s) FILTER (WHERE run_rank > 1), 0), 2) as slowdown,
+            MAX(rows_in) FILTER (WHERE run_rank = 1) as latest_rows_in,
+            MEDIAN(rows_in) FILTER (WHERE run_rank > 1) as baseline_rows_in,
+            MAX(rows_out) FILTER (WHERE run_rank = 1) as latest_rows_out,
+            ROUND(MAX(peak_rss_mb) FILTER (WHERE run_rank = 1), 1) as latest_peak_mb,
+            COUNT(*) FILTER (WHERE run_rank > 1) as baseline_runs
+        FROM steps
+        GROUP BY 1
+        HAVING COUNT(*) FILTER (WHERE run_rank = 1) > 0
+        ORDER BY slowdown DESC NULLS LAST, latest_s DESC
+    """
+
 
 def run_diagnostics():
     """
@@ -15,12 +99,16 @@ def run_diagnostics():
         print(f"Error: Database not found at {db_path}")
         return
 
-    conn = duckdb.connect(db_path)
+    # Read-only, pooled and cached; repeated runs against the same pipeline
+    # run are answered from the service's result cache
+    from service import get_service
+    service = get_service(db_path)
+    run_query = lambda query: service.query(query, format='pandas')
 
     def print_section(title, query):
         print(f"\n{'='*15} {title} {'='*15}")
         try:
-            df = conn.execute(query).df()
+            df = run_query(query)
             if df.empty:
                 print("No records found.")
             else:
@@ -37,6 +125,9 @@ def run_diagnostics():
     print_section("GOLD: DAILY NET REVENUE (HUMANS ONLY)", 
                   "SELECT * FROM daily_revenue_net ORDER BY date DESC LIMIT 5")
 
+    print_section("GOLD: WEEKLY / MONTHLY ACTIVE USERS (HLL SKETCHES)", 
+                  "SELECT 'week' as grain, week as period, wau as active_users FROM weekly_active_users UNION ALL SELECT 'month', month, mau FROM monthly_active_users ORDER BY grain DESC, period")
+
     print_section("GOLD: MRR MONTHLY", 
                   "SELECT * FROM mrr_monthly ORDER BY month DESC")
 
@@ -45,13 +136,40 @@ def run_diagnostics():
 
     # 3. DATA QUALITY AUDIT (QUARANTINE INSPECTION)
     # Proves the 'ten' trap and negative spend were caught
+    print_section("QUARANTINE: MALFORMED RAW LINES", 
+                  "SELECT line_number, byte_offset, rejection_reason, left(raw_line, 60) as raw_line FROM quarantine_raw_events ORDER BY line_number LIMIT 5")
+
     print_section("QUARANTINE: REJECTED EVENTS SAMPLE", 
-                  "SELECT event_id, event_type, amount, rejection_reason FROM quarantine_events LIMIT 3")
+                  "SELECT event_id, event_type, COALESCE(amount::VARCHAR, raw_amount) as amount, rejection_reason FROM quarantine_events LIMIT 3")
 
     print_section("QUARANTINE: REJECTED MARKETING", 
                   "SELECT date, channel, spend, rejection_reason FROM quarantine_marketing")
 
-    conn.close()
+    # 4. PIPELINE PERFORMANCE (latest run vs earlier runs)
+    print_section("PIPELINE: LATEST RUN VS PREVIOUS RUNS", run_comparison_sql())
+
+    print_section("PIPELINE: SLOWEST PROFILED STATEMENTS, LATEST PROFILED RUN", """
+        SELECT step_name, statement_seq, ROUND(latency_s, 4) as latency_s, rows_scanned,
+               left(regexp_replace(trim(query_text), '\\s+', ' ', 'g'), 70) as query
+        FROM pipeline_query_profiles
+        WHERE run_id = (SELECT run_id FROM pipeline_runs 
+                        WHERE run_id IN (SELECT run_id FROM pipeline_query_profiles)
+                        ORDER BY started_at DESC LIMIT 1)
+        ORDER BY latency_s DESC LIMIT 5""")
+
+    service.close()
+
+    # 5. PARQUET EXPORT (partition-pruned, no lock on the DuckDB file)
+    if os.path.isdir(os.path.join(export_dir, 'daily_revenue_net')):
+        conn = duckdb.connect()
+        run_query = lambda query: conn.execute(query).df()
+        latest = max(partition_files('daily_revenue_net'))
+        last_day = datetime.date(*[int(seg.split('=')[1]) for seg in latest.split(os.sep)[-4:-1]])
+        print_section("PARQUET: NET REVENUE, LAST 7 EXPORTED DAYS", f"""
+            SELECT date, net_revenue 
+            FROM {read_partitions('daily_revenue_net', last_day - datetime.timedelta(days=6), last_day)} 
+            ORDER BY date DESC""")
+        conn.close()
 
 if __name__ == "__main__":
     run_diagnostics()
\ No newline at end of file
@@ -1,11 +1,12 @@
 import duckdb
 import os
+from service import get_service
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 db_path = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
 
 def list_lakehouse_tables():
-    conn = duckdb.connect(db_path)
+    service = get_service(db_path)
     
     query = """
     SELECT 
@@ -17,8 +18,8 @@ def list_lakehouse_tables():
     """
     
     print("\n" + "="*20 + " LAKEHOUSE INVENTORY " + "="*20)
-    print(conn.execute(query).df().to_string(index=False))
-    conn.close()
+    print(service.query(query, format='pandas').to_string(index=False))
+    service.close()
 
 if __name__ == "__main__":
     list_lakehouse_tables()
\ No newline at end of file
@@ -0,0 +1,256 @@
+import collections
+import contextlib
+import duckdb
+import os
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_SIZE = 128
+# Idle pooled connections are closed after this many seconds, releasing
+# DuckDB's shared file lock so the pipeline can open the DB for writing
+DEFAULT_IDLE_TIMEOUT = 30.0
+# A writer waits this long for readers to let go of the file lock. It is
+# longer than the idle timeout, so an idle QueryService never outlasts it.
+LOCK_WAIT_SECONDS = 60.0
+# While a write is pending, a query the cache cannot answer waits this long
+# for it to finish before failing
+DEFAULT_WRITER_WAIT = 5.0
+POLL_SECONDS = 0.2
+
+
+def _version_path(db_path):
+    return db_path + '.version'
+
+
+def read_version(db_path=DB_PATH):
+    """The stamp of the last successful pipeline run, or None if none was recorded."""
+    try:
+        with open(_version_path(db_path)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def bump_version(version, db_path=DB_PATH):
+    """
+    Called by the pipeline after a successful run. The stamp lives in a
+    sidecar file rather than in the DB, so readers can check it without
+    taking a lock on audicin_lakehouse.db.
+    """
+    path = _version_path(db_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(str(version))
+    os.replace(tmp, path)
+
+
+def _intent_path(db_path):
+    return db_path + '.writer'
+
+
+def writer_pending(db_path=DB_PATH):
+    """
+    True while a pipeline process has announced a write (see connect_writer)
+    and is still alive; the intent file of a writer that crashed is ignored.
+    """
+    try:
+        with open(_intent_path(db_path)) as f:
+            pid = int(f.read().strip())
+    except (FileNotFoundError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def connect_writer(db_path=DB_PATH, wait=LOCK_WAIT_SECONDS):
+    """
+    Opens the lakehouse for writing. DuckDB lets one process write, and only
+    while no other process has the file open, so the write is first
+    announced in a sidecar that QueryService checks before every query: it
+    closes its read-only connections and stops opening new ones. The connect
+    is then retried until readers have let go, for up to `wait` seconds.
+    Call release_writer once the connection is closed.
+    """
+    path = _intent_path(db_path)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(str(os.getpid()))
+    os.replace(tmp, path)
+    deadline = time.time() + wait
+    try:
+        while True:
+            try:
+                return duckdb.connect(db_path)
+            except duckdb.IOException:
+                if time.time() > deadline:
+                    raise
+                time.sleep(POLL_SECONDS)
+    except BaseException:
+        release_writer(db_path)
+        raise
+
+
+def release_writer(db_path=DB_PATH):
+    """Withdraws this process's write intent, letting readers reconnect."""
+    path = _intent_path(db_path)
+    try:
+        with open(path) as f:
+            owner = f.read().strip()
+        if owner == str(os.getpid()):
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class QueryService:
+    """
+    Long-lived read-only access to the lakehouse for dashboards.
+
+    Queries run on a pool of read-only connections and come back as Arrow
+    tables (or pandas with format='pandas'). Results are kept in an LRU cache
+    keyed on (query text, parameters, version stamp). When the pipeline bumps
+    the stamp, every cached entry misses, and the next query reads fresh data.
+
+    When a pipeline run announces itself (see connect_writer), the pool is
+    closed so the run can take the file lock. Until the run finishes, cached
+    results are still served, but a query that needs the database waits up to
+    `writer_wait` seconds and then raises TimeoutError: DuckDB has no readers
+    alongside a writing process.
+    """
+
+    def __init__(self, db_path=DB_PATH, pool_size=DEFAULT_POOL_SIZE,
+                 cache_size=DEFAULT_CACHE_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 writer_wait=DEFAULT_WRITER_WAIT):
+        self.db_path = db_path
+        self.pool_size = pool_size
+        self.cache_size = cache_size
+        self.idle_timeout = idle_timeout
+        self.writer_wait = writer_wait
+        self.hits = 0
+        self.misses = 0
+        self._cache = collections.OrderedDict()
+        self._idle = []
+        self._open = 0
+        self._borrowed = 0
+        self._cond = threading.Condition()
+        self._idle_timer = None
+        self._pool_version = None
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrows a pooled read-only connection, opening one if the pool has room
+        and waiting for one to be returned otherwise. Nothing is opened while
+        a write is pending.
+        """
+        deadline = time.time() + self.writer_wait
+        while writer_pending(self.db_path):
+            self.release()
+            if time.time() > deadline:
+                raise TimeoutError(f"A pipeline run is writing {self.db_path}; retry once it finishes")
+            time.sleep(POLL_SECONDS)
+        with self._cond:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            while not self._idle and self._open >= self.pool_size:
+                self._cond.wait()
+            con = self._idle.pop() if self._idle else None
+            if con is None:
+                self._open += 1
+            self._borrowed += 1
+        if con is None:
+            try:
+                con = duckdb.connect(self.db_path, read_only=True)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._borrowed -= 1
+                    self._cond.notify()
+                raise
+        try:
+            yield con
+        finally:
+            with self._cond:
+                if writer_pending(self.db_path):
+                    # A run is waiting for the lock; do not keep holding it
+                    con.close()
+                    self._open -= 1
+                else:
+                    self._idle.append(con)
+                self._borrowed -= 1
+                self._cond.notify()
+                if self._borrowed == 0 and self.idle_timeout is not None:
+                    self._idle_timer = threading.Timer(self.idle_timeout, self.release)
+                    self._idle_timer.daemon = True
+                    self._idle_timer.start()
+
+    def release(self):
+        """Closes idle connections. The pool reopens them on the next query."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._open -= 1
+            self._cond.notify_all()
+
+    def query(self, sql, params=None, format='arrow'):
+        """
+        Returns the result of `sql` as a pyarrow.Table ('arrow') or a pandas
+        DataFrame ('pandas'). Repeated queries against the same pipeline run
+        are served from the cache without touching the database.
+        """
+        version = read_version(self.db_path)
+        if writer_pending(self.db_path):
+            self.release()
+        if version != self._pool_version:
+            # Connections opened before the last run would read a stale snapshot
+            self.release()
+            self._pool_version = version
+        key = (sql, tuple(params or ()), version)
+        with self._cond:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+        if result is None:
+            with self.connection() as con:
+                result = con.execute(sql, params).arrow()
+            with self._cond:
+                self.misses += 1
+                self._cache[key] = result
+                # Entries stamped with an older version can never hit again
+                for stale in [k for k in self._cache if k[2] != key[2]]:
+                    del self._cache[stale]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result.to_pandas() if format == 'pandas' else result
+
+    def close(self):
+        with self._cond:
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+            self._cache.clear()
+        self.release()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service(db_path=DB_PATH):
+    """Process-wide QueryService for audicin_lakehouse.db."""
+    global _service
+    with _service_lock:
+        if _service is None or _service.db_path != db_path:
+            _service = QueryService(db_path)
+        return _service
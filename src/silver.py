@@ -1,108 +1,855 @@
 import duckdb
+import uuid
 
-def run_silver(con):
+
+# Bot rule: a user sending at least BOT_MIN_EVENTS events within
+# BOT_WINDOW_SECONDS is bursting ("> 20 events in 1 second")
+BOT_MIN_EVENTS = 21
+BOT_WINDOW_SECONDS = 1
+
+
+# Validation rule registry, one entry per source. `typed` columns are cast
+# once per row; each rule is (column, check, rejection_reason), where `check`
+# is a predicate over the Bronze and typed columns that clean rows satisfy.
+# _validated_sql evaluates every rule in one pass over the source, and both
+# the clean and the quarantine tables are cut from that pass.
+# Bronze stores events typed; only values that failed Bronze's cast arrive as
+# raw_* text, and only those are parsed here (COALESCE skips the rest).
+EVENT_VALIDATION = {
+    'typed': {
+        'parsed_ts': """COALESCE(
+            event_ts,
+            try_cast(raw_timestamp as TIMESTAMP),
+            try_cast(strptime(raw_timestamp, '%Y-%m-%d %H:%M:%S') as TIMESTAMP),
+            try_cast(strptime(raw_timestamp, '%Y-%m-%dT%H:%M:%SZ') as TIMESTAMP)
+        )""",
+        'amount_num': "COALESCE(amount, try_cast(raw_amount as DOUBLE))",
+    },
+    'rules': [
+        ('user_id', "user_id IS NOT NULL", 'Missing user_id'),
+        ('amount', "raw_amount IS NULL OR amount_num IS NOT NULL", 'Invalid numeric amount (e.g. ten)'),
+    ],
+}
+MARKETING_VALIDATION = {
+    'typed': {'spend_num': "try_cast(spend as DOUBLE)"},
+    'rules': [
+        ('spend', "spend_num IS NOT NULL", 'Non-numeric spend'),
+        ('spend', "spend_num IS NULL OR spend_num >= 0", 'Negative spend'),
+    ],
+}
+SUBSCRIPTION_VALIDATION = {
+    # canceled_on is filled in from SUBSCRIPTION_CANCEL_FIELDS when the source has them
+    'typed': {'canceled_on': "NULL::DATE"},
+    'rules': [
+        ('subscription_id', "subscription_id IS NOT NULL", 'Missing subscription_id'),
+        ('price', "price IS NOT NULL", 'Missing price'),
+    ],
+}
+
+# Readers of silver_event_changes, and the row of theirs that records the
+# last change_id they applied. Once every reader on the current Silver
+# generation is past a change, it is trimmed from the log (see _trim_change_log).
+CHANGE_LOG_CONSUMERS = {
+    'gold_watermarks': "source_table = 'silver_event_changes'",
+    'export_watermarks': "target = 'silver_events'",
+}
+
+# Source fields that date a cancellation, in order of preference. A
+# subscription that is no longer active carries the first of these it has as
+# canceled_on; what a missing date means is left to the consumer (see
+# gold._mrr_intervals_sql).
+SUBSCRIPTION_CANCEL_FIELDS = ('canceled_at', 'cancelled_at', 'updated_at')
+
+
+def _validated_sql(source, validation):
     """
-    Cleans Bronze data, flags behavioral anomalies (bots), and segregates 
-    invalid records into quarantine tables for audit.
-    
-    Traps Handled:
-    - Duplicate/Conflicting Events: Resolved via ROW_NUMBER() on event_id.
-    - Timestamp Inconsistency: Normalized via multi-format COALESCE.
-    - Non-numeric 'Amount': Quarantined (e.g., the "ten" trap).
-    - Marketing Traps: Negative spend quarantined; duplicates removed.
-    - Bot Detection: Users with > 20 events in 1 second are flagged.
+    One pass of `validation` over `source`: every source column, the typed
+    columns, and `rejection_reasons`, the reason of every rule the row fails
+    (empty for clean rows). A check that evaluates to NULL counts as failed.
+    """
+    typed = ''.join(f", {expr} AS {name}" for name, expr in validation['typed'].items())
+    reasons = ', '.join(
+        f"CASE WHEN NOT COALESCE({check}, FALSE) THEN '{reason}' END"
+        for _, check, reason in validation['rules']
+    )
+    return f"""
+        SELECT *, list_filter([{reasons}], r -> r IS NOT NULL) AS rejection_reasons
+        FROM (SELECT *{typed} FROM {source})
     """
-    print("--- Starting Silver Layer: Cleaning & Flagging ---")
-    
-    # 1. CLEAN MARKETING vs QUARANTINE
-    # Handles: Negative spend (Quarantine), Duplicates (Qualify), Missing Dates (Filtered)
-    con.execute("""
-        -- Clean Table
-        CREATE OR REPLACE TABLE silver_marketing AS 
-        SELECT date::DATE as date, channel, try_cast(spend as DOUBLE) as spend
-        FROM bronze_marketing 
-        WHERE try_cast(spend as DOUBLE) IS NOT NULL AND try_cast(spend as DOUBLE) >= 0
-        QUALIFY ROW_NUMBER() OVER (PARTITION BY date, channel, spend ORDER BY date) = 1;
 
-        -- Audit Table
-        CREATE OR REPLACE TABLE quarantine_marketing AS 
-        SELECT *, 
-               CASE WHEN try_cast(spend as DOUBLE) IS NULL THEN 'Non-numeric spend'
-                    WHEN try_cast(spend as DOUBLE) < 0 THEN 'Negative spend'
-               END as rejection_reason
-        FROM bronze_marketing 
-        WHERE try_cast(spend as DOUBLE) IS NULL OR try_cast(spend as DOUBLE) < 0;
-    """)
 
-    # 2. EVENT CLEANING & BOT FLAGGING
-    # Handles: Inconsistent Timestamps, Duplicate event_ids, Bot activity bursts
-    con.execute("""
-        CREATE OR REPLACE TABLE silver_events AS
-        WITH bot_users AS (
-            SELECT user_id, timestamp 
-            FROM bronze_events 
-            GROUP BY 1, 2 HAVING COUNT(*) > 20
+def _validate(con, source, validation, name):
+    """Materializes _validated_sql(source) as the TEMP table `name`, so the rules run once."""
+    con.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS {_validated_sql(source, validation)}")
+
+
+def _quarantine_sql(validated, validation, where='TRUE', exclude=()):
+    """
+    Rejected rows of a validated table: the source columns, then every failed
+    reason joined into `rejection_reason` and as the `rejection_reasons` list.
+    """
+    drop = ', '.join([*exclude, *validation['typed'], 'rejection_reasons'])
+    return f"""
+        SELECT * EXCLUDE ({drop}),
+               array_to_string(rejection_reasons, '; ') AS rejection_reason, rejection_reasons
+        FROM {validated}
+        WHERE len(rejection_reasons) > 0 AND {where}
+    """
+
+
+def _events_sql(validated='silver_validated'):
+    """
+    Cleaning query for events over a validated table (see _validate), so the
+    same rules serve both the full rebuild and the incremental merge.
+    `validated` must carry `bronze_seq` (the Bronze rowid) so that versions
+    with equal timestamps resolve to the one landed last, deterministically.
+    It is kept on silver_events, so a merge can rank a new version against
+    the stored one (see _latest_versions_sql). is_bot starts FALSE; bot
+    detection runs afterwards on the normalized timestamps (see _bot_flags_sql).
+    """
+    return _latest_versions_sql(f"""(
+        SELECT 
+            event_id, user_id, event_type, parsed_ts as event_ts, 
+            COALESCE(amount_num, 0) as amount, 
+            currency, refers_to_event_id, FALSE as is_bot, bronze_seq
+        FROM {validated}
+        WHERE len(rejection_reasons) = 0
+    )""")
+
+
+def _latest_versions_sql(source):
+    """Latest-version-wins over silver_events-shaped rows: the newest event_ts, ties to the higher bronze_seq."""
+    return f"""
+        SELECT * FROM {source}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY event_id ORDER BY event_ts DESC, bronze_seq DESC) = 1
+    """
+
+
+def _bot_flags_sql(source, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Sliding-window bot detection over normalized silver_events rows. An event
+    opens a burst window when the event (min_events - 1) places after it (per
+    user, by event_ts) lands less than window_seconds later; every event
+    inside an open window is flagged, and burst_start marks the first flagged
+    event of each separate burst. Undated events are never flagged.
+
+    Any such window spans at most two consecutive window_seconds slots, so
+    only events in adjacent slot pairs holding min_events or more between them
+    can be flagged. A hash aggregate finds those first, and only they are
+    sorted. Returns only those candidate events; anything else is not a bot.
+    """
+    window_us = int(window_seconds * 1_000_000)
+    window = f"to_microseconds({window_us})"
+    return f"""
+        WITH timed AS (
+            SELECT event_id, user_id, event_ts, epoch_us(event_ts) // {window_us} as slot
+            FROM {source}
+            WHERE event_ts IS NOT NULL
+        ),
+        slots AS (
+            SELECT user_id, slot, COUNT(*) as events FROM timed GROUP BY 1, 2
+        ),
+        dense_pairs AS (
+            SELECT a.user_id, a.slot
+            FROM slots a
+            LEFT JOIN slots b ON b.user_id = a.user_id AND b.slot = a.slot + 1
+            WHERE a.events + COALESCE(b.events, 0) >= {min_events}
         ),
-        validated AS (
+        candidate_slots AS (
+            SELECT user_id, slot FROM dense_pairs
+            UNION
+            SELECT user_id, slot + 1 FROM dense_pairs
+        ),
+        opened AS (
+            SELECT 
+                t.event_id, t.user_id, t.event_ts,
+                CASE WHEN lead(t.event_ts, {min_events - 1}) OVER by_user < t.event_ts + {window}
+                     THEN t.event_ts + {window} END as open_until
+            FROM timed t
+            SEMI JOIN candidate_slots c ON t.user_id = c.user_id AND t.slot = c.slot
+            WINDOW by_user AS (PARTITION BY t.user_id ORDER BY t.event_ts, t.event_id)
+        ),
+        covered AS (
             SELECT 
-                b.event_id, b.user_id, b.event_type, b.currency, b.refers_to_event_id,
-                COALESCE(
-                    try_cast(b.timestamp as TIMESTAMP),
-                    try_cast(strptime(b.timestamp, '%Y-%m-%d %H:%M:%S') as TIMESTAMP),
-                    try_cast(strptime(b.timestamp, '%Y-%m-%dT%H:%M:%SZ') as TIMESTAMP)
-                ) as event_ts,
-                try_cast(b.amount as DOUBLE) as amount_num,
-                (d.user_id IS NOT NULL) as is_bot
-            FROM bronze_events b
-            LEFT JOIN bot_users d ON b.user_id = d.user_id AND b.timestamp = d.timestamp
-            WHERE b.user_id IS NOT NULL 
-              AND (try_cast(b.amount as DOUBLE) IS NOT NULL OR b.amount IS NULL)
+                event_id, user_id, event_ts,
+                MAX(open_until) OVER (by_user ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as covered_until,
+                MAX(open_until) OVER (by_user ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) as previous_until
+            FROM opened
+            WINDOW by_user AS (PARTITION BY user_id ORDER BY event_ts, event_id)
         )
         SELECT 
-            event_id, user_id, event_type, event_ts, 
-            COALESCE(amount_num, 0) as amount, 
-            currency, refers_to_event_id, is_bot
-        FROM validated
-        QUALIFY ROW_NUMBER() OVER (PARTITION BY event_id ORDER BY event_ts DESC) = 1;
+            event_id, user_id, event_ts,
+            COALESCE(event_ts < covered_until, FALSE) as is_bot,
+            COALESCE(event_ts < covered_until, FALSE) AND COALESCE(event_ts >= previous_until, TRUE) as burst_start
+        FROM covered
+    """
+
+
+def _bot_users_sql(flags, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """Burst evidence per flagged user, from a _bot_flags_sql result."""
+    return f"""
+        SELECT 
+            user_id,
+            COUNT(*) FILTER (WHERE burst_start) as bursts,
+            COUNT(*) FILTER (WHERE is_bot) as bot_events,
+            MIN(event_ts) FILTER (WHERE is_bot) as first_burst_at,
+            MAX(event_ts) FILTER (WHERE is_bot) as last_burst_at,
+            {min_events} as min_events,
+            {float(window_seconds)}::DOUBLE as window_seconds
+        FROM {flags}
+        GROUP BY 1
+        HAVING COUNT(*) FILTER (WHERE is_bot) > 0
+    """
+
+
+def _users_sql(source='silver_events'):
+    """
+    Per-user rollup of `source` (silver_events rows) for the silver_users
+    dimension. first_seen/last_seen cover every event; the weeks, counts and
+    money columns cover human events only, matching what Gold reports.
+    """
+    return f"""
+        SELECT 
+            user_id,
+            MIN(event_ts) as first_seen,
+            MAX(event_ts) as last_seen,
+            date_trunc('week', MIN(event_ts) FILTER (WHERE event_type = 'signup' AND NOT is_bot)) as signup_week,
+            date_trunc('week', MAX(event_ts) FILTER (WHERE NOT is_bot)) as last_active_week,
+            COALESCE(
+                list_sort(list(DISTINCT date_trunc('week', event_ts)) FILTER (WHERE NOT is_bot AND event_ts IS NOT NULL)),
+                []::DATE[]
+            ) as activity_weeks,
+            COUNT(*) FILTER (WHERE NOT is_bot) as human_events,
+            COUNT(*) FILTER (WHERE is_bot) as bot_events,
+            COUNT(*) FILTER (WHERE event_type = 'purchase' AND NOT is_bot) as purchase_count,
+            COALESCE(SUM(amount) FILTER (WHERE event_type = 'purchase' AND NOT is_bot), 0)::DOUBLE as purchase_total,
+            COUNT(*) FILTER (WHERE event_type = 'refund' AND NOT is_bot) as refund_count,
+            COALESCE(SUM(amount) FILTER (WHERE event_type = 'refund' AND NOT is_bot), 0)::DOUBLE as refund_total,
+            bool_or(is_bot) as is_bot
+        FROM {source}
+        WHERE user_id IS NOT NULL
+        GROUP BY 1
+    """
+
+
+def _hash_chunks(column, chunk_buckets):
+    """
+    Predicates splitting rows into `chunk_buckets` disjoint groups by
+    hash(column), so windows and aggregates partitioned on that column can run
+    one bucket at a time. A single TRUE chunk when chunking is off.
+    """
+    if not chunk_buckets or chunk_buckets <= 1:
+        return ["TRUE"]
+    return [f"hash({column}) % {chunk_buckets} = {i}" for i in range(chunk_buckets)]
+
+
+def rebuild_users(con, chunk_buckets=None):
+    """Recomputes silver_users from the whole of silver_events, optionally in user_id hash buckets."""
+    for i, chunk in enumerate(_hash_chunks('user_id', chunk_buckets)):
+        users = f"{_users_sql(f'(SELECT * FROM silver_events WHERE {chunk})')} ORDER BY user_id"
+        if i == 0:
+            con.execute(f"CREATE OR REPLACE TABLE silver_users AS {users}")
+        else:
+            con.execute(f"INSERT INTO silver_users {users}")
+
+
+def _merge_users(con, new_rows, replaced_users):
+    """
+    Folds newly inserted silver_events rows into silver_users without
+    rescanning history: counts and totals are added, first/last seen and weeks
+    are widened, and the bot flag is OR-ed in.
+
+    Aggregates cannot be un-applied, so users in `replaced_users` (events that
+    were re-versioned or re-flagged as bots) are recomputed from silver_events.
+    """
+    con.execute(f"DELETE FROM silver_users WHERE user_id IN (SELECT user_id FROM {replaced_users})")
+    con.execute(f"""
+        INSERT INTO silver_users 
+        {_users_sql(f"(SELECT * FROM silver_events WHERE user_id IN (SELECT user_id FROM {replaced_users}))")}
     """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE silver_users_delta AS
+        {_users_sql(f"(SELECT * FROM {new_rows} WHERE user_id NOT IN (SELECT user_id FROM {replaced_users}))")}
+    """)
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE silver_users_merged AS
+        SELECT 
+            d.user_id,
+            LEAST(u.first_seen, d.first_seen) as first_seen,
+            GREATEST(u.last_seen, d.last_seen) as last_seen,
+            LEAST(u.signup_week, d.signup_week) as signup_week,
+            GREATEST(u.last_active_week, d.last_active_week) as last_active_week,
+            list_sort(list_distinct(list_concat(COALESCE(u.activity_weeks, []::DATE[]), d.activity_weeks))) as activity_weeks,
+            COALESCE(u.human_events, 0) + d.human_events as human_events,
+            COALESCE(u.bot_events, 0) + d.bot_events as bot_events,
+            COALESCE(u.purchase_count, 0) + d.purchase_count as purchase_count,
+            COALESCE(u.purchase_total, 0) + d.purchase_total as purchase_total,
+            COALESCE(u.refund_count, 0) + d.refund_count as refund_count,
+            COALESCE(u.refund_total, 0) + d.refund_total as refund_total,
+            COALESCE(u.is_bot, FALSE) OR d.is_bot as is_bot
+        FROM silver_users_delta d
+        LEFT JOIN silver_users u ON u.user_id = d.user_id
+    """)
+    con.execute("DELETE FROM silver_users u USING silver_users_merged m WHERE u.user_id = m.user_id")
+    con.execute("INSERT INTO silver_users SELECT * FROM silver_users_merged")
+    for tmp in ('silver_users_delta', 'silver_users_merged'):
+        con.execute(f"DROP TABLE {tmp}")
+
+
+def _detect_bots(con, chunk_buckets=None, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Flags bot events across all of silver_events and rebuilds the
+    silver_bot_users evidence, one user_id hash bucket at a time when chunked.
+    """
+    for i, chunk in enumerate(_hash_chunks('user_id', chunk_buckets)):
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE silver_bot_flags AS
+            {_bot_flags_sql(f'(SELECT * FROM silver_events WHERE {chunk})', min_events, window_seconds)}
+        """)
+        con.execute("""
+            UPDATE silver_events s SET is_bot = TRUE FROM silver_bot_flags f
+            WHERE f.is_bot AND s.event_id IS NOT DISTINCT FROM f.event_id
+        """)
+        evidence = f"{_bot_users_sql('silver_bot_flags', min_events, window_seconds)} ORDER BY user_id"
+        if i == 0:
+            con.execute(f"CREATE OR REPLACE TABLE silver_bot_users AS {evidence}")
+        else:
+            con.execute(f"INSERT INTO silver_bot_users {evidence}")
+    con.execute("DROP TABLE silver_bot_flags")
+    con.execute(
+        "CREATE OR REPLACE TABLE silver_bot_rule AS SELECT ?::INTEGER as min_events, ?::DOUBLE as window_seconds",
+        [min_events, window_seconds]
+    )
+
+
+def _point_ranges_sql(points, reach_us):
+    """
+    Per user, the [event_ts - reach, event_ts + reach] ranges around the rows
+    of `points` (user_id, event_ts), with overlapping ranges merged.
+    """
+    reach = f"to_microseconds({reach_us})"
+    return f"""
+        SELECT user_id, MIN(lo) as lo, MAX(hi) as hi
+        FROM (
+            SELECT user_id, lo, hi, SUM(opens) OVER (PARTITION BY user_id ORDER BY lo ROWS UNBOUNDED PRECEDING) as island
+            FROM (
+                SELECT 
+                    user_id, lo, hi,
+                    CASE WHEN lo <= MAX(hi) OVER (PARTITION BY user_id ORDER BY lo
+                                                  ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)
+                         THEN 0 ELSE 1 END as opens
+                FROM (SELECT user_id, event_ts - {reach} as lo, event_ts + {reach} as hi FROM {points})
+            )
+        )
+        GROUP BY user_id, island
+    """
+
+
+def _bot_scope_flags_sql(points, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Bot flags for the silver_events rows within window_seconds of a row of
+    `points` (same user), in _bot_flags_sql's shape but with every such row.
+
+    A row at event_ts x only decides the windows opened in (x - window, x],
+    and those only cover rows in (x - window, x + window), so nothing outside
+    that scope can change. Deciding the rows inside it needs the rows within
+    two windows of x, and only those are read and sorted.
+    """
+    window_us = int(window_seconds * 1_000_000)
+    return f"""
+        WITH context AS MATERIALIZED (
+            SELECT s.event_id, s.user_id, s.event_ts
+            FROM silver_events s
+            JOIN ({_point_ranges_sql(points, 2 * window_us)}) r 
+              ON s.user_id = r.user_id AND s.event_ts BETWEEN r.lo AND r.hi
+        ),
+        scope AS (
+            SELECT c.event_id, c.user_id, c.event_ts
+            FROM context c
+            SEMI JOIN ({_point_ranges_sql(points, window_us)}) r 
+              ON c.user_id = r.user_id AND c.event_ts BETWEEN r.lo AND r.hi
+        ),
+        flags AS ({_bot_flags_sql('context', min_events, window_seconds)})
+        SELECT 
+            s.event_id, s.user_id, s.event_ts,
+            COALESCE(f.is_bot, FALSE) as is_bot,
+            COALESCE(f.burst_start, FALSE) as burst_start
+        FROM scope s
+        LEFT JOIN flags f ON s.event_id IS NOT DISTINCT FROM f.event_id
+    """
+
+
+def _redetect_bots(con, points, before, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Re-runs bot detection only around the rows of `points` (user_id, event_ts:
+    where rows were added or removed) and flips is_bot wherever the result
+    changed; see _bot_scope_flags_sql for why nothing further away can move.
+    The flipped events are left in TEMP silver_bot_flips (event_id, user_id,
+    event_ts) for the caller.
 
-    # 3. EVENTS QUARANTINE (Schema/Value Corruption)
+    `before` holds the same scope's flags taken before the rows changed, and
+    silver_bot_users is adjusted by the difference: bursts and bot_events by
+    the change in counts, first/last_burst_at widened by the new flags. Users
+    whose stored first or last burst lies inside the scope are the exception
+    and are recomputed from their flagged silver_events rows.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE silver_bot_after AS
+        {_bot_scope_flags_sql(points, min_events, window_seconds)}
+    """)
+    con.execute("""
+        CREATE OR REPLACE TEMP TABLE silver_bot_flips AS
+        SELECT s.event_id, s.user_id, s.event_ts
+        FROM silver_events s
+        JOIN silver_bot_after a ON s.event_id IS NOT DISTINCT FROM a.event_id
+        WHERE s.is_bot != a.is_bot
+    """)
     con.execute("""
-        CREATE OR REPLACE TABLE quarantine_events AS 
-        SELECT *,
-               CASE WHEN user_id IS NULL THEN 'Missing user_id'
-                    WHEN try_cast(amount as DOUBLE) IS NULL AND amount IS NOT NULL THEN 'Invalid numeric amount (e.g. ten)'
-               END as rejection_reason
-        FROM bronze_events 
-        WHERE user_id IS NULL 
-           OR (try_cast(amount as DOUBLE) IS NULL AND amount IS NOT NULL);
+        UPDATE silver_events s SET is_bot = NOT s.is_bot FROM silver_bot_flips f
+        WHERE s.event_id IS NOT DISTINCT FROM f.event_id
     """)
 
-    # 4. SUBSCRIPTIONS CLEAN & QUARANTINE
-    # Handles: Duplicate subscription_ids and missing critical data
+    # 1. Change in burst and bot event counts within the scope
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE silver_bot_delta AS
+        SELECT 
+            user_id,
+            SUM(CASE WHEN burst_start THEN sign ELSE 0 END) as bursts,
+            SUM(CASE WHEN is_bot THEN sign ELSE 0 END) as bot_events,
+            MIN(event_ts) FILTER (WHERE is_bot AND sign = 1) as first_burst_at,
+            MAX(event_ts) FILTER (WHERE is_bot AND sign = 1) as last_burst_at
+        FROM (
+            SELECT *, 1 as sign FROM silver_bot_after
+            UNION ALL
+            SELECT *, -1 as sign FROM {before}
+        )
+        GROUP BY 1
+    """)
+    # 2. Users whose stored first/last burst was inside the scope, and may be gone
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE silver_bot_rescan AS
+        SELECT DISTINCT b.user_id
+        FROM silver_bot_users b
+        JOIN {before} a 
+          ON a.user_id = b.user_id AND a.is_bot AND a.event_ts IN (b.first_burst_at, b.last_burst_at)
+    """)
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE silver_bot_merged AS
+        SELECT 
+            d.user_id,
+            COALESCE(b.bursts, 0) + d.bursts as bursts,
+            COALESCE(b.bot_events, 0) + d.bot_events as bot_events,
+            CASE WHEN r.user_id IS NULL THEN LEAST(b.first_burst_at, d.first_burst_at) ELSE e.first_burst_at END
+                as first_burst_at,
+            CASE WHEN r.user_id IS NULL THEN GREATEST(b.last_burst_at, d.last_burst_at) ELSE e.last_burst_at END
+                as last_burst_at,
+            {min_events} as min_events,
+            {float(window_seconds)}::DOUBLE as window_seconds
+        FROM silver_bot_delta d
+        LEFT JOIN silver_bot_users b ON b.user_id = d.user_id
+        LEFT JOIN silver_bot_rescan r ON r.user_id = d.user_id
+        LEFT JOIN (
+            SELECT user_id, MIN(event_ts) as first_burst_at, MAX(event_ts) as last_burst_at
+            FROM silver_events
+            WHERE is_bot AND user_id IN (SELECT user_id FROM silver_bot_rescan)
+            GROUP BY 1
+        ) e ON e.user_id = d.user_id
+    """)
+    con.execute("DELETE FROM silver_bot_users b USING silver_bot_merged m WHERE b.user_id = m.user_id")
+    con.execute("INSERT INTO silver_bot_users SELECT * FROM silver_bot_merged WHERE bot_events > 0")
+    for tmp in ('silver_bot_after', 'silver_bot_delta', 'silver_bot_rescan', 'silver_bot_merged'):
+        con.execute(f"DROP TABLE {tmp}")
+
+
+def _table_exists(con, name):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?", [name]
+    ).fetchone()[0] > 0
+
+
+def _has_column(con, table, column):
+    return con.execute(
+        "SELECT COUNT(*) FROM duckdb_columns() WHERE table_name = ? AND column_name = ?", [table, column]
+    ).fetchone()[0] > 0
+
+
+def _bronze_generation(con):
+    """
+    Identifies the current bronze_events load. Bronze starts a new generation on
+    every full rebuild; without that record there is no way to tell, so None.
+    """
+    if not _table_exists(con, 'bronze_generations'):
+        return None
+    row = con.execute(
+        "SELECT generation FROM bronze_generations WHERE table_name = 'bronze_events'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _ensure_watermark_table(con):
     con.execute("""
-        -- Clean Table (Deduplicated to keep current state)
+        CREATE TABLE IF NOT EXISTS silver_watermarks (
+            source_table VARCHAR PRIMARY KEY,
+            bronze_generation VARCHAR,
+            rows_processed BIGINT,
+            generation VARCHAR,
+            updated_at TIMESTAMP
+        )
+    """)
+
+
+def _save_watermark(con, bronze_generation, rows_processed, generation):
+    con.execute(
+        "INSERT OR REPLACE INTO silver_watermarks VALUES ('bronze_events', ?, ?, ?, now()::TIMESTAMP)",
+        [bronze_generation, rows_processed, generation]
+    )
+
+
+def _silver_generation(con):
+    """
+    Identifies the current silver_events build. A new generation starts on every
+    full rebuild, which invalidates downstream offsets into silver_event_changes.
+    Returns None when Silver has never recorded one (e.g. hand-built fixtures).
+    """
+    if not _table_exists(con, 'silver_watermarks'):
+        return None
+    row = con.execute(
+        "SELECT generation FROM silver_watermarks WHERE source_table = 'bronze_events'"
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _reset_change_log(con):
+    """
+    Starts an empty silver_event_changes for a new Silver generation. Each row
+    gets a change_id from the silver_change_ids sequence, so readers keep a
+    durable position in the log even after rows before it are trimmed.
+    """
+    con.execute("DROP TABLE IF EXISTS silver_event_changes")
+    con.execute("CREATE OR REPLACE SEQUENCE silver_change_ids")
+    con.execute("""
+        CREATE TABLE silver_event_changes (
+            change_id BIGINT DEFAULT nextval('silver_change_ids'), user_id VARCHAR, event_date DATE
+        )
+    """)
+
+
+def _log_changes_sql(source):
+    """Appends the distinct (user_id, event date) keys of `source` to silver_event_changes."""
+    return f"""
+        INSERT INTO silver_event_changes (user_id, event_date)
+        SELECT DISTINCT user_id, event_ts::DATE FROM {source}
+    """
+
+
+def _trim_change_log(con):
+    """
+    Deletes the changes every CHANGE_LOG_CONSUMERS reader on the current
+    Silver generation has applied. A reader without a position on this
+    generation rebuilds from silver_events on its next run and needs none of
+    the log, so with no such reader the whole log goes.
+    """
+    generation = _silver_generation(con)
+    marks = []
+    for table, where in CHANGE_LOG_CONSUMERS.items():
+        if not _has_column(con, table, 'last_change_id'):
+            continue
+        row = con.execute(f"SELECT silver_generation, last_change_id FROM {table} WHERE {where}").fetchone()
+        if row is not None and row[0] == generation:
+            marks.append(row[1])
+    if marks:
+        con.execute("DELETE FROM silver_event_changes WHERE change_id <= ?", [min(marks)])
+    else:
+        con.execute("DELETE FROM silver_event_changes")
+
+
+def _can_merge_events(con, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    A merge is only safe when Silver has already processed a prefix of the
+    current Bronze generation with the same bot rule. Anything else (first
+    run, Bronze rebuilt, bot rule changed, quarantine_events from before the
+    rule registry, silver_events without bronze_seq, a change log without
+    change ids, fixtures without watermarks) falls back to a full rebuild.
+    """
+    _ensure_watermark_table(con)
+    generation = _bronze_generation(con)
+    if generation is None:
+        return False
+    required = ('silver_events', 'quarantine_events', 'silver_event_changes', 'silver_users',
+                'silver_bot_users', 'silver_bot_rule')
+    if not all(_table_exists(con, t) for t in required):
+        return False
+    rule = con.execute("SELECT min_events, window_seconds FROM silver_bot_rule").fetchone()
+    if rule != (min_events, float(window_seconds)):
+        return False
+    if not (_has_column(con, 'quarantine_events', 'rejection_reasons')
+            and _has_column(con, 'silver_events', 'bronze_seq')
+            and _has_column(con, 'silver_event_changes', 'change_id')):
+        return False
+    mark = con.execute(
+        "SELECT bronze_generation, rows_processed FROM silver_watermarks WHERE source_table = 'bronze_events'"
+    ).fetchone()
+    if mark is None or mark[0] != generation:
+        return False
+    bronze_rows = con.execute("SELECT COUNT(*) FROM bronze_events").fetchone()[0]
+    return bronze_rows >= mark[1]
+
+
+def _rebuild_events(con, chunk_buckets=None, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Full rebuild of silver_events. With chunk_buckets (out-of-core mode) the
+    latest-version-wins window runs over one event_id hash bucket at a time,
+    so its sort never holds more than 1/chunk_buckets of Bronze; bot
+    detection and silver_users then run per user_id bucket.
+    """
+    con.begin()
+    try:
+        # One validation pass per bucket feeds both silver_events and quarantine_events
+        quarantine = _quarantine_sql('silver_validated', EVENT_VALIDATION, exclude=('bronze_seq',))
+        for i, chunk in enumerate(_hash_chunks('event_id', chunk_buckets)):
+            _validate(con, f'(SELECT *, rowid AS bronze_seq FROM bronze_events WHERE {chunk})',
+                      EVENT_VALIDATION, 'silver_validated')
+            if i == 0:
+                con.execute(f"CREATE OR REPLACE TABLE silver_events AS {_events_sql()}")
+                con.execute(f"CREATE OR REPLACE TABLE quarantine_events AS {quarantine}")
+            else:
+                con.execute(f"INSERT INTO silver_events {_events_sql()}")
+                con.execute(f"INSERT INTO quarantine_events {quarantine}")
+        con.execute("DROP TABLE silver_validated")
+        _detect_bots(con, chunk_buckets, min_events, window_seconds)
+        rebuild_users(con, chunk_buckets)
+        # Change log consumed by Gold and the export; a rebuild starts a fresh one
+        _reset_change_log(con)
+        _ensure_watermark_table(con)
+        _save_watermark(
+            con, _bronze_generation(con),
+            con.execute("SELECT COUNT(*) FROM bronze_events").fetchone()[0],
+            uuid.uuid4().hex
+        )
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def _merge_events(con, min_events=BOT_MIN_EVENTS, window_seconds=BOT_WINDOW_SECONDS):
+    """
+    Upserts only the Bronze rows appended since the last run into silver_events.
+
+    Bronze is append-only within a generation, so rows past the stored rowid
+    watermark are exactly the new ones, and only they are validated. Each
+    event_id's latest clean version among them is ranked against its current
+    silver_events row with the same latest-version-wins rule (the stored
+    bronze_seq breaks ties), so Bronze history is never re-read. Versions that
+    win are swapped into silver_events with a delete + insert. Bot detection
+    then re-runs only within a window of the timestamps those rows left or
+    arrived at, not over the users' whole history (see _redetect_bots).
+
+    The (user_id, event_date) keys of the replaced rows, the new rows and any
+    event whose bot flag flipped are appended to silver_event_changes so Gold
+    and the export can refresh only what moved, after the changes both have
+    applied are trimmed (see _trim_change_log). The new rows are folded into
+    silver_users (see _merge_users).
+    """
+    processed = con.execute(
+        "SELECT rows_processed FROM silver_watermarks WHERE source_table = 'bronze_events'"
+    ).fetchone()[0]
+    bronze_rows = con.execute("SELECT COUNT(*) FROM bronze_events").fetchone()[0]
+    if bronze_rows == processed:
+        return
+
+    con.begin()
+    try:
+        _trim_change_log(con)
+        _validate(con, f'(SELECT *, rowid AS bronze_seq FROM bronze_events WHERE rowid >= {processed})',
+                  EVENT_VALIDATION, 'silver_validated')
+        con.execute(f"CREATE OR REPLACE TEMP TABLE silver_delta AS {_events_sql()}")
+        # Only delta versions that outrank the stored row replace it
+        candidates = """(
+            SELECT * FROM silver_delta
+            UNION ALL
+            SELECT s.* FROM silver_events s
+            SEMI JOIN silver_delta d ON s.event_id IS NOT DISTINCT FROM d.event_id
+        )"""
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE silver_upserts AS
+            SELECT * FROM ({_latest_versions_sql(candidates)}) WHERE bronze_seq >= {processed}
+        """)
+
+        affected = """(
+            SELECT s.* FROM silver_events s
+            SEMI JOIN silver_upserts u ON s.event_id IS NOT DISTINCT FROM u.event_id
+        )"""
+        changed_keys = _log_changes_sql(affected)
+        con.execute(changed_keys)
+        con.execute(f"CREATE OR REPLACE TEMP TABLE silver_replaced_users AS SELECT DISTINCT user_id FROM {affected}")
+        # Bot flags can only move around the timestamps rows leave or arrive at
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE silver_bot_points AS
+            SELECT user_id, event_ts FROM {affected} WHERE event_ts IS NOT NULL
+            UNION
+            SELECT user_id, event_ts FROM silver_upserts WHERE event_ts IS NOT NULL
+        """)
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE silver_bot_before AS
+            {_bot_scope_flags_sql('silver_bot_points', min_events, window_seconds)}
+        """)
+        con.execute("""
+            DELETE FROM silver_events s USING silver_upserts u
+            WHERE s.event_id IS NOT DISTINCT FROM u.event_id
+        """)
+        con.execute("INSERT INTO silver_events SELECT * FROM silver_upserts")
+        con.execute(changed_keys)
+
+        _redetect_bots(con, 'silver_bot_points', 'silver_bot_before', min_events, window_seconds)
+        con.execute(_log_changes_sql('silver_bot_flips'))
+        con.execute("""
+            INSERT INTO silver_replaced_users 
+            SELECT DISTINCT user_id FROM silver_bot_flips
+            EXCEPT SELECT user_id FROM silver_replaced_users
+        """)
+        _merge_users(con, affected, 'silver_replaced_users')
+        con.execute(f"""
+            INSERT INTO quarantine_events
+            {_quarantine_sql('silver_validated', EVENT_VALIDATION, exclude=('bronze_seq',))}
+        """)
+        _save_watermark(con, _bronze_generation(con), bronze_rows, _silver_generation(con))
+
+        for tmp in ('silver_delta', 'silver_upserts', 'silver_validated', 'silver_replaced_users', 'silver_bot_points',
+                    'silver_bot_before', 'silver_bot_flips'):
+            con.execute(f"DROP TABLE {tmp}")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+
+
+def clean_marketing(con):
+    """
+    Handles: Negative spend (Quarantine), Duplicates (Qualify), Missing Dates (Filtered)
+    """
+    _validate(con, 'bronze_marketing', MARKETING_VALIDATION, 'silver_marketing_validated')
+    con.execute(f"""
+        -- Clean Table
+        CREATE OR REPLACE TABLE silver_marketing AS 
+        SELECT date::DATE as date, channel, spend_num as spend
+        FROM silver_marketing_validated 
+        WHERE len(rejection_reasons) = 0
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY date, channel, spend ORDER BY date) = 1;
+
+        -- Audit Table
+        CREATE OR REPLACE TABLE quarantine_marketing AS 
+        {_quarantine_sql('silver_marketing_validated', MARKETING_VALIDATION)};
+
+        DROP TABLE silver_marketing_validated;
+    """)
+    counts = con.execute("""
+        SELECT (SELECT COUNT(*) FROM silver_marketing), (SELECT COUNT(*) FROM quarantine_marketing),
+               (SELECT COUNT(*) FROM bronze_marketing)
+    """).fetchone()
+    print(f" - Marketing: {counts[0]} clean, {counts[1]} quarantined.")
+    return {'rows_in': counts[2], 'rows_out': counts[0], 'rows_quarantined': counts[1]}
+
+
+def clean_events(con, full_refresh=False, chunk_buckets=None, bot_min_events=None, bot_window_seconds=None):
+    """
+    Handles: Inconsistent Timestamps, Duplicate event_ids, Bot activity bursts.
+    Only Bronze rows landed since the last run are merged unless a rebuild is
+    required (see _can_merge_events). Rebuilds run in `chunk_buckets` hash
+    buckets when set. A user is a bot while sending bot_min_events events
+    within bot_window_seconds (default BOT_MIN_EVENTS in BOT_WINDOW_SECONDS).
+    """
+    rule = (bot_min_events or BOT_MIN_EVENTS, bot_window_seconds or BOT_WINDOW_SECONDS)
+    if full_refresh or not _can_merge_events(con, *rule):
+        processed, quarantined = 0, 0
+        _rebuild_events(con, chunk_buckets, *rule)
+    else:
+        processed, quarantined = con.execute("""
+            SELECT (SELECT rows_processed FROM silver_watermarks WHERE source_table = 'bronze_events'),
+                   (SELECT COUNT(*) FROM quarantine_events)
+        """).fetchone()
+        _merge_events(con, *rule)
+    counts = con.execute("""
+        SELECT (SELECT COUNT(*) FROM silver_events), (SELECT COUNT(*) FROM quarantine_events),
+               (SELECT rows_processed FROM silver_watermarks WHERE source_table = 'bronze_events')
+    """).fetchone()
+    print(f" - Events: {counts[0]} clean, {counts[1]} quarantined.")
+    return {'rows_in': counts[2] - processed, 'rows_out': counts[0], 'rows_quarantined': counts[1] - quarantined}
+
+
+def _subscription_validation(con):
+    """SUBSCRIPTION_VALIDATION, with canceled_on read from the cancellation fields bronze_subscriptions has."""
+    columns = {row[0] for row in con.execute(
+        "SELECT column_name FROM duckdb_columns() WHERE table_name = 'bronze_subscriptions'"
+    ).fetchall()}
+    fields = [f"try_cast({field} as TIMESTAMP)::DATE" for field in SUBSCRIPTION_CANCEL_FIELDS if field in columns]
+    if not fields:
+        return SUBSCRIPTION_VALIDATION
+    typed = {'canceled_on': f"CASE WHEN status IS DISTINCT FROM 'active' THEN COALESCE({', '.join(fields)}) END"}
+    return dict(SUBSCRIPTION_VALIDATION, typed=typed)
+
+
+def clean_subscriptions(con):
+    """
+    Handles: Duplicate subscription_ids and missing critical data. A
+    subscription that is no longer active also carries the date it was
+    canceled on (canceled_on) when the source records one.
+    """
+    validation = _subscription_validation(con)
+    _validate(con, 'bronze_subscriptions', validation, 'silver_subscriptions_validated')
+    con.execute(f"""
+        -- Clean Table (Deduplicated to keep current state); at the same
+        -- created_at, the version that is no longer active wins
         CREATE OR REPLACE TABLE silver_subscriptions AS
-        SELECT * FROM bronze_subscriptions
-        WHERE subscription_id IS NOT NULL AND price IS NOT NULL
-        QUALIFY ROW_NUMBER() OVER (PARTITION BY subscription_id ORDER BY created_at DESC) = 1;
+        SELECT * EXCLUDE (rejection_reasons) FROM silver_subscriptions_validated
+        WHERE len(rejection_reasons) = 0
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY subscription_id ORDER BY created_at DESC, status IS NOT DISTINCT FROM 'active'
+        ) = 1;
 
         -- Audit Table
         CREATE OR REPLACE TABLE quarantine_subscriptions AS
-        SELECT *, 'Missing ID or price' as rejection_reason
-        FROM bronze_subscriptions
-        WHERE subscription_id IS NULL OR price IS NULL;
-    """)
+        {_quarantine_sql('silver_subscriptions_validated', validation)};
 
-    # Log Metrics for Observability
+        DROP TABLE silver_subscriptions_validated;
+    """)
     counts = con.execute("""
-        SELECT 
-            (SELECT COUNT(*) FROM silver_events) as clean_ev,
-            (SELECT COUNT(*) FROM quarantine_events) as q_ev,
-            (SELECT COUNT(*) FROM silver_marketing) as clean_mk,
-            (SELECT COUNT(*) FROM quarantine_marketing) as q_mk
+        SELECT (SELECT COUNT(*) FROM bronze_subscriptions), (SELECT COUNT(*) FROM silver_subscriptions),
+               (SELECT COUNT(*) FROM quarantine_subscriptions)
     """).fetchone()
+    return {'rows_in': counts[0], 'rows_out': counts[1], 'rows_quarantined': counts[2]}
+
+
+def run_silver(con, full_refresh=False, chunk_buckets=None, bot_min_events=None, bot_window_seconds=None):
+    """
+    Cleans Bronze data, flags behavioral anomalies (bots), and segregates 
+    invalid records into quarantine tables for audit.
+    
+    Traps Handled:
+    - Duplicate/Conflicting Events: Resolved via ROW_NUMBER() on event_id.
+    - Timestamp Inconsistency: Cast once in Bronze; the rest normalized via
+      multi-format COALESCE.
+    - Non-numeric 'Amount': Quarantined (e.g., the "ten" trap).
+    - Marketing Traps: Negative spend quarantined; duplicates removed.
+    - Bot Detection: Events in a burst of >= BOT_MIN_EVENTS within
+      BOT_WINDOW_SECONDS (> 20 in 1 second) per user are flagged, on the
+      normalized timestamps; evidence lands in silver_bot_users.
+
+    Events are processed incrementally: only Bronze rows landed since the last
+    run are validated and upserted into silver_events (see _merge_events), and
+    the per-user silver_users dimension is updated from those rows alone.
+    `chunk_buckets` splits full rebuilds into event_id / user_id hash buckets
+    for larger-than-memory backfills.
+    """
+    print("--- Starting Silver Layer: Cleaning & Flagging ---")
+    
+    # 1. CLEAN MARKETING vs QUARANTINE
+    clean_marketing(con)
+
+    # 2 & 3. EVENT CLEANING, BOT FLAGGING & QUARANTINE
+    clean_events(con, full_refresh, chunk_buckets, bot_min_events, bot_window_seconds)
+
+    # 4. SUBSCRIPTIONS CLEAN & QUARANTINE
+    clean_subscriptions(con)
 
     print(f"Silver complete.")
-    print(f" - Events: {counts[0]} clean, {counts[1]} quarantined.")
-    print(f" - Marketing: {counts[2]} clean, {counts[3]} quarantined.")
\ No newline at end of file
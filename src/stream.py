@@ -0,0 +1,245 @@
+import argparse
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from bronze import (ingest_events, ingested_event_files, resolve_sources, source_patterns, EVENTS_PATH,
+                    STREAM_LANDING_PATH)
+from silver import clean_events
+from gold import build_event_tables, build_acquisition
+from service import bump_version, connect_writer, release_writer
+from config import load_config, apply_config, DEFAULT_CONFIG
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BASE_DIR, 'audicin_lakehouse.db')
+
+# Events read from stdin or a socket are appended here before ingestion. The
+# default landing file is one of Bronze's default events sources, so a
+# rebuild replays every streamed row; a custom one must be added to a manifest.
+LANDING_PATH = STREAM_LANDING_PATH
+
+DEFAULT_BATCH_ROWS = 1000
+DEFAULT_BATCH_SECONDS = 2.0
+POLL_SECONDS = 0.2
+
+
+def _read_stdin(lines, stop):
+    for line in sys.stdin:
+        lines.put(line)
+    lines.put(None)
+
+
+def _serve_socket(lines, stop, host, port):
+    """Accepts NDJSON over TCP; every client connection may send any number of lines."""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw in self.rfile:
+                lines.put(raw.decode('utf-8', errors='replace'))
+
+    class Server(socketserver.ThreadingTCPServer):
+        allow_reuse_address = True
+        daemon_threads = True
+
+    with Server((host, port), Handler) as server:
+        print(f"Listening for NDJSON events on {host}:{server.server_address[1]}")
+        threading.Thread(target=lambda: (stop.wait(), server.shutdown()), daemon=True).start()
+        server.serve_forever(poll_interval=POLL_SECONDS)
+
+
+def _open_when_present(path, stop):
+    """Opens `path` for reading, waiting for it to be created. None if stopped first."""
+    while not stop.is_set():
+        try:
+            return open(path, 'r', encoding='utf-8', errors='replace')
+        except FileNotFoundError:
+            time.sleep(POLL_SECONDS)
+    return None
+
+
+def _tail_file(lines, stop, path):
+    """
+    Follows `path` like `tail -f`, queueing each newly completed line. Bronze
+    reads the lines from the file itself; the queue only paces micro-batches.
+    A file that does not exist yet is waited for and followed from its start,
+    as is a truncated or replaced one.
+    """
+    existed = os.path.exists(path)
+    f = _open_when_present(path, stop)
+    if f is None:
+        return
+    if existed:
+        f.seek(0, os.SEEK_END)
+    partial = ''
+    try:
+        while not stop.is_set():
+            line = f.readline()
+            if line.endswith('\n'):
+                lines.put(partial + line)
+                partial = ''
+                continue
+            partial += line
+            try:
+                rotated = os.stat(path).st_size < f.tell() or os.stat(path).st_ino != os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                rotated = False
+            if rotated:
+                f.close()
+                f = _open_when_present(path, stop)
+                if f is None:
+                    return
+                partial = ''
+            time.sleep(POLL_SECONDS)
+    finally:
+        if f is not None:
+            f.close()
+
+
+def _append_landing(landing, lines):
+    """Durably appends a micro-batch of raw lines to the landing file."""
+    os.makedirs(os.path.dirname(os.path.abspath(landing)), exist_ok=True)
+    with open(landing, 'a', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line if line.endswith('\n') else line + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _event_sources(con, event_path, sources=None, manifest=None):
+    """
+    Every file a micro-batch hands to Bronze: the configured events sources (as
+    process.py resolves them), every file Bronze already holds rows from, and
+    `event_path`. If any of them was rewritten, ingest_events rebuilds Bronze
+    from all of them, so no other file's rows are lost to a streamed rebuild.
+    """
+    paths = set(resolve_sources(source_patterns(sources, manifest)['events']))
+    paths.update(path for path in ingested_event_files(con) if os.path.isfile(path))
+    paths.add(os.path.abspath(event_path))
+    return sorted(paths)
+
+
+def run_micro_batch(event_path, db_path=DB_PATH, config=None, batch_id=None, sources=None, manifest=None):
+    """
+    Applies one micro-batch: Bronze appends the complete lines written to
+    `event_path` (and any other events source, see _event_sources) since its
+    watermark, Silver validates, dedups and merges only those rows, and Gold
+    refreshes the changed dates and users in place (see
+    gold._project_event_tables). The connection is held only for the batch, so
+    readers can open the database in between. Returns the batch stats.
+    """
+    batch_id = batch_id or uuid.uuid4().hex
+    config = config or DEFAULT_CONFIG
+    start = time.time()
+    con = connect_writer(db_path)
+    try:
+        apply_config(con, config)
+        event_paths = _event_sources(con, event_path, sources, manifest)
+        new_lines, loaded, quarantined, _ = ingest_events(con, event_paths, batch_id=batch_id)
+        silver = clean_events(con, chunk_buckets=config['chunk_buckets'], bot_min_events=config['bot_min_events'],
+                              bot_window_seconds=config['bot_window_seconds'])
+        gold = build_event_tables(con, chunk_days=config['chunk_days'])
+        has_marketing = con.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'silver_marketing'"
+        ).fetchone()[0] > 0
+        if has_marketing:
+            build_acquisition(con)
+    finally:
+        con.close()
+        release_writer(db_path)
+    # Readers (service.QueryService) pick up the batch on their next query
+    bump_version(batch_id, db_path)
+
+    stats = {
+        'batch_id': batch_id, 'lines': new_lines, 'rows_loaded': loaded, 'rows_quarantined': quarantined,
+        'silver_rows_in': silver['rows_in'], 'gold_rows_in': gold['rows_in'], 'seconds': time.time() - start,
+    }
+    print(f"[stream] batch {batch_id[:8]}: {new_lines} lines, {loaded} loaded, "
+          f"{quarantined} quarantined in {stats['seconds']:.2f}s")
+    return stats
+
+
+def run_stream(source='tail', path=None, port=None, host='127.0.0.1', landing=LANDING_PATH,
+               batch_rows=DEFAULT_BATCH_ROWS, batch_seconds=DEFAULT_BATCH_SECONDS,
+               db_path=DB_PATH, config=None, max_batches=None, sources=None, manifest=None):
+    """
+    Long-running micro-batch mode. Events come from one of:
+    - 'tail':   lines appended to `path` (default data/events.ndjson),
+    - 'stdin':  NDJSON piped into the process,
+    - 'socket': NDJSON sent to a TCP listener on host:port.
+
+    A micro-batch is committed every `batch_rows` lines or `batch_seconds`
+    after the first pending line, whichever comes first (see run_micro_batch).
+    stdin and socket lines are first appended to the `landing` file. The loop
+    ends at end of stdin, after `max_batches`, or on Ctrl-C, flushing what is
+    pending. `sources` and `manifest` name the other events sources, as for
+    process.py. Returns the list of batch stats.
+    """
+    config = config or DEFAULT_CONFIG
+    lines = queue.Queue()
+    stop = threading.Event()
+    if source == 'tail':
+        event_path = os.path.abspath(path or EVENTS_PATH)
+        reader = threading.Thread(target=_tail_file, args=(lines, stop, event_path), daemon=True)
+    elif source == 'stdin':
+        event_path = os.path.abspath(landing)
+        reader = threading.Thread(target=_read_stdin, args=(lines, stop), daemon=True)
+    elif source == 'socket':
+        event_path = os.path.abspath(landing)
+        reader = threading.Thread(target=_serve_socket, args=(lines, stop, host, port or 0), daemon=True)
+    else:
+        raise ValueError(f"Unknown stream source: {source}")
+
+    batches = []
+    # 1. Catch up on whatever was written while the stream was down
+    if os.path.exists(event_path):
+        batches.append(run_micro_batch(event_path, db_path, config, sources=sources, manifest=manifest))
+    reader.start()
+
+    # 2. Micro-batches by row count or age of the oldest pending line
+    pending, first_at, done = [], None, False
+    try:
+        while not done and not (max_batches and len(batches) >= max_batches):
+            try:
+                line = lines.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                line = ''
+            if line is None:
+                done = True
+            elif line:
+                pending.append(line)
+                first_at = first_at or time.time()
+            if pending and (done or len(pending) >= batch_rows or time.time() - first_at >= batch_seconds):
+                if source != 'tail':
+                    _append_landing(event_path, pending)
+                batches.append(run_micro_batch(event_path, db_path, config, sources=sources, manifest=manifest))
+                pending, first_at = [], None
+    except KeyboardInterrupt:
+        if pending:
+            if source != 'tail':
+                _append_landing(event_path, pending)
+            batches.append(run_micro_batch(event_path, db_path, config, sources=sources, manifest=manifest))
+    finally:
+        stop.set()
+    print(f"Stream stopped after {len(batches)} micro-batch(es).")
+    return batches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream events into the lakehouse in micro-batches.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--tail', nargs='?', const=EVENTS_PATH, metavar='PATH',
+                      help="Follow an NDJSON file (default: data/events.ndjson).")
+    mode.add_argument('--stdin', action='store_true', help="Read NDJSON from standard input.")
+    mode.add_argument('--socket', type=int, metavar='PORT', help="Listen for NDJSON on 127.0.0.1:PORT.")
+    parser.add_argument('--landing', default=LANDING_PATH, help="File stdin/socket events are appended to.")
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument('--batch-seconds', type=float, default=DEFAULT_BATCH_SECONDS)
+    parser.add_argument('--config', help="JSON pipeline config, as for process.py.")
+    parser.add_argument('--manifest', help="JSON manifest of source glob patterns, as for process.py.")
+    args = parser.parse_args()
+    source = 'stdin' if args.stdin else 'socket' if args.socket is not None else 'tail'
+    run_stream(source, path=args.tail, port=args.socket, landing=args.landing,
+               batch_rows=args.batch_rows, batch_seconds=args.batch_seconds, config=load_config(args.config),
+               manifest=args.manifest)
@@ -18,4 +18,163 @@ def test_bronze_ingestion_structure():
         assert 'bronze_marketing' in table_list
         assert 'bronze_subscriptions' in table_list
     except Exception as e:
-        pytest.fail(f"Bronze pipeline failed: {e}")
\ No newline at end of file
+        pytest.fail(f"Bronze pipeline failed: {e}")
+
+def _write_lines(path, lines, mode='w'):
+    with open(path, mode, encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def test_bronze_incremental_appends_only_new_lines(tmp_path):
+    """Verify that a second run only parses lines appended after the watermark."""
+    from src.bronze import ingest_events
+
+    con = duckdb.connect(':memory:')
+    path = str(tmp_path / 'events.ndjson')
+    _write_lines(path, ['{"event_id": "e1", "user_id": "u1"}', '{"event_id": "e2", "user_id": "u2"}'])
+
+    assert ingest_events(con, path) == (2, 2, 0, True)
+
+    _write_lines(path, ['{"event_id": "e3", "user_id": "u3"}'], mode='a')
+    assert ingest_events(con, path) == (1, 1, 0, False)
+    assert ingest_events(con, path) == (0, 0, 0, False)
+
+    assert con.execute("SELECT COUNT(*) FROM bronze_events").fetchone()[0] == 3
+    line_count = con.execute("SELECT line_count FROM bronze_file_watermarks").fetchone()[0]
+    assert line_count == 3
+
+
+def test_bronze_incremental_rebuilds_on_truncation(tmp_path):
+    """Verify that a truncated or rewritten file triggers a full rebuild."""
+    from src.bronze import ingest_events
+
+    con = duckdb.connect(':memory:')
+    path = str(tmp_path / 'events.ndjson')
+    _write_lines(path, ['{"event_id": "e1", "user_id": "u1"}', '{"event_id": "e2", "user_id": "u2"}'])
+    ingest_events(con, path)
+
+    _write_lines(path, ['{"event_id": "x1", "user_id": "u9"}'])
+    assert ingest_events(con, path) == (1, 1, 0, True)
+    assert con.execute("SELECT event_id FROM bronze_events").fetchall() == [('x1',)]
+
+
+def test_bronze_quarantines_malformed_lines(tmp_path):
+    """Verify that unparseable lines are captured with their position and raw text."""
+    from src.bronze import ingest_events
+
+    con = duckdb.connect(':memory:')
+    path = str(tmp_path / 'events.ndjson')
+    good = '{"event_id": "e1", "user_id": "u1", "amount": "ten"}'
+    _write_lines(path, [good, 'not a json line at all', '{"event_id": "e2", "user_id'])
+
+    assert ingest_events(con, path) == (3, 1, 2, True)
+
+    rows = con.execute("""
+        SELECT line_number, byte_offset, raw_line, rejection_reason 
+        FROM quarantine_raw_events ORDER BY line_number
+    """).fetchall()
+    assert rows == [
+        (2, len(good) + 1, 'not a json line at all', 'Malformed JSON'),
+        (3, len(good) + 24, '{"event_id": "e2", "user_id', 'Malformed JSON'),
+    ]
+    # The 'ten' trap is still valid JSON and stays in Bronze as text
+    assert con.execute("SELECT amount, raw_amount FROM bronze_events").fetchone() == (None, 'ten')
+
+
+
+def test_bronze_crlf_lines_are_not_split_twice(tmp_path):
+    """Verify that CRLF (and mixed) line endings yield one row per line with exact byte offsets."""
+    from src.bronze import ingest_events
+
+    con = duckdb.connect(':memory:')
+    path = str(tmp_path / 'events.ndjson')
+    lines = [f'{{"event_id": "e{i}", "user_id": "u1"}}' for i in range(5)] + ['not json']
+    with open(path, 'wb') as f:
+        f.write((lines[0] + '\n' + '\r\n'.join(lines[1:]) + '\r\n').encode('utf-8'))
+
+    assert ingest_events(con, path) == (6, 5, 1, True)
+    offset = open(path, 'rb').read().index(b'not json')
+    assert con.execute("SELECT line_number, byte_offset, rejection_reason FROM quarantine_raw_events").fetchall() == [
+        (6, offset, 'Malformed JSON'),
+    ]
+
+    # An appended CRLF line continues the line count and offsets
+    with open(path, 'ab') as f:
+        f.write(b'{"event_id": "e5", "user_id": "u1"}\r\n')
+    assert ingest_events(con, path) == (1, 1, 0, False)
+    assert con.execute("SELECT line_count, byte_offset FROM bronze_file_watermarks").fetchone() == (7, os.path.getsize(path))
+
+def test_bronze_stores_typed_columns_per_schema_version(tmp_path):
+    """Verify typed columns, raw text only for failed casts, and per-version projection."""
+    from src.bronze import ingest_events
+
+    con = duckdb.connect(':memory:')
+    path = str(tmp_path / 'events.ndjson')
+    _write_lines(path, [
+        '{"event_id": "e1", "user_id": "u1", "timestamp": "2026-01-17T14:57:08Z", "amount": 9.99, "tax": 0.5, '
+        '"currency": "EUR", "page": "/home", "schema_version": 2}',
+        '{"event_id": "e2", "user_id": "u1", "timestamp": "17/01/2026", "amount": "ten", '
+        '"currency": "EUR", "acquisition_channel": "Search", "schema_version": 1}',
+    ])
+    ingest_events(con, path)
+
+    rows = con.execute("""
+        SELECT event_id, event_ts::VARCHAR, amount, tax, currency, page, acquisition_channel, schema_version,
+               raw_timestamp, raw_amount
+        FROM bronze_events ORDER BY event_id
+    """).fetchall()
+    assert rows == [
+        ('e1', '2026-01-17 14:57:08', 9.99, 0.5, 'EUR', '/home', None, 2, None, None),
+        # currency is not a schema_version 1 field
+        ('e2', None, None, None, None, None, 'Search', 1, '17/01/2026', 'ten'),
+    ]
+
+
+def test_bronze_ingests_compressed_shards_in_parallel(tmp_path):
+    """Verify glob-based, multi-file ingestion with gzip shards and provenance columns."""
+    import gzip
+    from src.bronze import ingest_events, resolve_sources
+
+    con = duckdb.connect(':memory:')
+    _write_lines(str(tmp_path / 'events-00.ndjson'), ['{"event_id": "e1", "user_id": "u1"}'])
+    with gzip.open(tmp_path / 'events-01.ndjson.gz', 'wt', encoding='utf-8') as f:
+        f.write('{"event_id": "e2", "user_id": "u2"}\n{"event_id": "e3", "user_id": "u3"}\n')
+
+    paths = resolve_sources(str(tmp_path / 'events-*'))
+    assert ingest_events(con, paths, threads=2, batch_id='b1') == (3, 3, 0, True)
+
+    rows = con.execute("""
+        SELECT event_id, source_file, ingest_batch_id FROM bronze_events ORDER BY event_id
+    """).fetchall()
+    assert [(r[0], os.path.basename(r[1]), r[2]) for r in rows] == [
+        ('e1', 'events-00.ndjson', 'b1'),
+        ('e2', 'events-01.ndjson.gz', 'b1'),
+        ('e3', 'events-01.ndjson.gz', 'b1'),
+    ]
+
+    # A new hourly shard is appended without rebuilding the existing ones
+    _write_lines(str(tmp_path / 'events-02.ndjson'), ['{"event_id": "e4", "user_id": "u4"}'])
+    paths = resolve_sources(str(tmp_path / 'events-*'))
+    assert ingest_events(con, paths, threads=2) == (1, 1, 0, False)
+
+
+def test_bronze_source_paths_are_bound_not_spliced(tmp_path):
+    """Verify that paths with quotes load, and that a pattern matching nothing fails clearly."""
+    from src.bronze import ingest_events, load_marketing, load_subscriptions
+
+    con = duckdb.connect(':memory:')
+    folder = tmp_path / "o'brien"
+    folder.mkdir()
+    (folder / 'marketing_spend.csv').write_text('date,channel,spend\n2026-01-01,Google,100\n')
+    (folder / 'subscriptions.json').write_text('[{"subscription_id": "s1", "price": 10}]')
+    _write_lines(str(folder / 'events.ndjson'), ['{"event_id": "e1", "user_id": "u1"}'])
+
+    assert load_marketing(con, sources={'marketing': str(folder / '*.csv')}, batch_id='b1')['rows_out'] == 1
+    assert load_subscriptions(con, sources={'subscriptions': str(folder / '*.json')})['rows_out'] == 1
+    assert ingest_events(con, str(folder / 'events.ndjson')) == (1, 1, 0, True)
+    assert con.execute("SELECT source_file, ingest_batch_id FROM bronze_marketing").fetchone() == (
+        str(folder / 'marketing_spend.csv'), 'b1')
+
+    with pytest.raises(FileNotFoundError, match='No marketing source files match'):
+        load_marketing(con, sources={'marketing': str(tmp_path / 'missing-*.csv')})
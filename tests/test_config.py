@@ -0,0 +1,34 @@
+import json
+import pytest
+import duckdb
+from src.config import load_config, apply_config
+
+def test_config_file_then_env_precedence(tmp_path):
+    path = tmp_path / 'pipeline.json'
+    path.write_text(json.dumps({'memory_limit': '2GB', 'threads': 4, 'chunk_days': 7}))
+    config = load_config(str(path), environ={'AUDICIN_THREADS': '2', 'AUDICIN_PRESERVE_INSERTION_ORDER': 'false'})
+    assert config['memory_limit'] == '2GB'
+    assert config['threads'] == 2
+    assert config['chunk_days'] == 7
+    assert config['preserve_insertion_order'] is False
+    assert config['chunk_buckets'] is None
+
+def test_config_rejects_unknown_keys(tmp_path):
+    path = tmp_path / 'pipeline.json'
+    path.write_text(json.dumps({'memory_limt': '2GB'}))
+    with pytest.raises(ValueError, match='memory_limt'):
+        load_config(str(path), environ={})
+
+def test_apply_config_sets_duckdb_options(tmp_path):
+    con = duckdb.connect(':memory:')
+    spill = tmp_path / 'spill'
+    apply_config(con, load_config(environ={
+        'AUDICIN_MEMORY_LIMIT': '256MB', 'AUDICIN_THREADS': '1',
+        'AUDICIN_TEMP_DIRECTORY': str(spill), 'AUDICIN_PRESERVE_INSERTION_ORDER': '0',
+    }))
+    settings = dict(con.cursor().execute("""
+        SELECT name, value FROM duckdb_settings()
+        WHERE name IN ('threads', 'temp_directory', 'preserve_insertion_order')
+    """).fetchall())
+    assert settings == {'threads': '1', 'temp_directory': str(spill), 'preserve_insertion_order': 'false'}
+    assert spill.is_dir()
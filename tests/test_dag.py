@@ -0,0 +1,127 @@
+import pytest
+import duckdb
+import threading
+from src.dag import PipelineDAG
+
+@pytest.fixture
+def con():
+    return duckdb.connect(':memory:')
+
+def test_dag_respects_dependencies(con):
+    order = []
+    dag = PipelineDAG()
+    dag.add_step('bronze', lambda c: order.append('bronze'))
+    dag.add_step('silver', lambda c: order.append('silver'), deps=['bronze'])
+    dag.add_step('gold', lambda c: order.append('gold'), deps=['silver'])
+    durations = dag.run(con)
+    assert order == ['bronze', 'silver', 'gold']
+    assert set(durations) == {'bronze', 'silver', 'gold'}
+
+def test_dag_runs_independent_steps_concurrently(con):
+    # Both steps wait for each other; this only finishes if they overlap
+    barrier = threading.Barrier(2, timeout=5)
+    dag = PipelineDAG()
+    dag.add_step('marketing', lambda c: barrier.wait())
+    dag.add_step('events', lambda c: barrier.wait())
+    dag.run(con)
+
+def test_dag_steps_share_the_database(con):
+    dag = PipelineDAG()
+    dag.add_step('create', lambda c: c.execute("CREATE TABLE t AS SELECT 42 AS x"))
+    dag.add_step('copy', lambda c: c.execute("CREATE TABLE t2 AS SELECT x FROM t"), deps=['create'])
+    dag.run(con)
+    assert con.execute("SELECT x FROM t2").fetchone()[0] == 42
+
+def test_dag_only_reruns_downstream(con):
+    ran = []
+    dag = PipelineDAG()
+    dag.add_step('bronze_marketing', lambda c: ran.append('bronze_marketing'))
+    dag.add_step('bronze_events', lambda c: ran.append('bronze_events'))
+    dag.add_step('silver_events', lambda c: ran.append('silver_events'), deps=['bronze_events'])
+    dag.add_step('gold', lambda c: ran.append('gold'), deps=['bronze_marketing', 'silver_events'])
+    dag.run(con, only=['silver_events'])
+    assert ran == ['silver_events', 'gold']
+
+def test_dag_rejects_unknown_dependency():
+    dag = PipelineDAG()
+    with pytest.raises(ValueError):
+        dag.add_step('silver', lambda c: None, deps=['bronze'])
+
+def test_dag_failure_stops_downstream(con):
+    ran = []
+    def fail(c):
+        raise RuntimeError("boom")
+    dag = PipelineDAG()
+    dag.add_step('bronze', fail)
+    dag.add_step('silver', lambda c: ran.append('silver'), deps=['bronze'])
+    with pytest.raises(RuntimeError, match="boom"):
+        dag.run(con)
+    assert ran == []
+
+def test_dag_skips_steps_with_unchanged_fingerprints(con):
+    inputs = {'marketing': 'v1', 'events': 'v1'}
+    ran = []
+    def build():
+        dag = PipelineDAG()
+        dag.add_step('bronze_marketing', lambda c: ran.append('bronze_marketing'),
+                     fingerprint=lambda c: inputs['marketing'])
+        dag.add_step('bronze_events', lambda c: ran.append('bronze_events'),
+                     fingerprint=lambda c: inputs['events'])
+        dag.add_step('gold', lambda c: ran.append('gold'), deps=['bronze_marketing', 'bronze_events'],
+                     fingerprint=lambda c: '')
+        dag.add_step('report', lambda c: ran.append('report'), deps=['gold'])
+        return dag
+
+    build().run(con, skip_unchanged=True)
+    assert sorted(ran) == ['bronze_events', 'bronze_marketing', 'gold', 'report']
+
+    # Nothing changed: only the step without a fingerprint runs again
+    ran.clear()
+    dag = build()
+    dag.run(con, skip_unchanged=True)
+    assert ran == ['report']
+    assert sorted(dag.skipped) == ['bronze_events', 'bronze_marketing', 'gold']
+
+    # A changed input re-runs that step and everything downstream of it
+    ran.clear()
+    inputs['marketing'] = 'v2'
+    build().run(con, skip_unchanged=True)
+    assert sorted(ran) == ['bronze_marketing', 'gold', 'report']
+
+def test_dag_forgets_fingerprint_of_failed_step(con):
+    fail = [True]
+    def flaky(c):
+        if fail[0]:
+            raise RuntimeError("boom")
+    dag = PipelineDAG()
+    dag.add_step('load', lambda c: None, fingerprint=lambda c: 'v1')
+    dag.add_step('clean', flaky, deps=['load'], fingerprint=lambda c: '')
+    with pytest.raises(RuntimeError):
+        dag.run(con, skip_unchanged=True)
+    fail[0] = False
+    dag.run(con, skip_unchanged=True)
+    assert dag.skipped == ['load']
+    assert con.execute("SELECT COUNT(*) FROM pipeline_step_cache").fetchone()[0] == 2
+
+def test_dag_records_fingerprint_after_step_for_outputs(con, tmp_path):
+    out = tmp_path / 'export'
+    ran = []
+    def export(c):
+        ran.append('export')
+        out.mkdir(exist_ok=True)
+    def build():
+        dag = PipelineDAG()
+        dag.add_step('export', export, fingerprint=lambda c: str(out.is_dir()), fingerprint_after=True)
+        return dag
+
+    # The first run creates the output, and the next run sees it unchanged
+    build().run(con, skip_unchanged=True)
+    dag = build()
+    dag.run(con, skip_unchanged=True)
+    assert ran == ['export'] and dag.skipped == ['export']
+
+    # Removing the output re-runs the step once
+    out.rmdir()
+    build().run(con, skip_unchanged=True)
+    build().run(con, skip_unchanged=True)
+    assert ran == ['export', 'export']
@@ -0,0 +1,47 @@
+import pytest
+import duckdb
+import datetime
+from src.export import run_export
+from src.query import partition_files, read_partitions
+
+@pytest.fixture
+def gold_data():
+    con = duckdb.connect(':memory:')
+    con.execute("""
+        CREATE TABLE silver_events (event_id VARCHAR, user_id VARCHAR, event_type VARCHAR, event_ts TIMESTAMP, amount DOUBLE, is_bot BOOLEAN);
+        INSERT INTO silver_events VALUES 
+        ('e1', 'u1', 'signup', '2026-01-01 09:00:00', 0, false),
+        ('e2', 'u1', 'purchase', '2026-01-02 10:00:00', 100.0, false),
+        ('e3', 'u1', 'refund', '2026-01-03 11:00:00', 20.0, false);
+
+        CREATE TABLE daily_revenue_net (date DATE, net_revenue DOUBLE);
+        INSERT INTO daily_revenue_net VALUES ('2026-01-02', 100.0), ('2026-01-03', -20.0);
+    """)
+    return con
+
+def test_export_writes_hive_partitions(gold_data, tmp_path):
+    run_export(gold_data, export_dir=str(tmp_path))
+    files = partition_files('silver_events', root=str(tmp_path))
+    assert len(files) == 3
+    assert 'year=2026' in files[0] and 'month=1' in files[0] and 'day=1' in files[0]
+
+def test_export_partition_pruned_read(gold_data, tmp_path):
+    run_export(gold_data, export_dir=str(tmp_path))
+    day = datetime.date(2026, 1, 3)
+    # Only the one matching partition is opened
+    assert len(partition_files('daily_revenue_net', day, day, root=str(tmp_path))) == 1
+    net = gold_data.execute(
+        f"SELECT net_revenue FROM {read_partitions('daily_revenue_net', day, day, root=str(tmp_path))}"
+    ).fetchone()[0]
+    assert net == -20.0
+
+def test_export_partition_read_outside_range_is_empty(gold_data, tmp_path):
+    run_export(gold_data, export_dir=str(tmp_path))
+    day = datetime.date(2026, 2, 1)
+    assert partition_files('daily_revenue_net', day, day, root=str(tmp_path)) == []
+    rows = gold_data.execute(
+        f"SELECT date, net_revenue FROM {read_partitions('daily_revenue_net', day, day, root=str(tmp_path))}"
+    ).fetchall()
+    assert rows == []
+    with pytest.raises(FileNotFoundError):
+        read_partitions('never_exported', root=str(tmp_path))
@@ -0,0 +1,43 @@
+import pytest
+import duckdb
+from src.generate import generate_dataset
+from src.bronze import run_bronze
+from src.silver import run_silver
+
+@pytest.fixture(scope='module')
+def generated(tmp_path_factory):
+    out_dir = tmp_path_factory.mktemp('gen')
+    sources = generate_dataset(str(out_dir), events=45000, days=30, seed=7)
+    con = duckdb.connect(':memory:')
+    run_bronze(con, sources=sources)
+    run_silver(con)
+    return sources, con
+
+def test_generator_is_deterministic(generated, tmp_path):
+    sources, _ = generated
+    again = generate_dataset(str(tmp_path), events=45000, days=30, seed=7)
+    for key in ('events', 'marketing', 'subscriptions'):
+        with open(sources[key], 'rb') as a, open(again[key], 'rb') as b:
+            assert a.read() == b.read()
+
+def test_generator_reproduces_event_traps(generated):
+    _, con = generated
+    # Malformed lines, the "ten" amount and missing users are rejected
+    assert con.execute("SELECT COUNT(*) FROM quarantine_raw_events").fetchone()[0] > 0
+    reasons = {r[0] for r in con.execute("SELECT DISTINCT rejection_reason FROM quarantine_events").fetchall()}
+    assert 'Invalid numeric amount (e.g. ten)' in reasons
+    # Duplicate event_ids, bot bursts, and every timestamp format parses
+    assert con.execute("SELECT COUNT(*) - COUNT(DISTINCT event_id) FROM bronze_events").fetchone()[0] > 0
+    assert con.execute("SELECT COUNT(*) FROM silver_events WHERE is_bot").fetchone()[0] >= 25
+    assert con.execute("SELECT COUNT(*) FROM silver_events WHERE event_ts IS NULL").fetchone()[0] == 0
+
+def test_generator_reproduces_source_traps(generated):
+    sources, con = generated
+    # Schema drift: both versions are present
+    versions = duckdb.connect().execute(f"""
+        SELECT DISTINCT schema_version FROM read_json_auto('{sources['events']}', ignore_errors=true)
+        WHERE schema_version IS NOT NULL ORDER BY 1
+    """).fetchall()
+    assert versions == [(1,), (2,)]
+    assert con.execute("SELECT rejection_reason FROM quarantine_marketing").fetchall() == [('Negative spend',)]
+    assert con.execute("SELECT COUNT(*) - COUNT(DISTINCT subscription_id) FROM bronze_subscriptions").fetchone()[0] > 0
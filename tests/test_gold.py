@@ -1,6 +1,8 @@
 import pytest
 import duckdb
-from src.gold import run_gold
+import datetime
+from src.gold import run_gold, build_mrr, active_users_sql, cohort_active_users_sql
+from src.silver import rebuild_users
 
 @pytest.fixture
 def silver_data():
@@ -12,14 +14,17 @@ def silver_data():
         ('e2', 'u1', 'purchase', '2026-01-02', 100.0, false),
         ('e3', 'u1', 'refund', '2026-01-03', 20.0, false); 
         
-        CREATE TABLE silver_subscriptions (subscription_id VARCHAR, price DOUBLE, created_at TIMESTAMP, status VARCHAR);
-        INSERT INTO silver_subscriptions VALUES ('s1', 50.0, '2026-01-01', 'active');
+        CREATE TABLE silver_subscriptions (subscription_id VARCHAR, user_id VARCHAR, price DOUBLE,
+                                           start_date DATE, end_date DATE, status VARCHAR, created_at TIMESTAMP,
+                                           canceled_on DATE);
+        INSERT INTO silver_subscriptions VALUES ('s1', 'u1', 50.0, '2026-01-01', NULL, 'active', '2026-01-01', NULL);
 
         CREATE TABLE silver_marketing (date DATE, channel VARCHAR, spend DOUBLE);
         INSERT INTO silver_marketing VALUES 
         ('2026-01-01', 'Search', 10.0),    -- This will match the signup on Jan 1st
         ('2026-01-05', 'Offline', 500.0); -- MOVED TO JAN 5th (No signups on this day)
     """)
+    rebuild_users(con)
     return con
 
 def test_gold_net_revenue(silver_data):
@@ -36,9 +41,119 @@ def test_gold_cac_division_by_zero_safety(silver_data):
     
     assert cac_val is None, f"Expected None for CAC with 0 signups, but got {cac_val}"
 
-def test_gold_mrr_active_only(silver_data):
-    # Add a cancelled subscription
-    silver_data.execute("INSERT INTO silver_subscriptions VALUES ('s2', 99.0, '2026-01-01', 'cancelled')")
+def test_gold_mrr_counts_canceled_subscriptions_while_active(silver_data):
+    # u2 is canceled mid-February: it bills January and February, then churns
+    silver_data.execute("INSERT INTO silver_subscriptions VALUES ('s2', 'u2', 99.0, '2026-01-01', '2026-02-10', 'canceled', '2026-01-01', NULL)")
+    # u1 adds a second plan in February
+    silver_data.execute("INSERT INTO silver_subscriptions VALUES ('s3', 'u1', 20.0, '2026-02-05', NULL, 'active', '2026-02-05', NULL)")
     run_gold(silver_data)
-    mrr = silver_data.execute("SELECT mrr FROM mrr_monthly").fetchone()[0]
-    assert mrr == 50.0 # Should ignore the 99.0 cancelled sub
\ No newline at end of file
+    rows = silver_data.execute("""
+        SELECT month::VARCHAR, mrr, new_mrr, expansion_mrr, contraction_mrr, churned_mrr FROM mrr_monthly
+        WHERE month <= '2026-03-01' ORDER BY month
+    """).fetchall()
+    assert rows == [('2026-01-01', 149.0, 149.0, 0.0, 0.0, 0.0),
+                    ('2026-02-01', 169.0, 0.0, 20.0, 0.0, 0.0),
+                    ('2026-03-01', 70.0, 0.0, 0.0, 0.0, 99.0)]
+
+def test_gold_mrr_carries_open_ended_subscriptions_to_current_month(silver_data):
+    # s1 (u1, active, no end_date) is the only subscription: its one change is January
+    build_mrr(silver_data, as_of=datetime.date(2026, 4, 15))
+    rows = silver_data.execute("SELECT month::VARCHAR, mrr, new_mrr FROM mrr_monthly ORDER BY month").fetchall()
+    assert rows == [('2026-01-01', 50.0, 50.0), ('2026-02-01', 50.0, 0.0),
+                    ('2026-03-01', 50.0, 0.0), ('2026-04-01', 50.0, 0.0)]
+
+def test_gold_mrr_bills_canceled_subscriptions_through_cancellation(silver_data):
+    # Canceled in March with no end_date: Silver carries the cancellation date as canceled_on
+    silver_data.execute("INSERT INTO silver_subscriptions VALUES ('s2', 'u2', 99.0, '2026-01-20', NULL, 'canceled', '2026-01-20', '2026-03-05')")
+    build_mrr(silver_data, as_of=datetime.date(2026, 1, 1))
+    rows = silver_data.execute("SELECT month::VARCHAR, mrr, churned_mrr FROM mrr_monthly ORDER BY month").fetchall()
+    assert rows == [('2026-01-01', 149.0, 0.0), ('2026-02-01', 149.0, 0.0),
+                    ('2026-03-01', 149.0, 0.0), ('2026-04-01', 50.0, 99.0)]
+
+def test_gold_mrr_bills_undated_cancellations_for_their_start_month(silver_data):
+    # Canceled, but neither end_date nor canceled_on says when: only the start month bills
+    silver_data.execute("INSERT INTO silver_subscriptions VALUES ('s2', 'u2', 99.0, '2026-02-20', NULL, 'canceled', '2026-02-20', NULL)")
+    build_mrr(silver_data, as_of=datetime.date(2026, 1, 1))
+    rows = silver_data.execute("SELECT month::VARCHAR, mrr, new_mrr, churned_mrr FROM mrr_monthly ORDER BY month").fetchall()
+    assert rows == [('2026-01-01', 50.0, 50.0, 0.0), ('2026-02-01', 149.0, 99.0, 0.0), ('2026-03-01', 50.0, 0.0, 99.0)]
+
+def test_gold_mrr_incremental_matches_full_refresh(silver_data):
+    run_gold(silver_data)
+    # A new subscriber, and u1 downgrading from March
+    silver_data.execute("""
+        INSERT INTO silver_subscriptions VALUES ('s4', 'u3', 30.0, '2026-02-01', NULL, 'active', '2026-02-01', NULL);
+        UPDATE silver_subscriptions SET end_date = '2026-02-28', status = 'canceled' WHERE subscription_id = 's1';
+        INSERT INTO silver_subscriptions VALUES ('s5', 'u1', 10.0, '2026-03-01', NULL, 'active', '2026-03-01', NULL);
+    """)
+    run_gold(silver_data)
+    tables = ['mrr_monthly', 'gold_mrr_user_changes', 'gold_mrr_intervals']
+    incremental = {t: sorted(silver_data.execute(f"SELECT * FROM {t}").fetchall()) for t in tables}
+    assert silver_data.execute("SELECT contraction_mrr FROM mrr_monthly WHERE month = '2026-03-01'").fetchone()[0] == 40.0
+    run_gold(silver_data, full_refresh=True)
+    for t in tables:
+        assert sorted(silver_data.execute(f"SELECT * FROM {t}").fetchall()) == incremental[t]
+
+def test_gold_incremental_refresh_matches_full_refresh(silver_data):
+    # Silver's change log and generation make Gold eligible for incremental refresh
+    silver_data.execute("""
+        CREATE TABLE silver_watermarks (source_table VARCHAR, generation VARCHAR);
+        INSERT INTO silver_watermarks VALUES ('bronze_events', 'g1');
+        CREATE TABLE silver_event_changes (change_id BIGINT, user_id VARCHAR, event_date DATE);
+    """)
+    run_gold(silver_data)
+    rowids_sql = "SELECT date, rowid FROM daily_revenue_net"
+    rowids = dict(silver_data.execute(rowids_sql).fetchall())
+
+    # A new user signs up on Jan 1st and buys on Jan 3rd
+    silver_data.execute("""
+        INSERT INTO silver_events VALUES
+        ('e4', 'u2', 'signup', '2026-01-01', 0, false),
+        ('e5', 'u2', 'purchase', '2026-01-03', 30.0, false);
+        INSERT INTO silver_event_changes VALUES (1, 'u2', '2026-01-01'), (2, 'u2', '2026-01-03');
+    """)
+    rebuild_users(silver_data)
+    run_gold(silver_data)
+
+    net_rev = silver_data.execute("SELECT net_revenue FROM daily_revenue_net WHERE date = '2026-01-03'").fetchone()[0]
+    assert net_rev == 10.0
+    cac = silver_data.execute("SELECT cac FROM cac_by_channel WHERE channel = 'Search'").fetchone()[0]
+    assert cac == 5.0
+    # Only the changed dates are rewritten; Jan 2nd's row stays in place
+    new_rowids = dict(silver_data.execute(rowids_sql).fetchall())
+    unchanged = [d for d in new_rowids if new_rowids[d] == rowids.get(d)]
+    assert [str(d) for d in unchanged] == ['2026-01-02']
+
+    tables = ['daily_active_users', 'daily_revenue_net', 'weekly_cohort_retention', 'ltv_per_user', 'ltv_cac_ratio',
+              'gold_user_sketches', 'gold_cohort_sketches', 'weekly_active_users']
+    incremental = {t: sorted(silver_data.execute(f"SELECT * FROM {t}").fetchall()) for t in tables}
+    run_gold(silver_data, full_refresh=True)
+    for t in tables:
+        assert sorted(silver_data.execute(f"SELECT * FROM {t}").fetchall()) == incremental[t]
+
+def test_gold_sketches_match_exact_counts(silver_data):
+    # 1,000 users over three days; linear counting is near-exact at this size
+    silver_data.execute("""
+        INSERT INTO silver_events
+        SELECT 'x' || i, 'user' || (i % 1000), 'login', TIMESTAMP '2026-01-05' + to_days((i % 3)::INT), 0, false
+        FROM range(3000) t(i)
+    """)
+    rebuild_users(silver_data)
+    run_gold(silver_data)
+    for start, end in (('2026-01-05', '2026-01-05'), ('2026-01-01', '2026-01-31')):
+        estimate = silver_data.execute(active_users_sql(start, end)).fetchone()[0]
+        exact = silver_data.execute(active_users_sql(start, end, exact=True)).fetchone()[0]
+        assert abs(estimate - exact) <= exact * 0.02
+
+    mau = silver_data.execute("SELECT mau FROM monthly_active_users").fetchone()[0]
+    assert abs(mau - 1001) <= 20
+    assert silver_data.execute(cohort_active_users_sql('2025-12-29', '2026-01-05')).fetchall() == \
+        silver_data.execute(cohort_active_users_sql('2025-12-29', '2026-01-05', exact=True)).fetchall()
+
+def test_gold_chunked_rebuild_matches_single_pass(silver_data):
+    tables = ['daily_active_users', 'daily_revenue_gross', 'daily_revenue_net', 'weekly_cohort_retention',
+              'ltv_per_user', 'gold_user_sketches', 'monthly_active_users']
+    run_gold(silver_data)
+    single = {t: silver_data.execute(f"SELECT * FROM {t}").fetchall() for t in tables}
+    run_gold(silver_data, full_refresh=True, chunk_days=1)
+    for t in tables:
+        assert silver_data.execute(f"SELECT * FROM {t}").fetchall() == single[t]
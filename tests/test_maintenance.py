@@ -0,0 +1,97 @@
+import pytest
+import duckdb
+import os
+import subprocess
+import sys
+import time
+
+# maintenance.py is a script with flat imports of its sibling modules
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+from maintenance import cluster_depth, table_layout, run_maintenance, compact_database
+from service import QueryService, read_version, writer_pending
+
+@pytest.fixture
+def lakehouse(tmp_path):
+    """silver_events written in event_id order, so every row group spans the whole month."""
+    db_path = str(tmp_path / 'lakehouse.db')
+    con = duckdb.connect(db_path)
+    con.execute("""
+        CREATE TABLE silver_events AS
+        SELECT 'ev_' || lpad(range::VARCHAR, 7, '0') as event_id,
+               TIMESTAMP '2026-01-01' + INTERVAL (range * 7919 % 500000) MINUTE as event_ts
+        FROM range(500000)
+    """)
+    con.close()
+    return db_path
+
+def test_maintenance_reclusters_degraded_silver_events(lakehouse):
+    con = duckdb.connect(lakehouse)
+    events = con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall()
+    assert cluster_depth(con, 'silver_events') > 2
+    con.close()
+
+    layout = run_maintenance(lakehouse)
+    row = layout.set_index('table_name').loc['silver_events']
+    assert row['rows'] == 500000 and row['zone_map_column'] == 'event_ts'
+    assert row['cluster_depth'] == 1.0
+
+    con = duckdb.connect(lakehouse)
+    assert con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall() == events
+    con.close()
+
+def test_compaction_returns_free_blocks(lakehouse):
+    con = duckdb.connect(lakehouse)
+    # Free blocks in the middle of the file: scratch is written before kept_events
+    con.execute("CREATE TABLE scratch AS SELECT range as id, md5(range::VARCHAR) as payload FROM range(300000)")
+    con.execute("CHECKPOINT")
+    con.execute("CREATE TABLE kept_events AS SELECT * FROM silver_events")
+    con.execute("CHECKPOINT")
+    con.execute("DROP TABLE scratch")
+    con.execute("CHECKPOINT")
+    con.close()
+
+    before, after = compact_database(lakehouse)
+    assert after < before and os.path.getsize(lakehouse) == after
+    con = duckdb.connect(lakehouse)
+    assert con.execute("SELECT COUNT(*) FROM silver_events").fetchone()[0] == 500000
+    assert con.execute("SELECT COUNT(*) FROM kept_events").fetchone()[0] == 500000
+    assert sorted(table_layout(con)['table_name']) == ['kept_events', 'silver_events']
+    con.close()
+
+@pytest.mark.parametrize('force', [False, True])
+def test_maintenance_handles_empty_silver_events(tmp_path, force):
+    db_path = str(tmp_path / 'lakehouse.db')
+    con = duckdb.connect(db_path)
+    con.execute("CREATE TABLE silver_events (event_id VARCHAR, event_ts TIMESTAMP)")
+    assert cluster_depth(con, 'silver_events') is None
+    con.close()
+
+    layout = run_maintenance(db_path, force=force)
+    row = layout.set_index('table_name').loc['silver_events']
+    assert row['rows'] == 0 and row['cluster_depth'] is None
+
+MAINTAIN = """
+import sys
+sys.path.insert(0, 'src')
+from maintenance import run_maintenance
+run_maintenance(sys.argv[1], compact=True)
+"""
+
+def test_maintenance_waits_for_readers_and_bumps_the_version(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None, writer_wait=30)
+    assert service.query("SELECT COUNT(*) as n FROM silver_events").column('n').to_pylist() == [500000]
+
+    # The pool holds the file; maintenance announces itself and waits for it to let go
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    maintenance = subprocess.Popen([sys.executable, '-c', MAINTAIN, lakehouse], cwd=root)
+    while maintenance.poll() is None:
+        if writer_pending(lakehouse):
+            service.query("SELECT 1")
+        time.sleep(0.05)
+    assert maintenance.returncode == 0
+
+    # Compaction swapped the file: readers are told to reopen it
+    assert read_version(lakehouse) is not None
+    assert service.query("SELECT COUNT(*) as n FROM silver_events").column('n').to_pylist() == [500000]
+    service.close()
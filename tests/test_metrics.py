@@ -0,0 +1,53 @@
+import pytest
+import duckdb
+import datetime
+from src.dag import PipelineDAG
+from src.metrics import record_run
+from src.query import run_comparison_sql
+
+def _run(con, run_id, rows, profile_dir=None, started_at=None):
+    def load(c):
+        c.execute(f"CREATE OR REPLACE TABLE t AS SELECT range AS x FROM range({rows})")
+        return {'rows_in': rows, 'rows_out': rows, 'rows_quarantined': 0}
+    dag = PipelineDAG()
+    dag.add_step('load', load)
+    dag.add_step('aggregate', lambda c: c.execute("CREATE OR REPLACE TABLE agg AS SELECT SUM(x) FROM t"), deps=['load'])
+    dag.run(con, profile_dir=profile_dir)
+    started_at = started_at or datetime.datetime.now()
+    record_run(con, run_id, started_at, started_at + datetime.timedelta(seconds=1), 'success', dag.metrics)
+
+def test_record_run_persists_step_metrics(tmp_path):
+    con = duckdb.connect(':memory:')
+    _run(con, 'r1', 1000, profile_dir=str(tmp_path))
+    steps = dict(con.execute("SELECT step_name, rows_out FROM pipeline_step_metrics WHERE run_id = 'r1'").fetchall())
+    assert steps == {'load': 1000, 'aggregate': None}
+    assert con.execute("SELECT status, duration_s FROM pipeline_runs").fetchone() == ('success', 1.0)
+
+    # One JSON profile per statement, attributed to its step
+    profiled = con.execute("""
+        SELECT step_name, query_text FROM pipeline_query_profiles ORDER BY step_name, statement_seq
+    """).fetchall()
+    assert [p[0] for p in profiled] == ['aggregate', 'load']
+    assert 'range(1000)' in profiled[1][1]
+
+def test_failed_step_is_recorded():
+    con = duckdb.connect(':memory:')
+    def fail(c):
+        raise RuntimeError("boom")
+    dag = PipelineDAG()
+    dag.add_step('bad', fail)
+    with pytest.raises(RuntimeError):
+        dag.run(con)
+    now = datetime.datetime.now()
+    record_run(con, 'r1', now, now, 'failed', dag.metrics, error='boom')
+    assert con.execute("SELECT status, error FROM pipeline_step_metrics").fetchone() == ('failed', 'boom')
+
+def test_comparison_report_uses_latest_run():
+    con = duckdb.connect(':memory:')
+    t0 = datetime.datetime(2026, 1, 1)
+    _run(con, 'old', 10, started_at=t0)
+    _run(con, 'new', 20, started_at=t0 + datetime.timedelta(days=1))
+    report = con.execute(run_comparison_sql()).df().set_index('step_name')
+    assert report.loc['load', 'latest_rows_in'] == 20
+    assert report.loc['load', 'baseline_rows_in'] == 10
+    assert report.loc['load', 'baseline_runs'] == 1
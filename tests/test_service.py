@@ -0,0 +1,107 @@
+import pytest
+import duckdb
+import os
+import subprocess
+import sys
+import time
+import pyarrow as pa
+from src.service import QueryService, bump_version, read_version, writer_pending, release_writer
+
+@pytest.fixture
+def lakehouse(tmp_path):
+    db_path = str(tmp_path / 'lakehouse.db')
+    con = duckdb.connect(db_path)
+    con.execute("CREATE TABLE daily_active_users AS SELECT DATE '2026-01-01' as date, 10 as dau")
+    con.close()
+    bump_version('run1', db_path)
+    return db_path
+
+def test_service_returns_arrow_and_caches(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None)
+    first = service.query("SELECT dau FROM daily_active_users")
+    assert isinstance(first, pa.Table)
+    assert first.column('dau').to_pylist() == [10]
+    service.query("SELECT dau FROM daily_active_users")
+    assert (service.hits, service.misses) == (1, 1)
+    assert service.query("SELECT dau FROM daily_active_users", format='pandas')['dau'].tolist() == [10]
+    service.close()
+
+def test_service_connections_are_read_only(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None)
+    with pytest.raises(duckdb.Error):
+        service.query("DELETE FROM daily_active_users")
+    service.close()
+
+def test_version_bump_invalidates_cache(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None)
+    assert service.query("SELECT dau FROM daily_active_users").column('dau').to_pylist() == [10]
+
+    # The pipeline can write once idle connections are released
+    service.release()
+    con = duckdb.connect(lakehouse)
+    con.execute("UPDATE daily_active_users SET dau = 12")
+    con.close()
+    bump_version('run2', lakehouse)
+
+    assert read_version(lakehouse) == 'run2'
+    assert service.query("SELECT dau FROM daily_active_users").column('dau').to_pylist() == [12]
+    assert service.misses == 2
+    service.close()
+
+def test_cache_evicts_least_recently_used(lakehouse):
+    service = QueryService(lakehouse, cache_size=2, idle_timeout=None)
+    for q in ("SELECT 1", "SELECT 2", "SELECT 1", "SELECT 3", "SELECT 1", "SELECT 2"):
+        service.query(q)
+    # SELECT 2 was evicted by SELECT 3, SELECT 1 stayed hot
+    assert (service.hits, service.misses) == (2, 4)
+    service.close()
+
+def test_idle_pool_releases_file_lock(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=0.01)
+    service.query("SELECT 1")
+    time.sleep(0.2)
+    con = duckdb.connect(lakehouse)
+    con.close()
+
+WRITER = """
+import sys, time
+sys.path.insert(0, 'src')
+from service import connect_writer, release_writer, bump_version
+con = connect_writer(sys.argv[1], wait=30)
+con.execute("UPDATE daily_active_users SET dau = 12")
+time.sleep(0.5)
+con.close()
+bump_version('run2', sys.argv[1])
+release_writer(sys.argv[1])
+"""
+
+def test_pending_writer_makes_service_release_its_pool(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None, writer_wait=0.2)
+    assert service.query("SELECT dau FROM daily_active_users").column('dau').to_pylist() == [10]
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writer = subprocess.Popen([sys.executable, '-c', WRITER, lakehouse], cwd=root)
+    deadline = time.time() + 20
+    while not writer_pending(lakehouse) and time.time() < deadline:
+        time.sleep(0.05)
+
+    # The writer is blocked on the pool's lock until the next query notices it
+    assert service.query("SELECT dau FROM daily_active_users").column('dau').to_pylist() == [10]
+    assert service._open == 0
+    assert writer.wait(timeout=30) == 0
+    assert not writer_pending(lakehouse)
+    assert service.query("SELECT dau FROM daily_active_users").column('dau').to_pylist() == [12]
+    service.close()
+
+def test_queries_needing_the_db_wait_for_a_pending_writer(lakehouse):
+    service = QueryService(lakehouse, idle_timeout=None, writer_wait=0.2)
+    service.query("SELECT 1")
+    with open(lakehouse + '.writer', 'w') as f:
+        f.write(str(os.getpid()))
+    # Cached results are still served; anything else times out
+    assert service.query("SELECT 1").num_rows == 1
+    with pytest.raises(TimeoutError):
+        service.query("SELECT 2")
+    release_writer(lakehouse)
+    assert service.query("SELECT 2").num_rows == 1
+    service.close()
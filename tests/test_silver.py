@@ -1,6 +1,8 @@
 import pytest
 import duckdb
 from src.silver import run_silver
+from src.gold import build_event_tables
+from src.export import run_export
 
 @pytest.fixture
 def mock_con():
@@ -18,26 +20,35 @@ def mock_con():
     """)
 
     # 2. Setup Bronze Subscriptions
-    con.execute("CREATE TABLE bronze_subscriptions (subscription_id VARCHAR, price DOUBLE, created_at TIMESTAMP, status VARCHAR);")
+    con.execute("CREATE TABLE bronze_subscriptions (subscription_id VARCHAR, price DOUBLE, created_at TIMESTAMP, status VARCHAR, end_date DATE);")
     con.execute("""
         INSERT INTO bronze_subscriptions VALUES 
-        ('sub1', 10.0, '2026-01-01', 'active'), 
-        (NULL, 20.0, '2026-01-01', 'active'); -- Missing ID trap
+        ('sub1', 10.0, '2026-01-01', 'active', NULL), 
+        (NULL, 20.0, '2026-01-01', 'active', NULL), -- Missing ID trap
+        ('sub2', 10.0, '2026-01-01', 'canceled', NULL); -- Canceled, but when?
     """)
 
     # 3. Setup Bronze Events (Testing "Ten", Bots, and Timestamp Formats)
-    con.execute("CREATE TABLE bronze_events (event_id VARCHAR, user_id VARCHAR, event_type VARCHAR, timestamp VARCHAR, amount VARCHAR, currency VARCHAR, refers_to_event_id VARCHAR);")
+    # Rows land as Bronze's raw fallback: timestamp and amount text that Silver parses
+    con.execute("""
+        CREATE TABLE bronze_events (event_id VARCHAR, user_id VARCHAR, event_type VARCHAR, event_ts TIMESTAMP, amount DOUBLE,
+                                    currency VARCHAR, refers_to_event_id VARCHAR, raw_timestamp VARCHAR, raw_amount VARCHAR);
+    """)
     con.execute("""
         -- Standard row
-        INSERT INTO bronze_events SELECT 'ev_1', 'u1', 'purchase', '2026-01-01 10:00:00', '10.5', 'USD', NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_1', 'u1', 'purchase', '2026-01-01 10:00:00', '10.5', 'USD', NULL;
         -- The 'ten' trap
-        INSERT INTO bronze_events SELECT 'ev_bad', 'u2', 'purchase', '2026-01-01 10:00:00', 'ten', 'USD', NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_bad', 'u2', 'purchase', '2026-01-01 10:00:00', 'ten', 'USD', NULL;
         -- Mixed Timestamp Formats
-        INSERT INTO bronze_events SELECT 'ts_1', 'u3', 'signup', '2026-01-01T10:00:00Z', NULL, NULL, NULL;
-        INSERT INTO bronze_events SELECT 'ts_2', 'u3', 'page_view', '2026-01-01T10:00:00+00:00', NULL, NULL, NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ts_1', 'u3', 'signup', '2026-01-01T10:00:00Z', NULL, NULL, NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ts_2', 'u3', 'page_view', '2026-01-01T10:00:00+00:00', NULL, NULL, NULL;
         
         -- Bot Burst (25 events in 1 second)
-        INSERT INTO bronze_events 
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
         SELECT 'bot_ev_' || range, 'bot_1', 'page_view', '2026-01-02 11:00:00', NULL, NULL, NULL 
         FROM range(25);
     """)
@@ -60,8 +71,227 @@ def test_silver_marketing_deduplication(mock_con):
     clean_count = mock_con.execute("SELECT COUNT(*) FROM silver_marketing").fetchone()[0]
     assert clean_count == 1
 
+def test_silver_quarantine_lists_every_reason(mock_con):
+    # No user and a non-numeric amount: both rules fail on the same row
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_worse', NULL, 'purchase', '2026-01-01 10:00:00', 'ten', 'USD', NULL
+    """)
+    run_silver(mock_con)
+    reasons = mock_con.execute("""
+        SELECT event_id, rejection_reasons FROM quarantine_events ORDER BY event_id
+    """).fetchall()
+    assert reasons == [('ev_bad', ['Invalid numeric amount (e.g. ten)']),
+                       ('ev_worse', ['Missing user_id', 'Invalid numeric amount (e.g. ten)'])]
+    marketing = mock_con.execute("SELECT spend, rejection_reason FROM quarantine_marketing ORDER BY spend").fetchall()
+    assert marketing == [('-50', 'Negative spend'), ('ten', 'Non-numeric spend')]
+
+def test_silver_subscriptions_canceled_without_end_date(mock_con):
+    run_silver(mock_con)
+    # No end_date and nothing dating the cancellation: kept as is, Gold decides what it bills
+    assert mock_con.execute("""
+        SELECT subscription_id, status, canceled_on FROM silver_subscriptions ORDER BY subscription_id
+    """).fetchall() == [('sub1', 'active', None), ('sub2', 'canceled', None)]
+    assert mock_con.execute("SELECT COUNT(*) FROM quarantine_subscriptions WHERE subscription_id IS NOT NULL").fetchone()[0] == 0
+
+    # With an updated_at, the cancellation is dated by it
+    mock_con.execute("ALTER TABLE bronze_subscriptions ADD COLUMN updated_at TIMESTAMP")
+    mock_con.execute("UPDATE bronze_subscriptions SET updated_at = '2026-03-05 08:00:00'")
+    run_silver(mock_con)
+    assert mock_con.execute("""
+        SELECT subscription_id, canceled_on::VARCHAR FROM silver_subscriptions ORDER BY subscription_id
+    """).fetchall() == [('sub1', None), ('sub2', '2026-03-05')]
+
 def test_silver_timestamp_normalization(mock_con):
     run_silver(mock_con)
     # Check that diverse timestamp formats were converted to actual TIMESTAMP types (not null)
     null_ts = mock_con.execute("SELECT COUNT(*) FROM silver_events WHERE event_ts IS NULL").fetchone()[0]
-    assert null_ts == 0
\ No newline at end of file
+    assert null_ts == 0
+
+def test_silver_incremental_merge_matches_full_refresh(mock_con):
+    # A Bronze generation marks the load as incremental-capable
+    mock_con.execute("CREATE TABLE bronze_generations (table_name VARCHAR, generation VARCHAR)")
+    mock_con.execute("INSERT INTO bronze_generations VALUES ('bronze_events', 'g1')")
+    run_silver(mock_con)
+
+    # Newly landed rows: a later version of ev_1 and a bot burst split across batches
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_1', 'u1', 'purchase', '2026-01-03 10:00:00', '20', 'USD', NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'burst_' || range, 'bot_2', 'page_view', '2026-01-04 09:00:00', NULL, NULL, NULL 
+        FROM range(15);
+    """)
+    run_silver(mock_con)
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'burst_' || range, 'bot_2', 'page_view', '2026-01-04 09:00:00', NULL, NULL, NULL 
+        FROM range(15, 30);
+    """)
+    run_silver(mock_con)
+
+    assert mock_con.execute("SELECT amount FROM silver_events WHERE event_id = 'ev_1'").fetchone()[0] == 20.0
+    bot_rows = mock_con.execute("SELECT COUNT(*) FROM silver_events WHERE user_id = 'bot_2' AND is_bot").fetchone()[0]
+    assert bot_rows == 30
+
+    merged = mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall()
+    users = mock_con.execute("SELECT * FROM silver_users ORDER BY user_id").fetchall()
+    run_silver(mock_con, full_refresh=True)
+    assert mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall() == merged
+    assert mock_con.execute("SELECT * FROM silver_users ORDER BY user_id").fetchall() == users
+
+def test_silver_merge_ranks_new_versions_against_stored_rows(mock_con):
+    mock_con.execute("CREATE TABLE bronze_generations (table_name VARCHAR, generation VARCHAR)")
+    mock_con.execute("INSERT INTO bronze_generations VALUES ('bronze_events', 'g1')")
+    run_silver(mock_con)
+
+    # A stale version of ev_1 lands late: the stored row stays and nothing is marked changed
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_1', 'u1', 'purchase', '2025-12-31 10:00:00', '99', 'USD', NULL;
+    """)
+    run_silver(mock_con)
+    assert mock_con.execute("SELECT amount FROM silver_events WHERE event_id = 'ev_1'").fetchone()[0] == 10.5
+    assert mock_con.execute("SELECT COUNT(*) FROM silver_event_changes").fetchone()[0] == 0
+
+    # Same timestamp as the stored row: the version landed last wins
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_1', 'u1', 'purchase', '2026-01-01T10:00:00Z', '12', 'USD', NULL;
+    """)
+    run_silver(mock_con)
+    assert mock_con.execute("SELECT amount FROM silver_events WHERE event_id = 'ev_1'").fetchone()[0] == 12.0
+
+    merged = mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall()
+    run_silver(mock_con, full_refresh=True)
+    assert mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall() == merged
+
+def test_silver_merge_redetects_bots_only_around_changed_rows(mock_con):
+    mock_con.execute("CREATE TABLE bronze_generations (table_name VARCHAR, generation VARCHAR)")
+    mock_con.execute("INSERT INTO bronze_generations VALUES ('bronze_events', 'g1')")
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'far', 'bot_1', 'login', '2026-01-28 10:00:00', NULL, NULL, NULL;
+    """)
+    run_silver(mock_con)
+    # A flag far from any new row is left alone, where a whole-user rescan would reset it
+    mock_con.execute("UPDATE silver_events SET is_bot = TRUE WHERE event_id = 'far'")
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'near', 'bot_1', 'login', '2026-01-10 10:00:00', NULL, NULL, NULL;
+    """)
+    run_silver(mock_con)
+    assert mock_con.execute("SELECT is_bot FROM silver_events WHERE event_id = 'far'").fetchone()[0] is True
+    run_silver(mock_con, full_refresh=True)
+
+    # Five burst events are re-versioned away, breaking the old burst, and a new burst lands
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'bot_ev_' || range, 'bot_1', 'page_view', '2026-01-20 11:00:00', NULL, NULL, NULL
+        FROM range(5);
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'new_ev_' || range, 'bot_1', 'page_view', '2026-01-15 08:00:00', NULL, NULL, NULL
+        FROM range(25);
+    """)
+    run_silver(mock_con)
+    evidence = mock_con.execute("""
+        SELECT bursts, bot_events, first_burst_at::VARCHAR, last_burst_at::VARCHAR FROM silver_bot_users
+        WHERE user_id = 'bot_1'
+    """).fetchone()
+    assert evidence == (1, 25, '2026-01-15 08:00:00', '2026-01-15 08:00:00')
+
+    merged = mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall()
+    bots = mock_con.execute("SELECT * FROM silver_bot_users ORDER BY user_id").fetchall()
+    run_silver(mock_con, full_refresh=True)
+    assert mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall() == merged
+    assert mock_con.execute("SELECT * FROM silver_bot_users ORDER BY user_id").fetchall() == bots
+
+def test_silver_change_log_is_trimmed_once_gold_and_export_applied_it(mock_con, tmp_path):
+    mock_con.execute("CREATE TABLE bronze_generations (table_name VARCHAR, generation VARCHAR)")
+    mock_con.execute("INSERT INTO bronze_generations VALUES ('bronze_events', 'g1')")
+    run_silver(mock_con)
+    build_event_tables(mock_con)
+    run_export(mock_con, export_dir=str(tmp_path))
+
+    def land(event_id, ts):
+        mock_con.execute(f"""
+            INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+            SELECT '{event_id}', 'u1', 'login', '{ts}', NULL, NULL, NULL;
+        """)
+        run_silver(mock_con)
+    log = lambda: mock_con.execute("SELECT event_date::VARCHAR FROM silver_event_changes ORDER BY change_id").fetchall()
+
+    land('ev_5', '2026-01-05 10:00:00')
+    assert log() == [('2026-01-05',)]
+
+    # Gold applied the first change, but the export has not: the log keeps it
+    build_event_tables(mock_con)
+    land('ev_6', '2026-01-06 10:00:00')
+    assert log() == [('2026-01-05',), ('2026-01-06',)]
+
+    # Both readers are past both changes, so the next merge trims them
+    build_event_tables(mock_con)
+    run_export(mock_con, export_dir=str(tmp_path))
+    assert (tmp_path / 'silver_events' / 'year=2026' / 'month=1' / 'day=5').is_dir()
+    land('ev_7', '2026-01-07 10:00:00')
+    assert log() == [('2026-01-07',)]
+
+def test_silver_users_folds_in_new_events(mock_con):
+    mock_con.execute("CREATE TABLE bronze_generations (table_name VARCHAR, generation VARCHAR)")
+    mock_con.execute("INSERT INTO bronze_generations VALUES ('bronze_events', 'g1')")
+    run_silver(mock_con)
+
+    # u3 signed up earlier; a purchase and a refund arrive a week later
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_2', 'u3', 'purchase', '2026-01-08 10:00:00', '30', 'USD', NULL;
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'ev_3', 'u3', 'refund', '2026-01-09 10:00:00', '5', 'USD', 'ev_2';
+    """)
+    run_silver(mock_con)
+    row = mock_con.execute("""
+        SELECT signup_week, last_active_week, len(activity_weeks), purchase_total, refund_total, is_bot
+        FROM silver_users WHERE user_id = 'u3'
+    """).fetchone()
+    assert str(row[0]) == '2025-12-29' and str(row[1]) == '2026-01-05'
+    assert row[2:] == (2, 30.0, 5.0, False)
+    assert mock_con.execute("SELECT is_bot FROM silver_users WHERE user_id = 'bot_1'").fetchone()[0] is True
+
+def test_silver_chunked_rebuild_matches_single_pass(mock_con):
+    run_silver(mock_con)
+    events = mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall()
+    users = mock_con.execute("SELECT * FROM silver_users ORDER BY user_id").fetchall()
+    run_silver(mock_con, full_refresh=True, chunk_buckets=4)
+    assert mock_con.execute("SELECT * FROM silver_events ORDER BY event_id").fetchall() == events
+    assert mock_con.execute("SELECT * FROM silver_users ORDER BY user_id").fetchall() == users
+
+def test_silver_bot_window_spans_timestamp_formats(mock_con):
+    # 22 events within one second, split across two timestamp formats
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'mix_' || range, 'bot_3', 'page_view', 
+               CASE WHEN range % 2 = 0 THEN '2026-01-06 23:49:57' ELSE '2026-01-06T23:49:57Z' END, NULL, NULL, NULL
+        FROM range(22);
+        -- 21 events spread over three seconds stay human
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'slow_' || range, 'u4', 'page_view', '2026-01-07 10:00:0' || (range % 3), NULL, NULL, NULL
+        FROM range(21);
+    """)
+    run_silver(mock_con)
+    flagged = dict(mock_con.execute("SELECT user_id, bool_and(is_bot) FROM silver_events GROUP BY 1").fetchall())
+    assert flagged['bot_3'] is True and flagged['u4'] is False
+    evidence = mock_con.execute("""
+        SELECT user_id, bursts, bot_events, first_burst_at::VARCHAR FROM silver_bot_users ORDER BY user_id
+    """).fetchall()
+    assert evidence == [('bot_1', 1, 25, '2026-01-02 11:00:00'), ('bot_3', 1, 22, '2026-01-06 23:49:57')]
+
+def test_silver_bot_rule_is_configurable(mock_con):
+    # 21 events over three seconds: a bot under a 5-events-in-3-seconds rule
+    mock_con.execute("""
+        INSERT INTO bronze_events (event_id, user_id, event_type, raw_timestamp, raw_amount, currency, refers_to_event_id)
+        SELECT 'slow_' || range, 'u4', 'page_view', '2026-01-07 10:00:0' || (range % 3), NULL, NULL, NULL
+        FROM range(21);
+    """)
+    run_silver(mock_con, bot_min_events=5, bot_window_seconds=3)
+    assert mock_con.execute("SELECT bool_and(is_bot) FROM silver_events WHERE user_id = 'u4'").fetchone()[0] is True
+    assert mock_con.execute("SELECT min_events, window_seconds FROM silver_bot_rule").fetchone() == (5, 3.0)
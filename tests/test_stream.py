@@ -0,0 +1,108 @@
+import pytest
+import duckdb
+import os
+import sys
+import threading
+import time
+
+# stream.py is a script with flat imports of its sibling modules
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+from stream import run_stream, run_micro_batch, LANDING_PATH
+from bronze import ingest_events, source_patterns, EVENTS_PATH
+from silver import clean_events
+from gold import build_event_tables, EVENT_TABLES
+
+# Only the test's own files, not the default data/ sources
+NO_SOURCES = {'events': []}
+
+def _sample_lines(count):
+    with open(EVENTS_PATH, encoding='utf-8') as f:
+        return [line for _, line in zip(range(count), f)]
+
+def _rows(con, table):
+    # Sums over different batchings may differ in the last float bit
+    rows = [tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+            for row in con.execute(f"SELECT * FROM {table}").fetchall()]
+    return sorted(rows, key=repr)
+
+def test_stream_stdin_matches_full_rebuild(tmp_path, monkeypatch):
+    lines = _sample_lines(2000)
+    monkeypatch.setattr(sys, 'stdin', iter(lines))
+    db_path = str(tmp_path / 'stream.db')
+    landing = str(tmp_path / 'landing' / 'events.ndjson')
+
+    batches = run_stream('stdin', landing=landing, batch_rows=500, batch_seconds=60, db_path=db_path,
+                         sources=NO_SOURCES)
+    assert [b['lines'] for b in batches] == [500, 500, 500, 500]
+    with open(landing, encoding='utf-8') as f:
+        assert f.read() == ''.join(lines)
+
+    # The same lines loaded in one full rebuild
+    full = duckdb.connect(str(tmp_path / 'full.db'))
+    ingest_events(full, [landing], full_refresh=True)
+    clean_events(full, full_refresh=True)
+    build_event_tables(full, full_refresh=True)
+
+    streamed = duckdb.connect(db_path, read_only=True)
+    for table in ('silver_events', 'silver_users', *(t[0] for t in EVENT_TABLES)):
+        assert _rows(streamed, table) == _rows(full, table), table
+
+def test_stream_flushes_a_batch_after_batch_seconds(tmp_path, monkeypatch):
+    lines = _sample_lines(5)
+
+    def slow_stdin():
+        yield from lines[:3]
+        # Longer than batch_seconds: the first three lines are committed on their own
+        time.sleep(1.0)
+        yield lines[3]
+        yield lines[4].rstrip('\n')
+
+    monkeypatch.setattr(sys, 'stdin', slow_stdin())
+    db_path = str(tmp_path / 'stream.db')
+    landing = str(tmp_path / 'events.ndjson')
+
+    batches = run_stream('stdin', landing=landing, batch_rows=1000, batch_seconds=0.3, db_path=db_path,
+                         sources=NO_SOURCES)
+    assert [b['lines'] for b in batches] == [3, 2]
+    # A final line without its newline is landed complete, so Bronze reads it
+    with open(landing, encoding='utf-8') as f:
+        assert f.read() == ''.join(lines[:4]) + lines[4].rstrip('\n') + '\n'
+    con = duckdb.connect(db_path, read_only=True)
+    assert con.execute("SELECT COUNT(*) FROM bronze_events").fetchone()[0] == 5
+
+def test_default_landing_file_is_replayed_by_bronze_rebuilds():
+    # A full refresh reads every default events source, streamed rows included
+    assert source_patterns()['events'] == [EVENTS_PATH, LANDING_PATH]
+
+def test_rewritten_stream_file_keeps_other_sources(tmp_path):
+    lines = _sample_lines(300)
+    other, tailed = str(tmp_path / 'other.ndjson'), str(tmp_path / 'tailed.ndjson')
+    with open(other, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:200])
+    with open(tailed, 'w', encoding='utf-8') as f:
+        f.writelines(lines[200:])
+    db_path = str(tmp_path / 'stream.db')
+    run_micro_batch(tailed, db_path, sources={'events': [other]})
+
+    # The tailed file is truncated: Bronze rebuilds from every file it knew, not the tailed one alone
+    with open(tailed, 'w', encoding='utf-8') as f:
+        f.writelines(lines[200:250])
+    run_micro_batch(tailed, db_path, sources=NO_SOURCES)
+    con = duckdb.connect(db_path, read_only=True)
+    counts = dict(con.execute("SELECT source_file, COUNT(*) FROM bronze_events GROUP BY 1").fetchall())
+    assert counts == {os.path.abspath(other): 200, os.path.abspath(tailed): 50}
+
+def test_tail_waits_for_the_file_to_appear(tmp_path):
+    tailed = str(tmp_path / 'later.ndjson')
+    lines = _sample_lines(3)
+
+    def write_later():
+        time.sleep(0.5)
+        with open(tailed, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+
+    threading.Thread(target=write_later).start()
+    batches = run_stream('tail', path=tailed, batch_seconds=0.3, db_path=str(tmp_path / 'stream.db'),
+                         max_batches=1, sources=NO_SOURCES)
+    assert [b['lines'] for b in batches] == [3]